@@ -1,9 +1,34 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, func, select, insert, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone
+import base64
+import binascii
+import bisect
+import click
+import collections
+import contextvars
 import csv
+import gzip
+import heapq
 import io
+import itertools
 import json
+import multiprocessing
+import queue
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+import numpy as np
 import pandas as pd
 from werkzeug.utils import secure_filename
 import os
@@ -28,21 +53,237 @@ app = Flask(__name__,
 db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flashcards.db')
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///flashcards.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = 256 * 1024 * 1024  # 256MB max file size（上传文件会写入磁盘后在后台导入）
 app.config['SECRET_KEY'] = 'flashcard-secret-key-2024'  # 添加密钥
+app.config['JOB_WORKERS'] = 2  # 后台导入导出任务的线程数
+app.config['IMPORT_WORKERS'] = int(os.environ.get('FLASHCARD_IMPORT_WORKERS', os.cpu_count() or 1))  # 并行解析进程数
+app.config['IMPORT_PARALLEL_MIN_BYTES'] = 8 * 1024 * 1024  # 超过此大小的CSV/TXT文件才并行解析
+app.config['IMPORT_CHUNK_BYTES'] = 4 * 1024 * 1024  # 并行解析时每块的字节数
+# /events 最大并发连接数：每个连接在整个会话期间独占一个waitress线程（run_server 按此值加8开线程），
+# 每个线程约占一个线程栈的内存，单用户使用时每个打开的标签页一个连接
+app.config['SSE_MAX_CLIENTS'] = int(os.environ.get('FLASHCARD_SSE_MAX_CLIENTS', 16))
+app.config['DUE_QUEUE_MAX_ENTRIES'] = 500000  # 到期队列缓存的最大卡片数
+app.config['SCHEDULER_PARAMS_TTL'] = 300  # 调度参数缓存时间(秒)
+app.config['DAILY_NEW_LIMIT'] = int(os.environ.get('FLASHCARD_DAILY_NEW_LIMIT', 0))  # 每天最多学习的新卡片数，0为不限
+app.config['DAILY_REVIEW_LIMIT'] = int(os.environ.get('FLASHCARD_DAILY_REVIEW_LIMIT', 0))  # 每天最多复习数，0为不限
+app.config['DUE_HISTOGRAM_TTL'] = 600  # 每日到期数直方图的重建间隔(秒)
+app.config['WRITE_QUEUE_MAX_BATCH'] = 200  # 一次组提交最多合并的写操作数
+app.config['WRITE_TIMEOUT'] = 30  # 请求等待写操作完成的最长时间(秒)
+app.config['MULTI_USER'] = os.environ.get('FLASHCARD_MULTI_USER', '0').lower() in ('1', 'true', 'yes')  # 每个用户独立数据库
+app.config['USER_HEADER'] = os.environ.get('FLASHCARD_USER_HEADER', 'X-Flashcard-User')  # 反向代理传入用户标识的请求头
+app.config['USER_ENGINES_MAX'] = 64  # 同时打开的用户数据库引擎数上限
+app.config['USER_ENGINE_IDLE_SECONDS'] = 600  # 用户数据库空闲多久后关闭其引擎(秒)
+
+# 当前请求所属的用户，None 表示使用默认数据库
+current_database = contextvars.ContextVar('current_database', default=None)
+
+
+class UserRoutingSession(Session):
+    """多用户模式下把查询路由到当前用户的数据库；同一会话始终使用第一次取得的引擎"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        user_id = current_database.get()
+        if bind is None and user_id is not None:
+            cached = self.info.get('user_engine')
+            if cached is None or cached[0] != user_id:
+                cached = self.info['user_engine'] = (user_id, user_engines.get(user_id))
+            return cached[1]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(app, session_options={'class_': UserRoutingSession})
+
+
+
+# SM-2算法的默认参数
+DEFAULT_SM2_PARAMS = {
+    'ease_fail_delta': -0.2,  # 没记住时易度因子的变化
+    'ease_hard_delta': -0.1,  # 模糊时易度因子的变化
+    'ease_good_delta': 0.1,  # 记住了时易度因子的变化
+    'hard_interval_factor': 0.5,  # 模糊时间隔的缩减系数
+    'first_interval': 1.0,  # 第一次复习间隔(天)
+    'second_interval': 6.0,  # 第二次复习间隔(天)
+}
+MIN_EASE_FACTOR = 1.3
+
+
+# 多用户 - 每个用户一个独立的SQLite文件，按请求头选择数据库；进程内缓存也按数据库分开保存
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_@-][A-Za-z0-9_.@-]{0,63}$')
+
+
+class PerDatabase:
+    """按数据库分别创建的进程内对象（到期队列、通知器等），属性访问转发给当前数据库的实例"""
+
+    registry = []
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+        PerDatabase.registry.append(self)
+
+    def current(self):
+        user_id = current_database.get()
+        instance = self._instances.get(user_id)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(user_id)
+                if instance is None:
+                    instance = self._instances[user_id] = self._factory()
+        return instance
+
+    def peek(self, user_id):
+        return self._instances.get(user_id)
+
+    def discard(self, user_id):
+        self._instances.pop(user_id, None)
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+
+class UserEngine:
+    __slots__ = ('engine', 'last_used')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.last_used = time.monotonic()
+
+
+class UserEnginePool:
+    """用户数据库引擎池：LRU保留最多 max_engines 个，空闲超过 idle_seconds 的引擎被关闭
+
+    用户在本进程中第一次被访问时建表并执行迁移；被关闭的引擎在下次访问时重新打开。
+    """
+
+    def __init__(self, max_engines, idle_seconds):
+        self.max_engines = max_engines
+        self.idle_seconds = idle_seconds
+        self._engines = collections.OrderedDict()  # user_id -> UserEngine，最久未使用的在前
+        self._lock = threading.Lock()
+        self._init_lock = threading.RLock()
+        self._initialized = set()
+        self._initializing = set()
+        self.opened = 0
+        self.evicted = 0
 
-db = SQLAlchemy(app)
-
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._engines.get(user_id)
+            if entry is None:
+                path = get_user_database_path(user_id)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                entry = self._engines[user_id] = UserEngine(create_engine(f'sqlite:///{path}'))
+                self.opened += 1
+            else:
+                self._engines.move_to_end(user_id)
+            entry.last_used = now
+            evicted = self._evict(now, user_id)
+
+        for evicted_id, engine in evicted:
+            engine.dispose()
+            for objects in PerDatabase.registry:
+                objects.discard(evicted_id)
+        if user_id not in self._initialized:
+            self._initialize(user_id)
+        return entry.engine
+
+    def _evict(self, now, keep):
+        """取出超出数量上限或空闲超时的引擎（有SSE连接的数据库保持打开）"""
+        evicted = []
+        for user_id, entry in list(self._engines.items()):
+            if len(self._engines) <= self.max_engines and now - entry.last_used < self.idle_seconds:
+                break
+            if user_id == keep or _database_in_use(user_id):
+                continue
+            del self._engines[user_id]
+            evicted.append((user_id, entry.engine))
+        self.evicted += len(evicted)
+        return evicted
+
+    def _initialize(self, user_id):
+        # 建表过程中的查询会再次进入 get()，用可重入锁和 _initializing 避免递归初始化
+        with self._init_lock:
+            if user_id in self._initialized or user_id in self._initializing:
+                return
+            self._initializing.add(user_id)
+            token = current_database.set(user_id)
+            try:
+                with app.app_context():
+                    setup_database()
+                self._initialized.add(user_id)
+            finally:
+                current_database.reset(token)
+                self._initializing.discard(user_id)
+
+    def stats(self):
+        with self._lock:
+            return {'open': len(self._engines), 'opened': self.opened, 'evicted': self.evicted}
+
+
+user_engines = UserEnginePool(app.config['USER_ENGINES_MAX'], app.config['USER_ENGINE_IDLE_SECONDS'])
+
+
+def get_users_dir():
+    return os.path.join(app.instance_path, 'users')
+
+
+def get_user_database_path(user_id):
+    return os.path.join(get_users_dir(), user_id, 'flashcards.db')
+
+
+def current_engine():
+    """当前请求所用数据库的引擎"""
+    user_id = current_database.get()
+    return db.engine if user_id is None else user_engines.get(user_id)
+
+
+def _database_in_use(user_id):
+    ticker = due_ticker.peek(user_id)
+    return ticker is not None and ticker.clients > 0
+
+
+@app.before_request
+def select_user_database():
+    """多用户模式下根据请求头选择当前用户的数据库"""
+    if not app.config['MULTI_USER'] or request.endpoint in ('static', 'serve_static'):
+        return None
+    user_id = request.headers.get(app.config['USER_HEADER'], '').strip()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({'success': False, 'error': '缺少或无效的用户标识'}), 401
+    g.database_token = current_database.set(user_id)
+    return None
+
+
+@app.teardown_request
+def reset_user_database(exc):
+    token = g.pop('database_token', None)
+    if token is not None:
+        current_database.reset(token)
+
+
+def use_cli_user(user_id):
+    """命令行指定 --user 时切换到该用户的数据库"""
+    if user_id is None:
+        return
+    if not USER_ID_PATTERN.match(user_id):
+        raise click.BadParameter('无效的用户ID', param_hint='--user')
+    current_database.set(user_id)
 
 
 # 数据库模型 - 重构为满足三大范式
 class Category(db.Model):
-    """分类表 - 满足第一范式（原子性）"""
+    """分类表 - 满足第一范式（原子性）；name 为完整路径，如 英语学习/词汇/CET-6"""
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False, default='默认分类')
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     description = db.Column(db.Text, nullable=True)
 
+    # 层级结构：path 为从根到自身的ID物化路径（如 /1/5/），子树即 path 前缀相同的分类
+    parent_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True, index=True)
+    path = db.Column(db.String(255), nullable=True, index=True)
+
     # 关系
     cards = db.relationship('Flashcard', backref='card_category', lazy=True, cascade='all, delete-orphan')
 
@@ -58,13 +299,27 @@ class Flashcard(db.Model):
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
 
     # 外键关联分类 - 满足第三范式（消除传递依赖）
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, default=1)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, default=1, index=True)
 
     # 间隔重复算法相关字段
     repetition = db.Column(db.Integer, default=0)  # 重复次数
     interval = db.Column(db.Float, default=0)  # 下次复习间隔(天)
     ease_factor = db.Column(db.Float, default=2.5)  # 易度因子
-    next_review = db.Column(db.DateTime, default=datetime.utcnow)  # 下次复习时间
+    next_review = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # 下次复习时间
+
+    # 预聚合的复习统计
+    stats = db.relationship('CardStats', uselist=False, lazy=True, cascade='all, delete-orphan')
+
+    # 标签（多对多）
+    tags = db.relationship('Tag', secondary='card_tag', lazy=True)
+
+    # 分类内按各排序列分页浏览（见 CARD_SORT_COLUMNS）
+    __table_args__ = (
+        db.Index('ix_flashcard_category_created', 'category_id', 'created_date', 'id'),
+        db.Index('ix_flashcard_category_next_review', 'category_id', 'next_review', 'id'),
+        db.Index('ix_flashcard_category_ease', 'category_id', 'ease_factor', 'id'),
+        db.Index('ix_flashcard_category_repetition', 'category_id', 'repetition', 'id'),
+    )
 
     def __repr__(self):
         return f'<Flashcard {self.id}: {self.front[:50]}...>'
@@ -78,7 +333,11 @@ class Flashcard(db.Model):
         """
         根据SM-2算法更新卡片参数
         现在quality只有三个值：0(没记住), 2(模糊), 4(记住了)
+        算法参数见 DEFAULT_SM2_PARAMS，可由 optimize-sm2 命令按复习历史调优
+        （修改此处规则时需同步修改 _simulate_sm2_loss）
         """
+        params = get_scheduler_params(self.category_id)
+
         if quality < 2:  # 0: 没记住
             # 回答错误，重置间隔
             self.repetition = 0
@@ -86,81 +345,1322 @@ class Flashcard(db.Model):
         elif quality == 2:  # 模糊
             # 中等记忆，按较低质量处理
             if self.repetition == 0:
-                self.interval = 1
+                self.interval = params['first_interval']
             else:
-                self.interval = max(1, self.interval * 0.5)  # 减少间隔
+                self.interval = max(1, self.interval * params['hard_interval_factor'])  # 减少间隔
             self.repetition = max(0, self.repetition - 1)
         else:  # 4: 记住了
             # 回答正确，正常更新
             if self.repetition == 0:
-                self.interval = 1
+                self.interval = params['first_interval']
             elif self.repetition == 1:
-                self.interval = 6
+                self.interval = params['second_interval']
             else:
                 self.interval = self.interval * self.ease_factor
             self.repetition += 1
 
         # 更新易度因子（调整公式以适配三个等级）
         if quality == 0:
-            self.ease_factor = max(1.3, self.ease_factor - 0.2)
+            self.ease_factor = max(MIN_EASE_FACTOR, self.ease_factor + params['ease_fail_delta'])
         elif quality == 2:
-            self.ease_factor = max(1.3, self.ease_factor - 0.1)
+            self.ease_factor = max(MIN_EASE_FACTOR, self.ease_factor + params['ease_hard_delta'])
         else:  # quality == 4
-            self.ease_factor = max(1.3, self.ease_factor + 0.1)
+            self.ease_factor = max(MIN_EASE_FACTOR, self.ease_factor + params['ease_good_delta'])
 
-        # 计算下次复习时间
-        self.next_review = datetime.utcnow() + timedelta(days=self.interval)
+        # 计算下次复习时间（模糊并避开到期卡片多的日期）
+        now = datetime.utcnow()
+        self.next_review = due_load.schedule(self.interval, now, self.next_review)
 
         # 记录复习历史
         history = ReviewHistory(
             card_id=self.id,
+            review_date=now,
             quality=quality,
             next_interval=self.interval
         )
         db.session.add(history)
 
-        db.session.commit()
+        # 同步更新预聚合统计
+        CardStats.record(self.id, quality, self.interval, now)
 
 
 class ReviewHistory(db.Model):
     """复习历史表 - 用于统计和分析"""
     id = db.Column(db.Integer, primary_key=True)
     card_id = db.Column(db.Integer, db.ForeignKey('flashcard.id'), nullable=False)
-    review_date = db.Column(db.DateTime, default=datetime.utcnow)
+    review_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     quality = db.Column(db.Integer, nullable=False)  # 0-5
     next_interval = db.Column(db.Float, nullable=False)  # 下次间隔
 
     # 关系
     card = db.relationship('Flashcard', backref='review_history')
 
+    # 按卡片+时间的复合索引，单卡历史查询走索引范围扫描
+    __table_args__ = (
+        db.Index('ix_review_history_card_date', 'card_id', 'review_date'),
+    )
+
     def __repr__(self):
         return f'<ReviewHistory {self.id}: Card {self.card_id} - Quality {self.quality}>'
 
 
+class Tag(db.Model):
+    """标签表 - 与卡片多对多，用于跨分类的分组（考试、章节、难度等）"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Tag {self.id}: {self.name}>'
+
+
+# 卡片-标签关联表：主键 (card_id, tag_id) 按卡片查标签，反向索引 (tag_id, card_id) 按标签筛卡片
+card_tag = db.Table(
+    'card_tag',
+    db.Column('card_id', db.Integer, db.ForeignKey('flashcard.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_card_tag_tag_card', 'tag_id', 'card_id'),
+    sqlite_with_rowid=False,  # 关联表只有主键列，无rowid表直接按主键聚簇存储
+)
+
+
+class CardStats(db.Model):
+    """卡片复习统计表 - 每次复习时增量更新，统计接口无需扫描复习历史"""
+    card_id = db.Column(db.Integer, db.ForeignKey('flashcard.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)  # 复习次数
+    lapse_count = db.Column(db.Integer, nullable=False, default=0)  # 遗忘次数（评分<2）
+    quality_sum = db.Column(db.Integer, nullable=False, default=0)  # 评分总和
+    first_interval = db.Column(db.Float, nullable=True)  # 第一个非零间隔
+    last_interval = db.Column(db.Float, nullable=True)  # 最近一次间隔
+    max_interval = db.Column(db.Float, nullable=False, default=0)  # 最大间隔
+    last_review = db.Column(db.DateTime, nullable=True)  # 最近复习时间
+
+    def __repr__(self):
+        return f'<CardStats {self.card_id}: {self.review_count} reviews>'
+
+    @staticmethod
+    def record(card_id, quality, interval, review_date):
+        """以单条UPSERT语句累加一次复习"""
+        table = CardStats.__table__
+        stmt = sqlite_insert(table).values(
+            card_id=card_id,
+            review_count=1,
+            lapse_count=1 if quality < 2 else 0,
+            quality_sum=quality,
+            first_interval=interval or None,
+            last_interval=interval,
+            max_interval=interval,
+            last_review=review_date
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.card_id],
+            set_={
+                'review_count': table.c.review_count + 1,
+                'lapse_count': table.c.lapse_count + stmt.excluded.lapse_count,
+                'quality_sum': table.c.quality_sum + stmt.excluded.quality_sum,
+                'first_interval': func.coalesce(table.c.first_interval, stmt.excluded.first_interval),
+                'last_interval': stmt.excluded.last_interval,
+                'max_interval': func.max(table.c.max_interval, stmt.excluded.max_interval),
+                'last_review': stmt.excluded.last_review,
+            }
+        )
+        db.session.execute(stmt)
+
+
+def rebuild_card_stats(min_card_id=0):
+    """根据复习历史重建预聚合统计（旧数据库首次回填；导入时只重建ID不小于 min_card_id 的卡片）"""
+    db.session.execute(db.text('DELETE FROM card_stats WHERE card_id >= :min_card_id'),
+                       {'min_card_id': min_card_id})
+    db.session.execute(db.text("""
+        INSERT INTO card_stats (card_id, review_count, lapse_count, quality_sum,
+                                first_interval, last_interval, max_interval, last_review)
+        SELECT h.card_id,
+               COUNT(*),
+               SUM(CASE WHEN h.quality < 2 THEN 1 ELSE 0 END),
+               SUM(h.quality),
+               (SELECT f.next_interval FROM review_history f
+                 WHERE f.card_id = h.card_id AND f.next_interval > 0
+                 ORDER BY f.review_date, f.id LIMIT 1),
+               (SELECT l.next_interval FROM review_history l
+                 WHERE l.card_id = h.card_id
+                 ORDER BY l.review_date DESC, l.id DESC LIMIT 1),
+               MAX(h.next_interval),
+               MAX(h.review_date)
+        FROM review_history h
+        JOIN flashcard c ON c.id = h.card_id
+        WHERE h.card_id >= :min_card_id
+        GROUP BY h.card_id
+    """), {'min_card_id': min_card_id})
+
+
+class CardSignature(db.Model):
+    """卡片内容的MinHash签名（MINHASH_PERMUTATIONS 个uint32），用于近似重复检测"""
+    card_id = db.Column(db.Integer, db.ForeignKey('flashcard.id'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<CardSignature {self.card_id}>'
+
+
+class Job(db.Model):
+    """后台任务表 - 记录导入导出任务的状态和进度"""
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # import / export
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/completed/failed/cancelled
+    filename = db.Column(db.String(255), nullable=True)
+    file_path = db.Column(db.Text, nullable=True)  # 上传的导入文件或导出结果文件
+    progress = db.Column(db.Float, nullable=False, default=0)  # 0-1
+    rows = db.Column(db.Integer, nullable=False, default=0)  # 已处理的卡片数
+    rows_per_second = db.Column(db.Float, nullable=True)
+    message = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    started_date = db.Column(db.DateTime, nullable=True)
+    finished_date = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'filename': self.filename,
+            'progress': round(self.progress or 0, 4),
+            'rows': self.rows,
+            'rows_per_second': self.rows_per_second,
+            'message': self.message,
+            'error': self.error,
+            'created_date': self.created_date.isoformat() if self.created_date else None,
+            'started_date': self.started_date.isoformat() if self.started_date else None,
+            'finished_date': self.finished_date.isoformat() if self.finished_date else None
+        }
+
+
+class SchedulerParams(db.Model):
+    """调度参数表 - 由 optimize-sm2 命令根据复习历史调优后写入"""
+    scope = db.Column(db.String(50), primary_key=True)  # global 或 category:<分类ID>
+    params = db.Column(db.Text, nullable=False)  # JSON格式的参数
+    review_count = db.Column(db.Integer, nullable=False, default=0)  # 参与调优的复习次数
+    loss = db.Column(db.Float, nullable=True)  # 调优后的对数损失
+    baseline_loss = db.Column(db.Float, nullable=True)  # 默认参数的对数损失
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchedulerParams {self.scope}>'
+
+
+_scheduler_params_cache = PerDatabase(lambda: {'loaded_at': 0.0, 'scopes': {}})
+_scheduler_params_lock = threading.Lock()
+
+
+def get_scheduler_params(category_id=None):
+    """获取某个分类生效的SM-2参数：分类参数 > 全局参数 > 默认参数
+
+    参数表每隔 SCHEDULER_PARAMS_TTL 秒重新读取一次，以便拿到离线优化器的最新结果。
+    """
+    with _scheduler_params_lock:
+        cache = _scheduler_params_cache.current()
+        if time.monotonic() - cache['loaded_at'] > app.config['SCHEDULER_PARAMS_TTL']:
+            cache['scopes'] = {row.scope: json.loads(row.params) for row in SchedulerParams.query.all()}
+            cache['loaded_at'] = time.monotonic()
+        scopes = cache['scopes']
+
+    params = dict(DEFAULT_SM2_PARAMS)
+    params.update(scopes.get('global', {}))
+    if category_id is not None:
+        params.update(scopes.get(f'category:{category_id}', {}))
+    return params
+
+
+def invalidate_scheduler_params():
+    with _scheduler_params_lock:
+        _scheduler_params_cache.current()['loaded_at'] = 0.0
+
+
+# 数据库迁移 - create_all 不会修改已存在的表，索引和新列通过按版本排序的迁移补齐到旧数据库
+def _add_column(conn, table, column, ddl):
+    """列不存在时添加（新数据库由 create_all 建表时已包含该列）"""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+
+
+def _backfill_category_tree(conn):
+    """为已有分类补齐 parent_id 和 path，名称中带 / 的分类挂到同名父分类下，缺少的父分类一并创建"""
+    ids = {}
+    paths = {}
+    updates = []
+
+    def place(name, category_id):
+        parent_id = None
+        if CATEGORY_SEPARATOR in name:
+            parent_name = name.rsplit(CATEGORY_SEPARATOR, 1)[0]
+            parent_id = ids.get(parent_name)
+            if parent_id is None:
+                created = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+                parent_id = conn.execute('INSERT INTO category (name, created_date) VALUES (?, ?)',
+                                         (parent_name, created)).lastrowid
+                place(parent_name, parent_id)
+        paths[category_id] = f"{paths[parent_id] if parent_id else '/'}{category_id}/"
+        ids[name] = category_id
+        updates.append((parent_id, paths[category_id], category_id))
+
+    # 按名称排序保证已有的父分类先于子分类处理
+    for category_id, name in conn.execute('SELECT id, name FROM category ORDER BY name').fetchall():
+        place(name, category_id)
+    conn.executemany('UPDATE category SET parent_id = ?, path = ? WHERE id = ?', updates)
+
+
+# (版本号, 说明, 步骤列表)；步骤为SQL语句或接收sqlite3连接的函数，版本号只能递增追加
+MIGRATIONS = [
+    (1, '卡片分类和到期时间索引', [
+        'CREATE INDEX IF NOT EXISTS ix_flashcard_category_id ON flashcard (category_id)',
+        'CREATE INDEX IF NOT EXISTS ix_flashcard_next_review ON flashcard (next_review)',
+    ]),
+    (2, '复习历史按卡片和时间索引', [
+        'CREATE INDEX IF NOT EXISTS ix_review_history_card_date ON review_history (card_id, review_date)',
+    ]),
+    (3, '分类层级：父分类和物化路径', [
+        lambda conn: _add_column(conn, 'category', 'parent_id', 'INTEGER REFERENCES category (id)'),
+        lambda conn: _add_column(conn, 'category', 'path', 'VARCHAR(255)'),
+        'CREATE INDEX IF NOT EXISTS ix_category_parent_id ON category (parent_id)',
+        'CREATE INDEX IF NOT EXISTS ix_category_path ON category (path)',
+        _backfill_category_tree,
+    ]),
+    (4, '复习历史按日期索引（每日上限统计）', [
+        'CREATE INDEX IF NOT EXISTS ix_review_history_review_date ON review_history (review_date)',
+    ]),
+    (5, '分类内卡片按排序列分页的复合索引', [
+        'CREATE INDEX IF NOT EXISTS ix_flashcard_category_created ON flashcard (category_id, created_date, id)',
+        'CREATE INDEX IF NOT EXISTS ix_flashcard_category_next_review ON flashcard (category_id, next_review, id)',
+        'CREATE INDEX IF NOT EXISTS ix_flashcard_category_ease ON flashcard (category_id, ease_factor, id)',
+        'CREATE INDEX IF NOT EXISTS ix_flashcard_category_repetition ON flashcard (category_id, repetition, id)',
+    ]),
+]
+
+
+def run_migrations():
+    """应用尚未执行的迁移，每个版本在独立事务中执行，失败时整体回滚"""
+    raw = current_engine().raw_connection()
+    conn = raw.driver_connection
+    # 关闭sqlite3模块的隐式事务管理，DDL才能和版本记录处于同一事务
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_version ('
+                     'version INTEGER PRIMARY KEY, description TEXT, applied_date TIMESTAMP)')
+        current = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+        applied = 0
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute('INSERT INTO schema_version (version, description, applied_date) VALUES (?, ?, ?)',
+                             (version, description, datetime.utcnow().isoformat(' ')))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied += 1
+            print(f"数据库迁移 {version}: {description}")
+
+        if applied:
+            # 新建索引后更新统计信息，让查询规划器用上它们
+            conn.execute('PRAGMA optimize')
+        return applied
+    finally:
+        conn.isolation_level = isolation_level
+        raw.close()
+
+
 # 创建数据库表和默认分类
 def init_database():
     """初始化数据库，创建默认分类"""
     with app.app_context():
-        db.create_all()
-
-        # 检查是否已存在默认分类
-        default_category = Category.query.filter_by(name='默认分类').first()
-        if not default_category:
-            default_category = Category(name='默认分类', description='系统默认分类')
-            db.session.add(default_category)
-
-            # 添加更多示例分类
-            sample_categories = [
-                Category(name='英语学习', description='英语单词和短语'),
-                Category(name='数学公式', description='数学公式和定理'),
-                Category(name='编程知识', description='编程语言和算法'),
-                Category(name='历史事件', description='历史日期和事件'),
-                Category(name='科学知识', description='科学原理和概念'),
-            ]
-            db.session.add_all(sample_categories)
+        setup_database()
+
+
+def setup_database():
+    """在当前数据库中建表、执行迁移并创建默认分类（多用户模式下每个用户首次访问时执行）"""
+    engine = current_engine()
+    # WAL模式下读请求不会被写线程的事务阻塞（该设置保存在数据库文件中）
+    with engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+    db.metadata.create_all(engine)
+    run_migrations()
+
+    # 检查是否已存在默认分类
+    default_category = Category.query.filter_by(name='默认分类').first()
+    if not default_category:
+        get_or_create_category('默认分类', '系统默认分类')
+
+        # 添加更多示例分类
+        sample_categories = [
+            ('英语学习', '英语单词和短语'),
+            ('数学公式', '数学公式和定理'),
+            ('编程知识', '编程语言和算法'),
+            ('历史事件', '历史日期和事件'),
+            ('科学知识', '科学原理和概念'),
+        ]
+        for name, description in sample_categories:
+            get_or_create_category(name, description)
+        db.session.commit()
+
+        print("数据库初始化完成，创建了默认分类和示例分类")
+
+    # 旧数据库首次启动时回填预聚合统计
+    if CardStats.query.first() is None and ReviewHistory.query.first() is not None:
+        rebuild_card_stats()
+        db.session.commit()
+        print("已根据复习历史回填卡片统计")
+
+    # 上次运行时未完成的后台任务已随进程中断
+    Job.query.filter(Job.status.in_(('pending', 'running'))).update(
+        {'status': 'failed', 'error': '服务重启，任务中断', 'finished_date': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+# 分类层级 - 子树查询按 path 前缀做一次索引范围扫描，不需要递归查询
+CATEGORY_SEPARATOR = '/'
+
+
+def normalize_category_name(name):
+    """去掉路径各级名称两端的空白和空的层级"""
+    parts = (part.strip() for part in (name or '').split(CATEGORY_SEPARATOR))
+    return CATEGORY_SEPARATOR.join(part for part in parts if part)
+
+
+def category_path_range(path):
+    """path 前缀对应的范围 [path, path去掉末尾'/'加'0')，'0' 是 '/' 的下一个字符"""
+    return path, path[:-1] + '0'
+
+
+def get_or_create_category(name, description=None):
+    """按完整路径查找分类，不存在时逐级创建缺少的祖先分类"""
+    name = normalize_category_name(name) or '默认分类'
+    category = Category.query.filter_by(name=name).first()
+    if category:
+        return category
+
+    parent = None
+    if CATEGORY_SEPARATOR in name:
+        parent = get_or_create_category(name.rsplit(CATEGORY_SEPARATOR, 1)[0])
+    category = Category(name=name, description=description, parent_id=parent.id if parent else None)
+    db.session.add(category)
+    db.session.flush()  # 获取ID后才能生成路径
+    category.path = f"{parent.path if parent else '/'}{category.id}/"
+    return category
+
+
+def category_subtree_ids(category_id):
+    """分类及其全部子孙分类的ID，分类不存在时返回None"""
+    path = db.session.execute(select(Category.path).where(Category.id == category_id)).scalar()
+    if path is None:
+        return None
+    low, high = category_path_range(path)
+    return list(db.session.execute(
+        select(Category.id).where(Category.path >= low, Category.path < high)).scalars())
+
+
+def request_category_ids(category_id):
+    """按请求参数 subtree=1 决定是否包含子分类，返回分类ID列表"""
+    if category_id is None:
+        return None
+    if request.args.get('subtree') in ('1', 'true'):
+        return category_subtree_ids(category_id) or [category_id]
+    return [category_id]
+
+
+# 标签 - 标签名批量查找或创建，关联关系按批写入
+TAG_NAME_CHUNK_SIZE = 500
+
+
+def parse_tags(value):
+    """将标签列表或以逗号/分号分隔的字符串规范为去重后的标签名列表"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace('，', ',').replace(';', ',').replace('；', ',').split(',')
+    return list(dict.fromkeys(name for name in (str(item).strip() for item in value) if name))
+
+
+def tag_ids_for(names, tag_ids=None):
+    """返回标签名对应的ID，缺少的标签一次性批量创建（tag_ids 为可跨批次复用的缓存）"""
+    if tag_ids is None:
+        tag_ids = {}
+    missing = [name for name in dict.fromkeys(names) if name not in tag_ids]
+    for i in range(0, len(missing), TAG_NAME_CHUNK_SIZE):
+        chunk = missing[i:i + TAG_NAME_CHUNK_SIZE]
+        db.session.execute(
+            sqlite_insert(Tag).values([{'name': name} for name in chunk]).on_conflict_do_nothing(
+                index_elements=['name'])
+        )
+        tag_ids.update(db.session.execute(select(Tag.name, Tag.id).where(Tag.name.in_(chunk))).tuples().all())
+    return [tag_ids[name] for name in names]
+
+
+def add_card_tags(card_tags, tag_ids=None):
+    """批量写入 (卡片ID, 标签名列表) 的关联"""
+    if tag_ids is None:
+        tag_ids = {}
+    tag_ids_for([name for _, names in card_tags for name in names], tag_ids)
+    rows = [{'card_id': card_id, 'tag_id': tag_ids[name]} for card_id, names in card_tags for name in names]
+    if rows:
+        db.session.execute(sqlite_insert(card_tag).on_conflict_do_nothing(), rows)
+
+
+def set_card_tags(card_id, names):
+    """用新的标签列表替换卡片原有标签"""
+    db.session.execute(delete(card_tag).where(card_tag.c.card_id == card_id))
+    add_card_tags([(card_id, names)])
+
+
+def card_tags_map(card_ids=None):
+    """返回 {卡片ID: [标签名]}，不传 card_ids 时返回全部卡片的标签，传入的ID分批查询"""
+    stmt = select(card_tag.c.card_id, Tag.name).join(Tag, Tag.id == card_tag.c.tag_id)
+    if card_ids is None:
+        statements = [stmt]
+    else:
+        card_ids = list(card_ids)
+        statements = [stmt.where(card_tag.c.card_id.in_(card_ids[start:start + BULK_CHUNK_SIZE]))
+                      for start in range(0, len(card_ids), BULK_CHUNK_SIZE)]
+    tags = collections.defaultdict(list)
+    for chunk_stmt in statements:
+        for card_id, name in db.session.execute(chunk_stmt).tuples():
+            tags[card_id].append(name)
+    return tags
+
+
+# 只读数据访问 - 用Core select只查询需要的列，结果直接转为轻量元组，不经过ORM实例化
+CardRow = collections.namedtuple('CardRow', [
+    'id', 'front', 'back', 'category_id', 'category',
+    'repetition', 'interval', 'ease_factor', 'next_review'
+])
+CategoryRow = collections.namedtuple('CategoryRow', ['id', 'name', 'description', 'parent_id', 'path', 'card_count'])
+
+
+def _card_rows_select():
+    return (select(Flashcard.id, Flashcard.front, Flashcard.back, Flashcard.category_id,
+                   func.coalesce(Category.name, '默认分类'),
+                   Flashcard.repetition, Flashcard.interval, Flashcard.ease_factor, Flashcard.next_review)
+            .outerjoin(Category, Category.id == Flashcard.category_id))
+
+
+def iter_card_rows(*where, limit=None):
+    """按ID顺序返回满足条件的卡片 CardRow"""
+    stmt = _card_rows_select().where(*where).order_by(Flashcard.id).limit(limit)
+    return map(CardRow._make, db.session.execute(stmt).tuples())
+
+
+def card_rows_by_ids(card_ids):
+    """按给定ID顺序返回存在的卡片 CardRow，ID分批查询"""
+    found = {}
+    for start in range(0, len(card_ids), BULK_CHUNK_SIZE):
+        chunk = card_ids[start:start + BULK_CHUNK_SIZE]
+        found.update((card.id, card) for card in iter_card_rows(Flashcard.id.in_(chunk)))
+    return [found[card_id] for card_id in card_ids if card_id in found]
+
+
+def card_summary():
+    """卡片总数、平均复习次数及新卡片/学习中/已掌握（复习次数>=3）的数量，由一条聚合查询统计"""
+    total, repetition_sum, new, mastered = db.session.execute(select(
+        func.count(),
+        func.coalesce(func.sum(Flashcard.repetition), 0),
+        func.count().filter(Flashcard.repetition == 0),
+        func.count().filter(Flashcard.repetition >= 3)
+    ).select_from(Flashcard)).one()
+    return {
+        'total': total,
+        'average_repetition': round(repetition_sum / total, 4) if total else 0,
+        'new': new,
+        'learning': total - new - mastered,
+        'mastered': mastered
+    }
+
+
+def category_rows():
+    """返回全部分类及卡片数（父分类排在子分类之前），卡片数由一条 GROUP BY 子查询统计"""
+    counts = (select(Flashcard.category_id, func.count().label('card_count'))
+              .group_by(Flashcard.category_id).subquery())
+    stmt = (select(Category.id, Category.name, Category.description, Category.parent_id, Category.path,
+                   func.coalesce(counts.c.card_count, 0))
+            .outerjoin(counts, counts.c.category_id == Category.id))
+    rows = [CategoryRow._make(row) for row in db.session.execute(stmt).tuples()]
+    rows.sort(key=lambda cat: cat.name.split(CATEGORY_SEPARATOR))
+    return rows
+
+
+def card_row_dict(card, tags=None):
+    return {
+        'id': card.id,
+        'front': card.front,
+        'back': card.back,
+        'category': card.category,
+        'category_id': card.category_id,
+        'repetition': card.repetition,
+        'interval': card.interval,
+        'ease_factor': card.ease_factor,
+        'next_review': card.next_review.isoformat() if card.next_review else None,
+        'tags': tags or []
+    }
+
+
+def category_row_dicts(rows=None):
+    """分类列表，total_card_count 为包含全部子分类的卡片数（按 path 在内存中汇总）"""
+    rows = category_rows() if rows is None else rows
+    totals = collections.Counter()
+    for cat in rows:
+        for ancestor_id in (cat.path or f'/{cat.id}/').strip('/').split('/'):
+            totals[int(ancestor_id)] += cat.card_count
+
+    return [{
+        'id': cat.id,
+        'name': cat.name,
+        'label': cat.name.rsplit(CATEGORY_SEPARATOR, 1)[-1],
+        'description': cat.description,
+        'parent_id': cat.parent_id,
+        'depth': cat.name.count(CATEGORY_SEPARATOR),
+        'card_count': cat.card_count,
+        'total_card_count': totals[cat.id]
+    } for cat in rows]
+
+
+def category_tree(categories):
+    """将 category_row_dicts 的结果组装为嵌套的树"""
+    nodes = {cat['id']: dict(cat, children=[]) for cat in categories}
+    roots = []
+    for cat in categories:
+        parent = nodes.get(cat['parent_id'])
+        (parent['children'] if parent else roots).append(nodes[cat['id']])
+    return roots
+
+
+# 到期队列缓存 - 按分类缓存 (next_review, card_id) 有序列表，写操作同步更新
+class DueQueue:
+    """进程内到期队列：按分类懒加载，LRU淘汰，总条目数有上限
+
+    已缓存分类中的每张卡片都记录在 _cards 中，因此写操作只需更新已缓存的卡片；
+    未缓存的分类会在下次查询时从数据库加载。
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._categories = collections.OrderedDict()  # category_id -> [(next_review, card_id), ...]
+        self._cards = {}  # card_id -> (category_id, next_review)
+        self._oversized = set()  # 超出容量、直接查询数据库的分类，invalidate 时清除
+        self._size = 0
+        self.hits = 0
+        self.loads = 0
+
+    @staticmethod
+    def _key(next_review):
+        return next_review or datetime.min
+
+    def _load(self, category_id):
+        """从数据库加载一个分类的到期索引，超出容量时记为过大分类并返回None"""
+        self.loads += 1
+        count = db.session.query(func.count(Flashcard.id)).filter(
+            Flashcard.category_id == category_id
+        ).scalar()
+        if count > self.max_entries:
+            self._oversized.add(category_id)
+            return None
+
+        rows = db.session.query(Flashcard.next_review, Flashcard.id).filter(
+            Flashcard.category_id == category_id
+        ).order_by(Flashcard.next_review, Flashcard.id).all()
+
+        entries = [(self._key(next_review), card_id) for next_review, card_id in rows]
+        entries.sort()
+        self._categories[category_id] = entries
+        for next_review, card_id in entries:
+            self._cards[card_id] = (category_id, next_review)
+        self._size += len(entries)
+
+        # 按最近使用淘汰其他分类，直到回到容量以内
+        while self._size > self.max_entries and len(self._categories) > 1:
+            evicted_id, evicted = next(iter(self._categories.items()))
+            if evicted_id == category_id:
+                self._categories.move_to_end(category_id)
+                continue
+            self._drop(evicted_id)
+        return entries
+
+    def _drop(self, category_id):
+        entries = self._categories.pop(category_id, None)
+        if entries is None:
+            return
+        for _, card_id in entries:
+            self._cards.pop(card_id, None)
+        self._size -= len(entries)
+
+    def _entries(self, category_id):
+        if category_id in self._oversized:
+            return None
+        entries = self._categories.get(category_id)
+        if entries is None:
+            return self._load(category_id)
+        self.hits += 1
+        self._categories.move_to_end(category_id)
+        return entries
+
+    def _remove_card(self, card_id):
+        cached = self._cards.pop(card_id, None)
+        if cached is None:
+            return None
+        category_id, next_review = cached
+        entries = self._categories[category_id]
+        index = bisect.bisect_left(entries, (next_review, card_id))
+        if index < len(entries) and entries[index] == (next_review, card_id):
+            del entries[index]
+            self._size -= 1
+        return cached
+
+    def _category_ids(self, category_ids):
+        if category_ids is None:
+            return [category_id for (category_id,) in db.session.query(Category.id).all()]
+        return category_ids
+
+    def due(self, category_ids=None, now=None, limit=None):
+        """按到期时间顺序返回已到期的卡片ID"""
+        now = now or datetime.utcnow()
+        bound = (now, float('inf'))
+        with self._lock:
+            prefixes = []
+            for category_id in self._category_ids(category_ids):
+                entries = self._entries(category_id)
+                if entries is None:
+                    # 分类太大无法缓存，直接查询数据库
+                    query = db.session.query(Flashcard.next_review, Flashcard.id).filter(
+                        Flashcard.category_id == category_id, Flashcard.next_review <= now
+                    ).order_by(Flashcard.next_review, Flashcard.id)
+                    prefixes.append([(self._key(r), i) for r, i in (query.limit(limit) if limit else query)])
+                else:
+                    end = bisect.bisect_right(entries, bound)
+                    prefixes.append(entries[:min(end, limit) if limit else end])
+            merged = heapq.merge(*prefixes)
+            return [card_id for _, card_id in itertools.islice(merged, limit)]
+
+    def due_count(self, category_ids=None, now=None):
+        """已到期的卡片数"""
+        now = now or datetime.utcnow()
+        bound = (now, float('inf'))
+        with self._lock:
+            count = 0
+            for category_id in self._category_ids(category_ids):
+                entries = self._entries(category_id)
+                if entries is None:
+                    count += db.session.query(func.count(Flashcard.id)).filter(
+                        Flashcard.category_id == category_id, Flashcard.next_review <= now
+                    ).scalar()
+                else:
+                    count += bisect.bisect_right(entries, bound)
+            return count
+
+    def next_due(self, category_ids=None, now=None):
+        """下一张尚未到期卡片的到期时间"""
+        now = now or datetime.utcnow()
+        bound = (now, float('inf'))
+        with self._lock:
+            result = None
+            for category_id in self._category_ids(category_ids):
+                entries = self._entries(category_id)
+                if entries is None:
+                    candidate = db.session.query(func.min(Flashcard.next_review)).filter(
+                        Flashcard.category_id == category_id, Flashcard.next_review > now
+                    ).scalar()
+                else:
+                    index = bisect.bisect_right(entries, bound)
+                    candidate = entries[index][0] if index < len(entries) else None
+                if candidate and (result is None or candidate < result):
+                    result = candidate
+            return result
+
+    def upsert(self, card_id, category_id, next_review):
+        """新增或更新一张卡片（仅当其分类已缓存时才需要插入）"""
+        with self._lock:
+            self._remove_card(card_id)
+            entries = self._categories.get(category_id)
+            if entries is not None:
+                key = self._key(next_review)
+                bisect.insort(entries, (key, card_id))
+                self._cards[card_id] = (category_id, key)
+                self._size += 1
+
+    def reschedule(self, card_ids, next_review):
+        """将一组卡片的到期时间改为同一时间"""
+        with self._lock:
+            for card_id in card_ids:
+                cached = self._cards.get(card_id)
+                if cached:
+                    self.upsert(card_id, cached[0], next_review)
+
+    def move(self, card_ids, category_id):
+        """将一组卡片移动到另一个分类"""
+        with self._lock:
+            target_cached = category_id in self._categories
+            for card_id in card_ids:
+                cached = self._remove_card(card_id)
+                if cached is None:
+                    if target_cached:
+                        # 来源分类未缓存，无法得知到期时间，重新加载目标分类
+                        self._drop(category_id)
+                        target_cached = False
+                elif target_cached:
+                    self.upsert(card_id, category_id, cached[1])
+
+    def remove(self, card_ids):
+        with self._lock:
+            for card_id in card_ids:
+                self._remove_card(card_id)
+
+    def invalidate(self, category_ids=None):
+        """丢弃缓存（不传参数时丢弃全部），下次查询时重新加载"""
+        with self._lock:
+            if category_ids is None:
+                self._categories.clear()
+                self._cards.clear()
+                self._oversized.clear()
+                self._size = 0
+            else:
+                for category_id in category_ids:
+                    self._drop(category_id)
+                    self._oversized.discard(category_id)
+
+    def check(self):
+        """与数据库逐个比对已缓存的分类，返回不一致的分类ID"""
+        with self._lock:
+            mismatched = []
+            for category_id, entries in self._categories.items():
+                rows = db.session.query(Flashcard.next_review, Flashcard.id).filter(
+                    Flashcard.category_id == category_id
+                ).all()
+                expected = sorted((self._key(next_review), card_id) for next_review, card_id in rows)
+                if expected != entries:
+                    mismatched.append(category_id)
+            return mismatched
+
+    def stats(self):
+        with self._lock:
+            return {
+                'categories': len(self._categories),
+                'entries': self._size,
+                'oversized': len(self._oversized),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'loads': self.loads
+            }
+
+
+due_queue = PerDatabase(lambda: DueQueue(app.config['DUE_QUEUE_MAX_ENTRIES']))
+
+
+# 复习负载均衡 - 新间隔在模糊范围内挑选到期卡片最少的一天；每日新卡片/复习上限在到期查询中生效
+FUZZ_MIN_INTERVAL = 2.5  # 短于此间隔（天）的卡片不加模糊
+FUZZ_FACTOR = 0.05  # 模糊范围为间隔的 ±5%，至少 ±1 天
+FUZZ_MAX_DAYS = 7
+
+
+def local_day_start(now=None):
+    """本地时间今天零点，换算为与数据库一致的UTC时间"""
+    local_now = (now or datetime.utcnow()).replace(tzinfo=timezone.utc).astimezone()
+    midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class DueLoadBalancer:
+    """未来每天的到期卡片数直方图：定期从数据库重建，期间随每次排期增量更新"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+        self._day_start = None
+        self._loaded_at = 0.0
+
+    def _day(self, when):
+        return int((when - self._day_start).total_seconds() // 86400)
+
+    def _ensure_loaded(self, now):
+        day_start = local_day_start(now)
+        if day_start == self._day_start and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        rows = db.session.execute(db.text("""
+            SELECT CAST(julianday(next_review) - julianday(:start) AS INTEGER), COUNT(*)
+            FROM flashcard
+            WHERE next_review >= :start
+            GROUP BY 1
+        """), {'start': day_start.isoformat(' ')}).tuples().all()
+        self._counts = collections.Counter(dict(rows))
+        self._day_start = day_start
+        self._loaded_at = time.monotonic()
+
+    def schedule(self, interval, now, previous=None):
+        """返回下次复习时间：间隔足够长时在 ±模糊天数 内选择到期数最少的一天，负载相同时取最接近原间隔的"""
+        target = now + timedelta(days=interval)
+        with self._lock:
+            self._ensure_loaded(now)
+            if interval >= FUZZ_MIN_INTERVAL:
+                fuzz = min(FUZZ_MAX_DAYS, max(1, round(interval * FUZZ_FACTOR)))
+                offset = min(range(-fuzz, fuzz + 1), key=lambda days: (
+                    self._counts[self._day(target + timedelta(days=days))], abs(days), random.random()))
+                target += timedelta(days=offset)
+
+            if previous is not None and previous >= self._day_start and self._counts[self._day(previous)] > 0:
+                self._counts[self._day(previous)] -= 1
+            self._counts[self._day(target)] += 1
+        return target
+
+    def forecast(self, days, now=None):
+        """今天起每天的到期卡片数"""
+        with self._lock:
+            self._ensure_loaded(now or datetime.utcnow())
+            return [self._counts[day] for day in range(days)]
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+
+due_load = PerDatabase(lambda: DueLoadBalancer(app.config['DUE_HISTOGRAM_TTL']))
+
+
+def daily_limits_remaining(now=None):
+    """今天剩余的 (新卡片数, 复习数)，上限为0表示不限制，对应位置返回None"""
+    new_limit = app.config['DAILY_NEW_LIMIT']
+    review_limit = app.config['DAILY_REVIEW_LIMIT']
+    if not new_limit and not review_limit:
+        return None, None
+
+    # 今天首次复习的卡片计为新卡片，其余复习记录计为复习数（走 review_date 索引）
+    total, new = db.session.execute(db.text("""
+        SELECT COUNT(*),
+               COUNT(DISTINCT CASE WHEN NOT EXISTS (
+                   SELECT 1 FROM review_history p WHERE p.card_id = h.card_id AND p.review_date < :start
+               ) THEN h.card_id END)
+        FROM review_history h
+        WHERE h.review_date >= :start
+    """), {'start': local_day_start(now).isoformat(' ')}).one()
+    return (max(new_limit - new, 0) if new_limit else None,
+            max(review_limit - (total - new), 0) if review_limit else None)
+
+
+def _due_cards_query(category_ids, now, reviewed, limit):
+    """按到期顺序查询已到期的已复习/未复习卡片，limit为None时不限"""
+    query = select(Flashcard.next_review, Flashcard.id).where(
+        db.or_(Flashcard.next_review.is_(None), Flashcard.next_review <= now))
+    if category_ids is not None:
+        query = query.where(Flashcard.category_id.in_(category_ids))
+    has_stats = select(CardStats.card_id).where(CardStats.card_id == Flashcard.id).exists()
+    query = query.where(has_stats if reviewed else ~has_stats).order_by(Flashcard.next_review, Flashcard.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [(DueQueue._key(next_review), card_id) for next_review, card_id in db.session.execute(query)]
+
+
+def daily_due(category_ids=None, now=None, limit=None):
+    """今天要复习的卡片ID：按到期顺序截取，从未复习过的卡片计入新卡片上限，其余计入复习上限"""
+    now = now or datetime.utcnow()
+    new_left, review_left = daily_limits_remaining(now)
+    if new_left is None and review_left is None:
+        return due_queue.due(category_ids, now, limit)
+
+    # 新卡片和复习卡片各用一次带 LIMIT 的查询取出额度内的部分，再按到期顺序合并
+    if limit:
+        new_left = limit if new_left is None else min(new_left, limit)
+        review_left = limit if review_left is None else min(review_left, limit)
+    new = _due_cards_query(category_ids, now, False, new_left) if new_left != 0 else []
+    reviewed = _due_cards_query(category_ids, now, True, review_left) if review_left != 0 else []
+    merged = heapq.merge(new, reviewed)
+    return [card_id for _, card_id in itertools.islice(merged, limit or None)]
+
+
+def daily_due_count(category_ids=None, now=None):
+    """今天要复习的卡片数（不设上限时直接使用到期队列计数）"""
+    if not app.config['DAILY_NEW_LIMIT'] and not app.config['DAILY_REVIEW_LIMIT']:
+        return due_queue.due_count(category_ids, now)
+    return len(daily_due(category_ids, now))
+
+
+@app.route('/due/forecast', methods=['GET'])
+def get_due_forecast():
+    """未来每天的到期卡片数"""
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    return jsonify({'success': True, 'forecast': due_load.forecast(days)})
+
+
+# 单写线程 - 请求中的写操作排队交给一个线程执行，积压的操作合并为一个事务提交（组提交）
+class DatabaseWriter:
+    """SQLite同一时刻只允许一个写事务：所有写操作由专用线程串行执行，避免请求线程争抢写锁
+
+    写操作是通过 db.session 读写、不自行提交的函数，返回值应为普通数据（提交后ORM对象会过期）。
+    组内任一操作出错时整组回滚后逐个重试，只有出错的操作把异常交回请求线程。
+    已被调用方取消（排队超时）的操作不会执行。
+    """
+
+    def __init__(self, max_batch, samples=1000):
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._commit_seconds = collections.deque(maxlen=samples)  # 每次提交的事务耗时
+        self._wait_seconds = collections.deque(maxlen=samples)  # 每个操作从提交到完成的耗时
+        self._counts = collections.Counter()
+        self._max_depth = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, func):
+        """提交写操作，返回 Future"""
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # 写操作内部再提交写操作时直接执行，避免等待自己
+            future.set_result(func())
+            return future
+        self._ensure_started()
+        self._queue.put((current_database.get(), (func, future, time.perf_counter())))
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+        return future
+
+    def _run(self):
+        while True:
+            # 阻塞等待第一个操作，再取走队列中已积压的操作，不额外等待凑批
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 不同用户的数据库分别提交
+            groups = collections.defaultdict(list)
+            for user_id, item in batch:
+                groups[user_id].append(item)
+            for user_id, items in groups.items():
+                self._run_group(user_id, items)
+
+    def _run_group(self, user_id, items):
+        # 标记为执行中，之后调用方无法再取消；已取消的操作直接跳过
+        started = [item for item in items if item[1].set_running_or_notify_cancel()]
+        self._counts['cancelled_operations'] += len(items) - len(started)
+        if not started:
+            return
+        items = started
+        token = current_database.set(user_id)
+        try:
+            with app.app_context():
+                try:
+                    self._execute(items)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            current_database.reset(token)
+
+    def _execute(self, batch):
+        started = time.perf_counter()
+        try:
+            results = [func() for func, _, _ in batch]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._counts['retried_groups'] += 1
+            for item in batch:
+                self._execute_one(item)
+            return
+        self._finish(batch, results, started)
+
+    def _execute_one(self, item):
+        func, future, _ = item
+        started = time.perf_counter()
+        try:
+            result = func()
             db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._counts['failed_operations'] += 1
+            future.set_exception(e)
+            return
+        self._finish([item], [result], started)
+
+    def _finish(self, batch, results, started):
+        finished = time.perf_counter()
+        self._commit_seconds.append(finished - started)
+        self._counts['commits'] += 1
+        self._counts['operations'] += len(batch)
+        for (_, future, submitted), result in zip(batch, results):
+            self._wait_seconds.append(finished - submitted)
+            future.set_result(result)
+
+    def metrics(self):
+        """队列深度、组提交大小和延迟分位数（毫秒）"""
+        def percentiles(samples):
+            ordered = sorted(samples)
+            if not ordered:
+                return None
+            pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+            return {'p50': pick(0.5), 'p95': pick(0.95), 'max': round(ordered[-1] * 1000, 3)}
+
+        counts = dict(self._counts)
+        commits = counts.get('commits', 0)
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self._max_depth,
+            'commits': commits,
+            'operations': counts.get('operations', 0),
+            'failed_operations': counts.get('failed_operations', 0),
+            'cancelled_operations': counts.get('cancelled_operations', 0),
+            'retried_groups': counts.get('retried_groups', 0),
+            'average_group_size': round(counts.get('operations', 0) / commits, 2) if commits else None,
+            'commit_latency_ms': percentiles(self._commit_seconds),
+            'wait_latency_ms': percentiles(self._wait_seconds),
+        }
+
+
+db_writer = DatabaseWriter(app.config['WRITE_QUEUE_MAX_BATCH'])
+
+
+class WriteTimeout(Exception):
+    """写操作排队超时，已取消且未执行"""
+
+
+def run_write(func):
+    """在写线程中执行写操作并返回其结果
+
+    排队超过 WRITE_TIMEOUT 仍未开始的操作被取消并抛出 WriteTimeout；已开始执行的操作会等到完成，
+    不会把已经写入的结果当作失败返回。耗时长的写入应拆成多个小操作分别提交。
+    """
+    future = db_writer.submit(func)
+    try:
+        return future.result(app.config['WRITE_TIMEOUT'])
+    except FutureTimeoutError:
+        if future.cancel():
+            raise WriteTimeout('写入队列繁忙，操作未执行，请稍后重试')
+        return future.result()
+
+
+@app.route('/metrics/writes', methods=['GET'])
+def get_write_metrics():
+    """写队列指标"""
+    return jsonify({'success': True, 'metrics': db_writer.metrics()})
+
+
+# 事件推送 - 所有SSE连接共享一个进程内通知器，客户端无需轮询
+SSE_HEARTBEAT_SECONDS = 15  # 心跳间隔，用于及时发现断开的连接
+DUE_TICK_MAX_SECONDS = 60  # 到期计数的最长重算间隔
+
+
+class ChangeNotifier:
+    """进程内事件广播：事件带递增序号存入环形缓冲，各连接只记录自己读到的序号"""
+
+    def __init__(self, history=256):
+        self._condition = threading.Condition()
+        self._events = collections.deque(maxlen=history)
+        self._seq = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, event, data):
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            self._condition.notify_all()
+
+    def wait(self, last_seq, timeout):
+        """等待序号大于 last_seq 的事件，返回 (事件列表, 最新序号, 是否有事件已被挤出缓冲)"""
+        with self._condition:
+            if self._seq <= last_seq:
+                self._condition.wait(timeout)
+            events = [item for item in self._events if item[0] > last_seq]
+            missed = bool(events) and events[0][0] > last_seq + 1
+            return events, self._seq, missed
+
+
+class DueTicker:
+    """到期计数线程：数据库有SSE连接时运行，在有卡片跨过 next_review 或卡片库变更时推送到期计数"""
+
+    def __init__(self):
+        self.wakeup = threading.Event()
+        self.clients = 0
+        self._lock = threading.Lock()
+        self._running = False
+
+    def connect(self):
+        with self._lock:
+            self.clients += 1
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._run, args=(current_database.get(), notifier.current()),
+                                 name='flashcard-due-ticker', daemon=True).start()
+
+    def disconnect(self):
+        with self._lock:
+            self.clients -= 1
+        self.wakeup.set()
+
+    def _run(self, user_id, publisher):
+        current_database.set(user_id)
+        last_count = None
+        while True:
+            with self._lock:
+                if not self.clients:
+                    # 最后一个连接已断开
+                    self._running = False
+                    return
+
+            with app.app_context():
+                try:
+                    due_count, next_due = _due_snapshot()
+                except Exception as e:
+                    app.logger.error(f'到期计数失败: {str(e)}')
+                    due_count, next_due = last_count, None
+                finally:
+                    db.session.remove()
+
+            if due_count != last_count:
+                publisher.publish('due', {
+                    'due_count': due_count,
+                    'next_due': next_due.isoformat() if next_due else None
+                })
+                last_count = due_count
+
+            timeout = DUE_TICK_MAX_SECONDS
+            if next_due:
+                timeout = min(timeout, max((next_due - datetime.utcnow()).total_seconds(), 0) + 0.5)
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+
+
+notifier = PerDatabase(ChangeNotifier)
+due_ticker = PerDatabase(DueTicker)
+_sse_clients = 0
+_sse_clients_lock = threading.Lock()
+
+
+def notify_change(kind, **data):
+    """广播卡片库变更，并让到期计数线程重新计算"""
+    data['kind'] = kind
+    source = request.headers.get('X-Client-Id') if has_request_context() else None
+    if source:
+        data['source'] = source
+    notifier.publish('change', data)
+    due_ticker.wakeup.set()
+
+
+def _due_snapshot():
+    """今天要复习的卡片数（已按每日上限截取）和下一张卡片的到期时间"""
+    now = datetime.utcnow()
+    return daily_due_count(now=now), due_queue.next_due(now=now)
+
+
+def _sse_message(event, data, seq=None):
+    message = f'event: {event}\n'
+    if seq is not None:
+        message += f'id: {seq}\n'
+    return message + f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+@app.route('/events')
+def events():
+    """SSE事件流：推送到期计数(due)和卡片库变更(change)"""
+    global _sse_clients
+    with _sse_clients_lock:
+        if _sse_clients >= app.config['SSE_MAX_CLIENTS']:
+            return jsonify({'success': False, 'error': '连接数过多'}), 503
+        _sse_clients += 1
+
+    # 响应流在请求结束后才开始读取，先取出当前数据库的通知器和计数线程
+    user_notifier, ticker = notifier.current(), due_ticker.current()
+    try:
+        ticker.connect()
+        due_count, next_due = _due_snapshot()
+        last_seq = user_notifier.seq
+    except Exception:
+        ticker.disconnect()
+        with _sse_clients_lock:
+            _sse_clients -= 1
+        raise
+
+    def stream(last_seq):
+        global _sse_clients
+        try:
+            yield 'retry: 3000\n\n'
+            yield _sse_message('due', {
+                'due_count': due_count,
+                'next_due': next_due.isoformat() if next_due else None
+            })
+            while True:
+                pending, last_seq, missed = user_notifier.wait(last_seq, SSE_HEARTBEAT_SECONDS)
+                if missed:
+                    # 客户端落后太多，通知其整体刷新
+                    yield _sse_message('reset', {}, last_seq)
+                    continue
+                if not pending:
+                    yield ': heartbeat\n\n'
+                for seq, event, data in pending:
+                    yield _sse_message(event, data, seq)
+        finally:
+            ticker.disconnect()
+            with _sse_clients_lock:
+                _sse_clients -= 1
+
+    return Response(stream(last_seq), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-            print("数据库初始化完成，创建了默认分类和示例分类")
+
+@app.route('/due', methods=['GET'])
+def get_due():
+    """查询今天要复习的卡片（来自到期队列缓存，按每日上限截取）"""
+    category_id = request.args.get('category_id', type=int)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+    category_ids = request_category_ids(category_id)
+    now = datetime.utcnow()
+
+    next_due = due_queue.next_due(category_ids, now)
+    return jsonify({
+        'success': True,
+        'due_count': daily_due_count(category_ids, now),
+        'total_due_count': due_queue.due_count(category_ids, now),
+        'next_due': next_due.isoformat() if next_due else None,
+        'card_ids': daily_due(category_ids, now, limit)
+    })
+
+
+@app.route('/due/check', methods=['GET'])
+def check_due_queue():
+    """校验到期队列缓存与数据库是否一致"""
+    mismatched = due_queue.check()
+    if mismatched:
+        app.logger.warning(f'到期队列与数据库不一致，已重新加载分类: {mismatched}')
+        due_queue.invalidate(mismatched)
+    return jsonify({
+        'success': True,
+        'consistent': not mismatched,
+        'mismatched_categories': mismatched,
+        'stats': due_queue.stats()
+    })
 
 
 @app.route('/')
@@ -168,48 +1668,64 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/cards')
-def get_cards():
-    # 获取今天需要复习的卡片
-    today_cards = Flashcard.query.filter(
-        Flashcard.next_review <= datetime.utcnow()
-    ).all()
+@app.route('/benchmark')
+def benchmark():
+    # 前端渲染性能测试页，卡片数据在浏览器中生成，不访问数据库
+    return render_template('benchmark.html')
 
-    # 获取所有卡片
-    all_cards = Flashcard.query.all()
 
-    # 获取所有分类
-    categories = Category.query.all()
+TODAY_PAGE_SIZE = 100  # /cards 返回的今日卡片数，导入大量卡片后首页也不会下载整个卡片库
 
+
+@app.route('/cards')
+def get_cards():
+    """今天要复习的第一页卡片、今日到期数、各分类卡片数和统计摘要
+
+    参数 limit=100 为今日卡片的页大小，后面的卡片由复习界面通过 /due 和 /cards/lookup 逐页加载；
+    分类中的卡片由侧边栏按页加载（/category/<id>/cards）；参数 all=1 时额外返回全部卡片（Excel导出使用）。
+    """
+    limit = min(max(request.args.get('limit', TODAY_PAGE_SIZE, type=int), 1), 1000)
+    now = datetime.utcnow()
+    # 今天需要复习的卡片由到期队列给出，按到期时间排序并应用每日上限
+    today_cards = card_rows_by_ids(daily_due(now=now, limit=limit))
+    tags = card_tags_map([card.id for card in today_cards])
+    payload = {
+        'today_cards': [card_row_dict(card, tags.get(card.id)) for card in today_cards],
+        'due_count': daily_due_count(now=now),
+        'categories': category_row_dicts(),
+        'stats': card_summary()
+    }
+
+    if request.args.get('all') == '1':
+        tags = card_tags_map()
+        payload['all_cards'] = [card_row_dict(card, tags.get(card.id)) for card in iter_card_rows()]
+    return jsonify(payload)
+
+
+@app.route('/cards/summary', methods=['GET'])
+def get_cards_summary():
+    """各分类卡片数和统计摘要（收到变更推送后刷新计数使用）"""
+    return jsonify({'success': True, 'categories': category_row_dicts(), 'stats': card_summary()})
+
+
+@app.route('/cards/lookup', methods=['GET'])
+def lookup_cards():
+    """按ID查询卡片，参数 ids=1,2,3（最多1000个），missing 为已不存在的ID"""
+    try:
+        card_ids = list(dict.fromkeys(
+            int(card_id) for card_id in request.args.get('ids', '').split(',') if card_id.strip()))
+    except ValueError:
+        return jsonify({'success': False, 'error': '请提供有效的卡片ID列表'}), 400
+    if not card_ids or len(card_ids) > 1000:
+        return jsonify({'success': False, 'error': '请提供1到1000个卡片ID'}), 400
+
+    cards = card_rows_by_ids(card_ids)
+    tags = card_tags_map([card.id for card in cards])
+    found = {card.id for card in cards}
     return jsonify({
-        'today_cards': [{
-            'id': card.id,
-            'front': card.front,
-            'back': card.back,
-            'category': card.category_name,
-            'category_id': card.category_id,
-            'repetition': card.repetition,
-            'interval': card.interval,
-            'ease_factor': card.ease_factor,
-            'next_review': card.next_review.isoformat() if card.next_review else None
-        } for card in today_cards],
-        'all_cards': [{
-            'id': card.id,
-            'front': card.front,
-            'back': card.back,
-            'category': card.category_name,
-            'category_id': card.category_id,
-            'repetition': card.repetition,
-            'interval': card.interval,
-            'ease_factor': card.ease_factor,
-            'next_review': card.next_review.isoformat() if card.next_review else None
-        } for card in all_cards],
-        'categories': [{
-            'id': cat.id,
-            'name': cat.name,
-            'description': cat.description,
-            'card_count': len(cat.cards)
-        } for cat in categories]
+        'success': True,
+        'cards': [card_row_dict(card, tags.get(card.id)) for card in cards],
+        'missing': [card_id for card_id in card_ids if card_id not in found]
     })
 
 
@@ -223,23 +1739,29 @@ def add_card():
     if not front or not back:
         return jsonify({'success': False, 'error': '卡片正面和背面内容不能为空'})
 
-    # 查找或创建分类
-    category = Category.query.filter_by(name=category_name).first()
-    if not category:
-        category = Category(name=category_name)
-        db.session.add(category)
-        db.session.flush()  # 获取ID但不提交
-
-    # 创建卡片
-    card = Flashcard(
-        front=front,
-        back=back,
-        category_id=category.id
-    )
-    db.session.add(card)
-    db.session.commit()
+    tags = parse_tags(data.get('tags'))
+
+    def write():
+        # 查找或创建分类（含缺少的上级分类）
+        category = get_or_create_category(category_name)
+
+        # 创建卡片
+        card = Flashcard(
+            front=front,
+            back=back,
+            category_id=category.id
+        )
+        db.session.add(card)
+        db.session.flush()
+        add_card_tags([(card.id, tags)])
+        store_card_signatures([(card.id, front, back)])
+        return card.id, card.category_id, card.next_review
+
+    card_id, category_id, next_review = run_write(write)
+    due_queue.upsert(card_id, category_id, next_review)
+    notify_change('add', ids=[card_id])
 
-    return jsonify({'success': True, 'id': card.id})
+    return jsonify({'success': True, 'id': card_id})
 
 
 @app.route('/edit/<int:card_id>', methods=['PUT'])
@@ -253,23 +1775,30 @@ def edit_card(card_id):
     if not front or not back:
         return jsonify({'success': False, 'error': '卡片正面和背面内容不能为空'})
 
-    card = Flashcard.query.get(card_id)
-    if not card:
-        return jsonify({'success': False, 'error': '卡片不存在'})
+    tags = parse_tags(data['tags']) if 'tags' in data else None
 
-    # 查找或创建分类
-    category = Category.query.filter_by(name=category_name).first()
-    if not category:
-        category = Category(name=category_name)
-        db.session.add(category)
-        db.session.flush()
+    def write():
+        card = Flashcard.query.get(card_id)
+        if not card:
+            return None
 
-    # 更新卡片
-    card.front = front
-    card.back = back
-    card.category_id = category.id
+        # 查找或创建分类（含缺少的上级分类）
+        category = get_or_create_category(category_name)
 
-    db.session.commit()
+        # 更新卡片
+        card.front = front
+        card.back = back
+        card.category_id = category.id
+        if tags is not None:
+            set_card_tags(card.id, tags)
+        store_card_signatures([(card.id, front, back)], replace=True)
+        return card.category_id, card.next_review
+
+    result = run_write(write)
+    if result is None:
+        return jsonify({'success': False, 'error': '卡片不存在'})
+    due_queue.upsert(card_id, *result)
+    notify_change('edit', ids=[card_id])
     return jsonify({'success': True})
 
 
@@ -278,18 +1807,18 @@ def review_card(card_id):
     data = request.json
     quality = int(data.get('quality', 3))
 
-    card = Flashcard.query.get(card_id)
-    if card:
-        # 记录复习历史
-        history = ReviewHistory(
-            card_id=card.id,
-            quality=quality,
-            next_interval=card.interval
-        )
-        db.session.add(history)
-
-        # 更新卡片参数
+    def write():
+        card = Flashcard.query.get(card_id)
+        if not card:
+            return None
+        # 更新卡片参数（同时记录复习历史）
         card.update_after_review(quality)
+        return card.category_id, card.next_review
+
+    result = run_write(write)
+    if result:
+        due_queue.upsert(card_id, *result)
+        notify_change('review', ids=[card_id])
         return jsonify({'success': True})
 
     return jsonify({'success': False, 'error': 'Card not found'})
@@ -297,24 +1826,481 @@ def review_card(card_id):
 
 @app.route('/delete/<int:card_id>', methods=['DELETE'])
 def delete_card(card_id):
-    card = Flashcard.query.get(card_id)
-    if card:
-        db.session.delete(card)
-        db.session.commit()
+    if run_write(lambda: _delete_cards_where(Flashcard.id == card_id)):
+        due_queue.remove([card_id])
+        notify_change('delete', ids=[card_id])
         return jsonify({'success': True})
     return jsonify({'success': False, 'error': 'Card not found'})
 
 
+# 批量操作 - 每个分块一条 UPDATE/DELETE 语句，整体在同一事务中提交
+BULK_CHUNK_SIZE = 500  # 单条语句的最大ID数，低于SQLite的绑定参数上限
+
+
+def _bulk_where_clauses(data):
+    """根据请求中的 ids 或 filter 生成WHERE条件列表，无法解析时返回None"""
+    if data.get('ids') is not None:
+        ids = _bulk_ids(data)
+        if ids is None:
+            return None
+        ids = sorted(set(ids))
+        return [Flashcard.id.in_(ids[i:i + BULK_CHUNK_SIZE]) for i in range(0, len(ids), BULK_CHUNK_SIZE)]
+
+    card_filter = data.get('filter')
+    if not isinstance(card_filter, dict):
+        return None
+
+    try:
+        category_id = card_filter.get('category_id')
+        category_id = int(category_id) if category_id is not None else None
+        max_repetition = card_filter.get('max_repetition')
+        max_repetition = int(max_repetition) if max_repetition is not None else None
+    except (TypeError, ValueError):
+        return None
+
+    conditions = []
+    if category_id is not None:
+        if card_filter.get('subtree'):
+            conditions.append(Flashcard.category_id.in_(category_subtree_ids(category_id) or [category_id]))
+        else:
+            conditions.append(Flashcard.category_id == category_id)
+    if card_filter.get('due'):
+        conditions.append(Flashcard.next_review <= datetime.utcnow())
+    if max_repetition is not None:
+        conditions.append(Flashcard.repetition <= max_repetition)
+    if not conditions:
+        # 拒绝空过滤条件，避免误操作整个卡片库
+        return None
+    return [db.and_(*conditions)]
+
+
+def _bulk_ids(data):
+    """请求中按ID列表指定的卡片；按过滤条件指定，或 ids 不是整数列表时返回None（字符串等不会被逐字符当作ID）"""
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(card_id, int) and not isinstance(card_id, bool)
+                                            for card_id in ids):
+        return None
+    return ids
+
+
+def _delete_cards_where(clause):
+    """删除满足条件的卡片及其复习历史、统计、标签关联和签名，返回删除的卡片数"""
+    card_ids = select(Flashcard.id).where(clause)
+    db.session.execute(
+        delete(ReviewHistory).where(ReviewHistory.card_id.in_(card_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(delete(card_tag).where(card_tag.c.card_id.in_(card_ids)))
+    db.session.execute(
+        delete(CardSignature).where(CardSignature.card_id.in_(card_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(CardStats).where(CardStats.card_id.in_(card_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    result = db.session.execute(
+        delete(Flashcard).where(clause),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+@app.route('/cards/bulk/delete', methods=['POST'])
+def bulk_delete_cards():
+    """批量删除卡片"""
+    data = request.json or {}
+    clauses = _bulk_where_clauses(data)
+    if clauses is None:
+        return jsonify({'success': False, 'error': '请提供有效的卡片ID列表或过滤条件'}), 400
+
+    try:
+        count = run_write(lambda: sum(_delete_cards_where(clause) for clause in clauses))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+    card_ids = _bulk_ids(data)
+    if card_ids is None:
+        due_queue.invalidate()
+    else:
+        due_queue.remove(card_ids)
+    notify_change('delete', count=count)
+    return jsonify({'success': True, 'count': count})
+
+
+@app.route('/cards/bulk/move', methods=['POST'])
+def bulk_move_cards():
+    """批量移动卡片到指定分类"""
+    data = request.json or {}
+    clauses = _bulk_where_clauses(data)
+    if clauses is None:
+        return jsonify({'success': False, 'error': '请提供有效的卡片ID列表或过滤条件'}), 400
+
+    category_id = category_name = None
+    if data.get('category_id') is not None:
+        try:
+            category_id = int(data['category_id'])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': '请提供有效的分类ID'}), 400
+        if not Category.query.get(category_id):
+            return jsonify({'success': False, 'error': '分类不存在'})
+    else:
+        category_name = (data.get('category') or '').strip()
+        if not category_name:
+            return jsonify({'success': False, 'error': '请指定目标分类'})
+
+    def write():
+        target_id = category_id or get_or_create_category(category_name).id
+        count = 0
+        for clause in clauses:
+            result = db.session.execute(
+                update(Flashcard).where(clause).values(category_id=target_id),
+                execution_options={'synchronize_session': False}
+            )
+            count += result.rowcount
+        return count, target_id
+
+    try:
+        count, category_id = run_write(write)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+    card_ids = _bulk_ids(data)
+    if card_ids is None:
+        due_queue.invalidate()
+    else:
+        due_queue.move(card_ids, category_id)
+    notify_change('move', count=count, category_id=category_id)
+    return jsonify({'success': True, 'count': count, 'category_id': category_id})
+
+
+@app.route('/cards/bulk/reset', methods=['POST'])
+def bulk_reset_cards():
+    """批量重置卡片的SM-2调度状态（保留复习历史）"""
+    data = request.json or {}
+    clauses = _bulk_where_clauses(data)
+    if clauses is None:
+        return jsonify({'success': False, 'error': '请提供有效的卡片ID列表或过滤条件'}), 400
+
+    now = datetime.utcnow()
+
+    def write():
+        count = 0
+        for clause in clauses:
+            result = db.session.execute(
+                update(Flashcard).where(clause).values(
+                    repetition=0,
+                    interval=0,
+                    ease_factor=2.5,
+                    next_review=now
+                ),
+                execution_options={'synchronize_session': False}
+            )
+            count += result.rowcount
+        return count
+
+    try:
+        count = run_write(write)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+    card_ids = _bulk_ids(data)
+    if card_ids is None:
+        due_queue.invalidate()
+    else:
+        due_queue.reschedule(card_ids, now)
+    notify_change('reset', count=count)
+    return jsonify({'success': True, 'count': count})
+
+
+# 标签筛选 - 标签与分类的组合条件在一条SQL中完成，按卡片ID游标分页
+FILTER_PAGE_SIZE = 50
+
+
+@app.route('/tags', methods=['GET'])
+def get_tags():
+    """获取全部标签及其卡片数"""
+    rows = db.session.execute(
+        select(Tag.id, Tag.name, func.count(card_tag.c.card_id))
+        .outerjoin(card_tag, card_tag.c.tag_id == Tag.id)
+        .group_by(Tag.id)
+        .order_by(Tag.name)
+    ).tuples()
+    return jsonify([{'id': tag_id, 'name': name, 'card_count': count} for tag_id, name, count in rows])
+
+
+@app.route('/cards/filter', methods=['GET'])
+def filter_cards():
+    """按标签和分类筛选卡片
+
+    参数: tags=a,b&tag_mode=and|or&category_id=1&category_id=2&subtree=1&mode=and|or&after=<游标>&limit=50
+    tag_mode 决定多个标签取交集还是并集，mode 决定标签条件与分类条件的组合方式。
+    """
+    tag_names = parse_tags(request.args.get('tags'))
+    tag_mode = request.args.get('tag_mode', 'and')
+    mode = request.args.get('mode', 'and')
+    if tag_mode not in ('and', 'or') or mode not in ('and', 'or'):
+        return jsonify({'success': False, 'error': '组合方式只能是 and 或 or'})
+
+    category_ids = set()
+    for category_id in request.args.getlist('category_id', type=int):
+        category_ids.update(request_category_ids(category_id))
+    if not tag_names and not category_ids:
+        return jsonify({'success': False, 'error': '请指定标签或分类'})
+
+    after = request.args.get('after', 0, type=int)
+    limit = min(max(request.args.get('limit', FILTER_PAGE_SIZE, type=int), 1), 1000)
+
+    # 每个条件拆成按卡片ID升序沿索引扫描的查询：标签走 card_tag 的 (tag_id, card_id) 索引，分类走 category_id 索引，
+    # 其余条件用 EXISTS 逐行检查，每个查询只读游标之后约 limit 行，再在内存中归并
+    tag_streams = []
+    if tag_names:
+        tag_ids = list(db.session.execute(select(Tag.id).where(Tag.name.in_(tag_names))).scalars())
+        if tag_mode == 'and' and len(tag_ids) < len(tag_names):
+            tag_ids = []  # 有标签不存在时交集为空
+        if tag_mode == 'and' and tag_ids:
+            first_id, *other_ids = tag_ids
+            stmt = select(card_tag.c.card_id).where(card_tag.c.tag_id == first_id)
+            for tag_id in other_ids:
+                other = card_tag.alias()
+                stmt = stmt.where(select(other.c.card_id).where(
+                    other.c.tag_id == tag_id, other.c.card_id == card_tag.c.card_id).exists())
+            tag_streams.append((stmt, card_tag.c.card_id))
+        elif tag_mode == 'or':
+            tag_streams += [(select(card_tag.c.card_id).where(card_tag.c.tag_id == tag_id), card_tag.c.card_id)
+                            for tag_id in tag_ids]
+    category_streams = [(select(Flashcard.id).where(Flashcard.category_id == category_id), Flashcard.id)
+                        for category_id in category_ids]
+
+    if mode == 'and' and tag_names and category_ids:
+        in_category = select(Flashcard.id).where(
+            Flashcard.id == card_tag.c.card_id, Flashcard.category_id.in_(category_ids)).exists()
+        streams = [(stmt.where(in_category), column) for stmt, column in tag_streams]
+    else:
+        streams = tag_streams + category_streams
+
+    pages = [db.session.execute(stmt.where(column > after).order_by(column).limit(limit + 1)).scalars().all()
+             for stmt, column in streams]
+    card_ids = [card_id for card_id, _ in itertools.islice(itertools.groupby(heapq.merge(*pages)), limit + 1)]
+    has_more = len(card_ids) > limit
+    cards = card_rows_by_ids(card_ids[:limit])
+    tags = card_tags_map([card.id for card in cards])
+
+    return jsonify({
+        'success': True,
+        'cards': [card_row_dict(card, tags.get(card.id)) for card in cards],
+        'next_cursor': card_ids[limit - 1] if has_more else None
+    })
+
+
+# 近似重复检测 - 卡片内容的MinHash签名在写入时增量计算，LSH分段分桶找出候选卡片对，只对候选计算相似度
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16段×4行：相似度0.8的卡片对成为候选的概率约99.6%，0.3时约12%
+LSH_MAX_BUCKET_SIZE = 500  # 超过此大小的桶（通常是空白或极短内容）只按完整签名找完全相同的卡片
+SHINGLE_SIZE = 3  # 按字符切片，中英文都适用
+SIGNATURE_CHUNK_SIZE = 1000
+SIMILAR_DEFAULT_THRESHOLD = 0.8
+MINHASH_PRIME = (1 << 31) - 1
+_minhash_rng = np.random.default_rng(20240601)  # 固定种子，数据库中保存的签名在重启后仍可比较
+MINHASH_A = _minhash_rng.integers(1, MINHASH_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)[:, None]
+MINHASH_B = _minhash_rng.integers(0, MINHASH_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)[:, None]
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def minhash_signature(front, back):
+    """卡片内容的MinHash签名：忽略大小写、标点和空白后按字符切片"""
+    text = _NON_WORD.sub('', front.lower()) + '\x1f' + _NON_WORD.sub('', back.lower())
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    size = min(SHINGLE_SIZE, len(codes))
+    shingles = np.zeros(len(codes) - size + 1, dtype=np.uint64)
+    for i in range(size):
+        shingles = (shingles * 0x110000 + codes[i:len(codes) - size + 1 + i]) % MINHASH_PRIME
+    shingles = np.unique(shingles)
+    return ((MINHASH_A * shingles + MINHASH_B) % MINHASH_PRIME).min(axis=1).astype(np.uint32)
+
+
+def store_card_signatures(cards, replace=False):
+    """计算并保存 (卡片ID, 正面, 背面) 的签名；replace 为真时覆盖已有签名（编辑卡片）"""
+    rows = [{'card_id': card_id, 'signature': minhash_signature(front, back).tobytes()}
+            for card_id, front, back in cards]
+    if not rows:
+        return
+    stmt = sqlite_insert(CardSignature)
+    if replace:
+        stmt = stmt.on_conflict_do_update(index_elements=['card_id'], set_={'signature': stmt.excluded.signature})
+    else:
+        stmt = stmt.on_conflict_do_nothing()
+    db.session.execute(stmt, rows)
+
+
+def card_signature_rows(card_ids, signatures):
+    """预先算好的签名（minhash_signature(...).tobytes()）对应的插入行"""
+    return [{'card_id': card_id, 'signature': signature} for card_id, signature in zip(card_ids, signatures)]
+
+
+def missing_signature_count():
+    """还没有签名的卡片数（早于近似重复检测的卡片，或从旧备份恢复的卡片）"""
+    return db.session.execute(select(func.count(Flashcard.id)).outerjoin(
+        CardSignature, CardSignature.card_id == Flashcard.id
+    ).where(CardSignature.card_id.is_(None))).scalar()
+
+
+def refresh_card_signatures():
+    """为还没有签名的卡片补算签名，返回补算的卡片数"""
+    missing = select(Flashcard.id, Flashcard.front, Flashcard.back).outerjoin(
+        CardSignature, CardSignature.card_id == Flashcard.id
+    ).where(CardSignature.card_id.is_(None))
+    count = 0
+    after = 0
+    while True:
+        # 在请求线程中读取和计算，写线程只负责分块写入
+        cards = db.session.execute(
+            missing.where(Flashcard.id > after).order_by(Flashcard.id).limit(SIGNATURE_CHUNK_SIZE)
+        ).tuples().all()
+        if not cards:
+            return count
+        run_write(lambda: store_card_signatures(cards))
+        count += len(cards)
+        after = cards[-1][0]
+
+
+def load_signatures(category_ids=None):
+    """返回 (卡片ID数组, 签名矩阵)"""
+    query = select(CardSignature.card_id, CardSignature.signature)
+    if category_ids:
+        query = query.join(Flashcard, Flashcard.id == CardSignature.card_id).where(
+            Flashcard.category_id.in_(category_ids))
+    rows = db.session.execute(query.order_by(CardSignature.card_id)).tuples().all()
+    card_ids = np.fromiter((card_id for card_id, _ in rows), dtype=np.int64, count=len(rows))
+    signatures = np.frombuffer(b''.join(signature for _, signature in rows), dtype=np.uint32)
+    return card_ids, signatures.reshape(len(rows), MINHASH_PERMUTATIONS)
+
+
+def _row_keys(signatures):
+    """每行签名按字节视为一个可比较的键"""
+    keys = np.ascontiguousarray(signatures)
+    return keys.view(np.dtype((np.void, keys.itemsize * keys.shape[1]))).ravel()
+
+
+def _band_keys(signatures, band):
+    """一段签名按字节视为一个可比较的键"""
+    width = MINHASH_PERMUTATIONS // LSH_BANDS
+    return _row_keys(signatures[:, band * width:(band + 1) * width])
+
+
+def _identical_pairs(signatures, bucket):
+    """桶内完全相同的签名：每张卡片与同组第一张配对，配对数与桶大小成线性"""
+    _, first, inverse = np.unique(_row_keys(signatures[bucket]), return_index=True, return_inverse=True)
+    leaders = first[inverse.ravel()]
+    others = np.flatnonzero(leaders != np.arange(len(bucket)))
+    return np.stack([bucket[leaders[others]], bucket[others]], axis=1), len(first) > 1
+
+
+def lsh_candidate_pairs(signatures):
+    """各段签名完全相同的行落入同一个桶，返回 (桶内的候选行对 (i, j) 且 i < j, 未完整比较的桶数)
+
+    超过 LSH_MAX_BUCKET_SIZE 的桶只配对签名完全相同的卡片，其中签名不完全相同的桶计为未完整比较。
+    """
+    pairs = [np.empty((0, 2), dtype=np.int64)]
+    truncated = 0
+    for band in range(LSH_BANDS):
+        keys = _band_keys(signatures, band)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.concatenate([[0], np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1])
+        sizes = np.diff(np.append(starts, len(order)))
+        # 大多数桶只有一张卡片，两张卡片的桶直接向量化取出，更大的桶逐个展开
+        pair_starts = starts[sizes == 2]
+        pairs.append(np.stack([order[pair_starts], order[pair_starts + 1]], axis=1))
+        for start, size in zip(starts[sizes > 2], sizes[sizes > 2]):
+            bucket = order[start:start + size]
+            if size <= LSH_MAX_BUCKET_SIZE:
+                i, j = np.triu_indices(size, 1)
+                pairs.append(np.stack([bucket[i], bucket[j]], axis=1))
+            else:
+                identical, partial = _identical_pairs(signatures, bucket)
+                pairs.append(identical)
+                truncated += partial
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0), truncated
+
+
+def similar_card_pairs(threshold, category_ids=None, card_id=None):
+    """返回 ([(卡片ID, 卡片ID, 相似度), ...] 按相似度降序, 未完整比较的桶数)"""
+    card_ids, signatures = load_signatures(category_ids)
+    truncated = 0
+    if card_id is not None:
+        # 只找与指定卡片至少一段签名相同的卡片
+        rows = np.flatnonzero(card_ids == card_id)
+        if not len(rows):
+            return [], 0
+        target = rows[0]
+        matches = np.zeros(len(card_ids), dtype=bool)
+        for band in range(LSH_BANDS):
+            keys = _band_keys(signatures, band)
+            matches |= keys == keys[target]
+        matches[target] = False
+        others = np.flatnonzero(matches)
+        pairs = np.stack([np.full(len(others), target), others], axis=1)
+    else:
+        pairs, truncated = lsh_candidate_pairs(signatures)
+
+    similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    keep = np.flatnonzero(similarity >= threshold)
+    keep = keep[np.argsort(-similarity[keep], kind='stable')]
+    return [(int(card_ids[pairs[k, 0]]), int(card_ids[pairs[k, 1]]), float(similarity[k])) for k in keep], truncated
+
+
+@app.route('/duplicates/similar', methods=['GET'])
+def get_similar_duplicates():
+    """近似重复卡片报告
+
+    参数: threshold=0.8&category_id=1&subtree=1&card_id=5&limit=200
+    相似度为去掉标点和空白后字符切片集合的Jaccard相似度估计值；指定 card_id 时只列出与该卡片相似的卡片。
+    truncated_buckets 大于0时，有内容过短、过于常见的卡片只报告了完全相同的部分；
+    missing_signatures 大于0时，先调用 POST /duplicates/signatures 补算签名。
+    """
+    threshold = request.args.get('threshold', SIMILAR_DEFAULT_THRESHOLD, type=float)
+    if not 0 < threshold <= 1:
+        return jsonify({'success': False, 'error': '相似度阈值应在0到1之间'})
+    category_id = request.args.get('category_id', type=int)
+    card_id = request.args.get('card_id', type=int)
+    limit = min(max(request.args.get('limit', 200, type=int), 1), 1000)
+
+    pairs, truncated = similar_card_pairs(threshold, request_category_ids(category_id), card_id)
+    shown = pairs[:limit]
+    cards = {card.id: card_row_dict(card) for card in iter_card_rows(
+        Flashcard.id.in_({card_id for pair in shown for card_id in pair[:2]}))}
+
+    return jsonify({
+        'success': True,
+        'pair_count': len(pairs),
+        'truncated_buckets': truncated,
+        'missing_signatures': missing_signature_count(),
+        'pairs': [{
+            'similarity': round(similarity, 3),
+            'cards': [cards.get(first_id), cards.get(second_id)]
+        } for first_id, second_id, similarity in shown]
+    })
+
+
+@app.route('/duplicates/signatures', methods=['POST'])
+def refresh_signatures():
+    """为还没有签名的卡片补算签名（新增、编辑和导入的卡片在写入时已计算）"""
+    try:
+        count = refresh_card_signatures()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+    return jsonify({'success': True, 'count': count})
+
+
 @app.route('/categories', methods=['GET'])
 def get_categories():
     """获取所有分类"""
-    categories = Category.query.all()
-    return jsonify([{
-        'id': cat.id,
-        'name': cat.name,
-        'description': cat.description,
-        'card_count': len(cat.cards)
-    } for cat in categories])
+    categories = category_row_dicts()
+    if request.args.get('tree') in ('1', 'true'):
+        return jsonify(category_tree(categories))
+    return jsonify(categories)
 
 
 @app.route('/category/<int:category_id>', methods=['GET'])
@@ -324,14 +2310,15 @@ def get_category(category_id):
     if not category:
         return jsonify({'success': False, 'error': '分类不存在'})
 
-    cards = Flashcard.query.filter_by(category_id=category_id).all()
+    cards = iter_card_rows(Flashcard.category_id.in_(request_category_ids(category_id)))
 
     return jsonify({
         'success': True,
         'category': {
             'id': category.id,
             'name': category.name,
-            'description': category.description
+            'description': category.description,
+            'parent_id': category.parent_id
         },
         'cards': [{
             'id': card.id,
@@ -344,6 +2331,86 @@ def get_category(category_id):
     })
 
 
+# 分类卡片浏览 - 按 (排序列, 卡片ID) 游标分页，(category_id, 排序列, id) 复合索引直接按序读出一页
+CARD_SORT_COLUMNS = {
+    'created': Flashcard.created_date,
+    'next_review': Flashcard.next_review,
+    'ease': Flashcard.ease_factor,
+    'repetition': Flashcard.repetition,
+}
+CATEGORY_PAGE_SIZE = 50
+
+
+def encode_card_cursor(value, card_id):
+    """把上一页最后一张卡片的排序值和ID编码为游标字符串"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, card_id]).encode()).decode()
+
+
+def decode_card_cursor(cursor, column):
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        value, card_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(column.type, db.DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(card_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('无效的分页游标')
+
+
+@app.route('/category/<int:category_id>/cards', methods=['GET'])
+def get_category_cards(category_id):
+    """分页浏览分类中的卡片
+
+    参数: sort=created|next_review|ease|repetition&order=asc|desc&after=<游标>&limit=50&subtree=1
+    第一页（不带 after）同时返回卡片总数。
+    """
+    category = Category.query.get(category_id)
+    if not category:
+        return jsonify({'success': False, 'error': '分类不存在'})
+
+    sort = request.args.get('sort', 'created')
+    order = request.args.get('order', 'asc')
+    if sort not in CARD_SORT_COLUMNS:
+        return jsonify({'success': False, 'error': f'排序方式只能是 {", ".join(CARD_SORT_COLUMNS)}'})
+    if order not in ('asc', 'desc'):
+        return jsonify({'success': False, 'error': '排序方向只能是 asc 或 desc'})
+    limit = min(max(request.args.get('limit', CATEGORY_PAGE_SIZE, type=int), 1), 1000)
+    column = CARD_SORT_COLUMNS[sort]
+
+    category_ids = request_category_ids(category_id)
+    where = [Flashcard.category_id == category_id] if len(category_ids) == 1 else [
+        Flashcard.category_id.in_(category_ids)]
+    after = request.args.get('after')
+    if after:
+        try:
+            value, card_id = decode_card_cursor(after, column)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        position = db.tuple_(column, Flashcard.id)
+        where.append(position > db.tuple_(value, card_id) if order == 'asc' else position < db.tuple_(value, card_id))
+
+    direction = db.asc if order == 'asc' else db.desc
+    stmt = (_card_rows_select().add_columns(column).where(*where)
+            .order_by(direction(column), direction(Flashcard.id)).limit(limit + 1))
+    rows = db.session.execute(stmt).tuples().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    cards = [CardRow._make(row[:-1]) for row in rows]
+    tags = card_tags_map([card.id for card in cards])
+
+    payload = {
+        'success': True,
+        'cards': [card_row_dict(card, tags.get(card.id)) for card in cards],
+        'next_cursor': encode_card_cursor(rows[-1][-1], rows[-1][0]) if has_more else None
+    }
+    if not after:
+        payload['card_count'] = db.session.execute(
+            select(func.count()).select_from(Flashcard).where(*where)).scalar()
+    return jsonify(payload)
+
+
 @app.route('/category', methods=['POST'])
 def create_category():
     """创建新分类"""
@@ -351,6 +2418,7 @@ def create_category():
     name = data.get('name', '').strip()
     description = data.get('description', '').strip()
 
+    name = normalize_category_name(name)
     if not name:
         return jsonify({'success': False, 'error': '分类名称不能为空'})
 
@@ -359,11 +2427,31 @@ def create_category():
     if existing:
         return jsonify({'success': False, 'error': '分类已存在'})
 
-    category = Category(name=name, description=description)
-    db.session.add(category)
-    db.session.commit()
+    category_id = run_write(lambda: get_or_create_category(name, description).id)
+    notify_change('category', category_id=category_id)
+
+    return jsonify({'success': True, 'id': category_id})
+
+
+def _rename_category(category, name):
+    """修改分类的完整路径名，上级改变时一并移动整个子树"""
+    parent = None
+    if CATEGORY_SEPARATOR in name:
+        parent = get_or_create_category(name.rsplit(CATEGORY_SEPARATOR, 1)[0])
+    old_name, old_path = category.name, category.path
+    new_path = f"{parent.path if parent else '/'}{category.id}/"
 
-    return jsonify({'success': True, 'id': category.id})
+    # 子孙分类的名称前缀和路径前缀用一条UPDATE替换
+    low, high = category_path_range(old_path)
+    db.session.execute(
+        update(Category).where(Category.path > low, Category.path < high).values(
+            name=db.literal(name).concat(func.substr(Category.name, len(old_name) + 1)),
+            path=db.literal(new_path).concat(func.substr(Category.path, len(old_path) + 1))),
+        execution_options={'synchronize_session': False}
+    )
+    category.name = name
+    category.parent_id = parent.id if parent else None
+    category.path = new_path
 
 
 @app.route('/category/<int:category_id>', methods=['PUT'])
@@ -377,15 +2465,28 @@ def update_category(category_id):
     if not category:
         return jsonify({'success': False, 'error': '分类不存在'})
 
+    name = normalize_category_name(name)
+    if not name:
+        return jsonify({'success': False, 'error': '分类名称不能为空'})
+
     # 检查新名称是否与其他分类冲突
     if name != category.name:
         existing = Category.query.filter_by(name=name).first()
         if existing:
             return jsonify({'success': False, 'error': '分类名称已存在'})
+        if name.startswith(category.name + CATEGORY_SEPARATOR):
+            return jsonify({'success': False, 'error': '不能将分类移动到自己的子分类下'})
 
-    category.name = name
-    category.description = description
-    db.session.commit()
+    def write():
+        category = Category.query.get(category_id)
+        if not category:
+            return
+        if name != category.name:
+            _rename_category(category, name)
+        category.description = description
+
+    run_write(write)
+    notify_change('category', category_id=category_id)
 
     return jsonify({'success': True})
 
@@ -396,49 +2497,564 @@ def delete_category(category_id):
     category = Category.query.get(category_id)
     if not category:
         return jsonify({'success': False, 'error': '分类不存在'})
+    if Category.query.filter_by(parent_id=category_id).first():
+        return jsonify({'success': False, 'error': '请先删除或移动子分类'})
 
-    # 获取默认分类
-    default_category = Category.query.filter_by(name='默认分类').first()
-    if not default_category:
-        default_category = Category(name='默认分类')
-        db.session.add(default_category)
-        db.session.flush()
+    def write():
+        # 获取默认分类
+        default_category_id = get_or_create_category('默认分类').id
 
-    # 将该分类下的所有卡片移到默认分类
-    for card in category.cards:
-        card.category_id = default_category.id
+        # 将该分类下的所有卡片移到默认分类（单条UPDATE）
+        result = db.session.execute(
+            update(Flashcard).where(Flashcard.category_id == category_id).values(category_id=default_category_id),
+            execution_options={'synchronize_session': False}
+        )
 
-    # 删除分类
-    db.session.delete(category)
-    db.session.commit()
+        # 删除分类
+        db.session.execute(delete(Category).where(Category.id == category_id))
+        return result.rowcount, default_category_id
+
+    moved, default_category_id = run_write(write)
+    due_queue.invalidate([category_id, default_category_id])
+    notify_change('category', category_id=category_id)
+
+    return jsonify({'success': True, 'moved': moved})
+
+
+def _stats_payload(review_count, lapse_count, quality_sum):
+    """由聚合值计算保持率和平均评分"""
+    if not review_count:
+        return {
+            'review_count': 0,
+            'lapse_count': 0,
+            'retention_rate': None,
+            'average_quality': None
+        }
+    return {
+        'review_count': review_count,
+        'lapse_count': lapse_count,
+        'retention_rate': round(1 - lapse_count / review_count, 4),
+        'average_quality': round(quality_sum / review_count, 4)
+    }
+
+
+@app.route('/stats/card/<int:card_id>', methods=['GET'])
+def get_card_stats(card_id):
+    """获取单张卡片的学习统计"""
+    card = Flashcard.query.get(card_id)
+    if not card:
+        return jsonify({'success': False, 'error': '卡片不存在'})
 
-    return jsonify({'success': True})
+    stats = card.stats
+    payload = _stats_payload(
+        stats.review_count if stats else 0,
+        stats.lapse_count if stats else 0,
+        stats.quality_sum if stats else 0
+    )
+
+    first_interval = stats.first_interval if stats else None
+    last_interval = stats.last_interval if stats else None
+    payload.update({
+        'first_interval': first_interval,
+        'current_interval': last_interval,
+        'max_interval': stats.max_interval if stats else 0,
+        'interval_growth': round(last_interval / first_interval, 4) if first_interval and last_interval is not None else None,
+        'last_review': stats.last_review.isoformat() if stats and stats.last_review else None
+    })
+
+    # 最近的复习记录，走 (card_id, review_date) 索引
+    limit = min(max(request.args.get('recent', 20, type=int), 0), 200)
+    recent = ReviewHistory.query.filter_by(card_id=card_id).order_by(
+        ReviewHistory.review_date.desc()
+    ).limit(limit).all() if limit else []
+
+    return jsonify({
+        'success': True,
+        'card_id': card_id,
+        'stats': payload,
+        'recent': [{
+            'review_date': h.review_date.isoformat() if h.review_date else None,
+            'quality': h.quality,
+            'next_interval': h.next_interval
+        } for h in recent]
+    })
+
+
+@app.route('/stats/category/<int:category_id>', methods=['GET'])
+def get_category_stats(category_id):
+    """获取分类的学习统计（基于预聚合统计表）"""
+    category = Category.query.get(category_id)
+    if not category:
+        return jsonify({'success': False, 'error': '分类不存在'})
+
+    row = db.session.query(
+        func.count(Flashcard.id),
+        func.count(CardStats.card_id),
+        func.coalesce(func.sum(CardStats.review_count), 0),
+        func.coalesce(func.sum(CardStats.lapse_count), 0),
+        func.coalesce(func.sum(CardStats.quality_sum), 0),
+        func.avg(CardStats.last_interval),
+        func.avg(CardStats.last_interval / CardStats.first_interval)
+    ).select_from(Flashcard).outerjoin(
+        CardStats, CardStats.card_id == Flashcard.id
+    ).filter(Flashcard.category_id.in_(request_category_ids(category_id))).one()
+
+    card_count, reviewed_count, review_count, lapse_count, quality_sum, avg_interval, avg_growth = row
+    payload = _stats_payload(review_count, lapse_count, quality_sum)
+    payload.update({
+        'card_count': card_count,
+        'reviewed_card_count': reviewed_count,
+        'average_interval': round(avg_interval, 4) if avg_interval is not None else None,
+        'average_interval_growth': round(avg_growth, 4) if avg_growth is not None else None
+    })
+
+    return jsonify({
+        'success': True,
+        'category': {
+            'id': category.id,
+            'name': category.name
+        },
+        'stats': payload
+    })
+
+
+# 导入导出 - 解析与写入逻辑由同步接口和后台任务共用
+IMPORT_CHUNK_SIZE = 1000  # 每批插入/提交的卡片数
+EXPORT_CHUNK_SIZE = 1000  # 导出时每批读取的卡片数
+DEFAULT_IMPORT_CATEGORY = 'imported'
+EXPORT_CSV_HEADER = ['id', 'front', 'back', 'category', 'category_id', 'repetition', 'interval', 'ease_factor',
+                     'next_review', 'tags']
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# TXT格式的行前缀
+TXT_FRONT_PREFIXES = ('Q:', '问题:')
+TXT_BACK_PREFIXES = ('A:', '答案:')
+TXT_CATEGORY_PREFIXES = ('C:', '分类:')
+TXT_TAG_PREFIXES = ('T:', '标签:')
+
+
+def _chunked(iterable, size):
+    """将可迭代对象按固定大小分块"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _strip_prefix(line, prefixes):
+    """若行以任一前缀开头，返回去掉前缀后的内容，否则返回None"""
+    for prefix in prefixes:
+        if line.startswith(prefix):
+            return line[len(prefix):].strip()
+    return None
+
+
+def _csv_column_indices(headers):
+    """根据标题行确定 (正面, 背面, 分类, 标签) 的列索引，没有标签列时为None"""
+    if headers:
+        front_idx = headers.index('front') if 'front' in headers else 0
+        back_idx = headers.index('back') if 'back' in headers else 1
+        category_idx = headers.index('category') if 'category' in headers else 2
+        tags_idx = headers.index('tags') if 'tags' in headers else None
+        return front_idx, back_idx, category_idx, tags_idx
+    return 0, 1, 2, None
+
+
+def _parse_csv_records(lines):
+    """解析CSV文本行，逐条产出 (正面, 背面, 分类, 标签)"""
+    reader = csv.reader(lines)
+    headers = next(reader, None)
+    return _parse_csv_rows(reader, _csv_column_indices(headers))
+
+
+def _parse_csv_rows(reader, column_indices):
+    """解析CSV数据行（不含标题行）"""
+    front_idx, back_idx, category_idx, tags_idx = column_indices
+    for row in reader:
+        if len(row) > max(front_idx, back_idx):
+            front = row[front_idx].strip()
+            back = row[back_idx].strip()
+            category_name = row[category_idx].strip() if len(row) > category_idx else ''
+            tags = row[tags_idx].strip() if tags_idx is not None and len(row) > tags_idx else ''
+
+            if front and back:
+                yield front, back, category_name or DEFAULT_IMPORT_CATEGORY, tags
+
+
+def _parse_txt_records(lines):
+    """解析TXT文本行，卡片之间以空行或分隔线分隔"""
+    current_front = None
+    current_back = None
+    current_category = DEFAULT_IMPORT_CATEGORY
+    current_tags = ''
+
+    for line in lines:
+        line = line.strip()
+        front = _strip_prefix(line, TXT_FRONT_PREFIXES)
+        back = _strip_prefix(line, TXT_BACK_PREFIXES)
+        category_name = _strip_prefix(line, TXT_CATEGORY_PREFIXES)
+        tags = _strip_prefix(line, TXT_TAG_PREFIXES)
+
+        if front is not None:
+            current_front = front
+        elif back is not None:
+            current_back = back
+        elif category_name is not None:
+            current_category = category_name or DEFAULT_IMPORT_CATEGORY
+        elif tags is not None:
+            current_tags = tags
+        elif not line.strip('-'):
+            # 空行或导出文件中的分隔线表示一张卡片结束
+            if current_front and current_back:
+                yield current_front, current_back, current_category, current_tags
+            current_front = None
+            current_back = None
+            current_category = DEFAULT_IMPORT_CATEGORY
+            current_tags = ''
+
+    # 最后一张卡片
+    if current_front and current_back:
+        yield current_front, current_back, current_category, current_tags
+
+
+def _read_excel_frame(stream):
+    """读取Excel文件，返回 (DataFrame, 正面列, 背面列, 分类列, 标签列)"""
+    df = pd.read_excel(stream)
+
+    # 查找合适的列
+    front_col = None
+    back_col = None
+    category_col = None
+    tags_col = None
+
+    for col in df.columns:
+        col_lower = str(col).lower()
+        if 'front' in col_lower or '正面' in col_lower or '问题' in col_lower:
+            front_col = col
+        elif 'back' in col_lower or '背面' in col_lower or '答案' in col_lower:
+            back_col = col
+        elif 'category' in col_lower or '分类' in col_lower:
+            category_col = col
+        elif 'tag' in col_lower or '标签' in col_lower:
+            tags_col = col
+
+    # 如果没有找到特定列，使用前几列
+    if front_col is None and len(df.columns) > 0:
+        front_col = df.columns[0]
+    if back_col is None and len(df.columns) > 1:
+        back_col = df.columns[1]
+    if category_col is None and len(df.columns) > 2:
+        category_col = df.columns[2]
+
+    return df, front_col, back_col, category_col, tags_col
+
+
+def _excel_cell(value):
+    """将Excel单元格转换为去除空白的字符串，空值返回空串"""
+    return str(value).strip() if pd.notna(value) else ''
+
+
+def _parse_excel_records(df, front_col, back_col, category_col, tags_col):
+    """解析Excel数据，逐条产出 (正面, 背面, 分类, 标签)"""
+    if front_col is None or back_col is None:
+        return
+    fronts = df[front_col].tolist()
+    backs = df[back_col].tolist()
+    categories = df[category_col].tolist() if category_col is not None else itertools.repeat(None)
+    tags = df[tags_col].tolist() if tags_col is not None else itertools.repeat(None)
+
+    for front, back, category_name, card_tags in zip(fronts, backs, categories, tags):
+        front = _excel_cell(front)
+        back = _excel_cell(back)
+        if front and back:
+            yield front, back, _excel_cell(category_name) or DEFAULT_IMPORT_CATEGORY, _excel_cell(card_tags)
+
+
+def import_file_ext(filename):
+    """获取导入文件的扩展名（secure_filename会丢弃中文文件名，这里直接取原始扩展名）"""
+    return os.path.splitext(filename or '')[1].lower()
+
+
+def _iter_text_lines(stream, **kwargs):
+    """逐行读取二进制流；读完后分离文本包装器，避免它被回收时关闭调用方仍在使用的文件"""
+    text = io.TextIOWrapper(stream, **kwargs)
+    try:
+        yield from text
+    finally:
+        # 任务中途取消时生成器在文件关闭后才被回收，此时无需（也无法）分离
+        if not stream.closed:
+            text.detach()
+
+
+def iter_import_records(stream, file_ext):
+    """按文件类型解析二进制流，返回 (正面, 背面, 分类, 标签) 记录的迭代器"""
+    if file_ext == '.csv':
+        return _parse_csv_records(_iter_text_lines(stream, encoding='utf-8-sig', newline=''))
+    if file_ext == '.txt':
+        return _parse_txt_records(_iter_text_lines(stream, encoding='utf-8-sig'))
+    if file_ext in EXCEL_EXTENSIONS:
+        return _parse_excel_records(*_read_excel_frame(stream))
+    raise ValueError('不支持的文件格式')
+
+
+# 并行解析 - 大文件按记录边界切块，在进程池中解析和规范化
+_import_pool = None
+_import_pool_lock = threading.Lock()
+
+
+def _get_import_pool(workers):
+    """获取导入解析进程池（使用spawn启动，避免在多线程服务器中fork）"""
+    global _import_pool
+    with _import_pool_lock:
+        if _import_pool is None or _import_pool._max_workers != workers:
+            if _import_pool is not None:
+                _import_pool.shutdown(wait=False)
+            _import_pool = ProcessPoolExecutor(max_workers=workers,
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _import_pool
+
+
+def _csv_chunk_boundaries(path, start, chunk_bytes):
+    """计算CSV切块边界：只在引号之外的换行处切分，保证不切断带换行的字段"""
+    size = os.path.getsize(path)
+    boundaries = [start]
+    quotes = 0  # 已扫描内容中的引号总数，偶数表示当前位于引号之外
+    position = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            quotes += block.count(b'"')
+            position += len(block)
+
+            # 向后读到第一个位于引号之外的行尾
+            while quotes % 2 or (position < size and not block.endswith(b'\n')):
+                line = f.readline()
+                if not line:
+                    break
+                quotes += line.count(b'"')
+                position += len(line)
+                block = line
+
+            if position >= size:
+                break
+            boundaries.append(position)
+    boundaries.append(size)
+    return boundaries
+
+
+def _txt_chunk_boundaries(path, chunk_bytes):
+    """计算TXT切块边界：只在空行或分隔线之后切分"""
+    size = os.path.getsize(path)
+    boundaries = [0]
+    position = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            position += len(block)
+
+            # 读完当前行后，继续向后读到空行或分隔线为止
+            line = f.readline()
+            position += len(line)
+            while line:
+                line = f.readline()
+                position += len(line)
+                if not line.strip().strip(b'-'):
+                    break
+
+            if position >= size:
+                break
+            boundaries.append(position)
+    boundaries.append(size)
+    return boundaries
+
+
+def _parse_import_chunk(path, file_ext, start, end, column_indices):
+    """进程池任务：解析文件中 [start, end) 字节范围内的记录"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8-sig' if start == 0 else 'utf-8')
+
+    lines = io.StringIO(text, newline='' if file_ext == '.csv' else None)
+    if file_ext == '.csv':
+        records = _parse_csv_rows(csv.reader(lines), column_indices)
+    else:
+        records = _parse_txt_records(lines)
+
+    # 复用相同的分类和标签字符串对象，回传结果时pickle只序列化一次
+    interned = {}
+    return [(front, back, interned.setdefault(category_name, category_name), interned.setdefault(tags, tags))
+            for front, back, category_name, tags in records]
+
+
+def parse_import_file_parallel(path, file_ext, workers, chunk_bytes=None):
+    """并行解析CSV/TXT文件，按文件顺序产出 (记录列表, 已解析到的字节偏移)"""
+    chunk_bytes = chunk_bytes or app.config['IMPORT_CHUNK_BYTES']
+    column_indices = None
+
+    if file_ext == '.csv':
+        # 标题行在主进程中解析，数据从标题行之后开始切块
+        with open(path, 'rb') as f:
+            header = f.readline()
+            while header.count(b'"') % 2:
+                line = f.readline()
+                if not line:
+                    break
+                header += line
+        headers = next(csv.reader(io.StringIO(header.decode('utf-8-sig'), newline='')), None)
+        column_indices = _csv_column_indices(headers)
+        boundaries = _csv_chunk_boundaries(path, len(header), chunk_bytes)
+    else:
+        boundaries = _txt_chunk_boundaries(path, chunk_bytes)
+
+    pool = _get_import_pool(workers)
+    ranges = list(zip(boundaries, boundaries[1:]))
+    pending = collections.deque()
+    ranges_iter = iter(ranges)
+
+    # 滑动窗口提交，限制在途块数以控制内存
+    for start, end in itertools.islice(ranges_iter, workers * 2):
+        pending.append((end, pool.submit(_parse_import_chunk, path, file_ext, start, end, column_indices)))
+    while pending:
+        end, future = pending.popleft()
+        for start, next_end in itertools.islice(ranges_iter, 1):
+            pending.append((next_end, pool.submit(_parse_import_chunk, path, file_ext, start, next_end,
+                                                  column_indices)))
+        yield future.result(), end
+
+
+def _category_id_for(name, category_ids):
+    """查找或创建分类，返回其ID（使用缓存避免逐条查询）"""
+    category_id = category_ids.get(name)
+    if category_id is None:
+        category_id = category_ids[name] = get_or_create_category(name).id
+    return category_id
+
+
+def insert_card_records(records, category_ids=None, tag_ids=None, signatures=None):
+    """批量插入一组 (正面, 背面, 分类, 标签) 记录，返回插入的卡片数；signatures 为预先算好的签名"""
+    if category_ids is None:
+        category_ids = {}
+
+    rows = [{
+        'front': front,
+        'back': back,
+        'category_id': _category_id_for(category_name, category_ids)
+    } for front, back, category_name, _ in records]
+    if not rows:
+        return 0
+
+    if signatures is None and not any(tags for *_, tags in records):
+        db.session.execute(insert(Flashcard), rows)
+        return len(rows)
+
+    # 有标签或签名时按参数顺序取回新卡片ID，再批量写入关联
+    card_ids = db.session.execute(
+        insert(Flashcard.__table__).returning(Flashcard.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    parsed = {}
+    add_card_tags([(card_id, parsed.setdefault(tags, parse_tags(tags)))
+                   for card_id, (*_, tags) in zip(card_ids, records) if tags], tag_ids)
+    if signatures is not None:
+        db.session.execute(insert(CardSignature.__table__), card_signature_rows(card_ids, signatures))
+    return len(rows)
+
+
+def write_card_chunk(records, category_ids, tag_ids):
+    """把一块记录作为一个写操作提交，返回插入的卡片数
+
+    签名在调用线程中计算，与卡片一起写入。
+    写操作使用缓存的副本，提交成功后才合并回调用方的缓存，整组回滚重试时不会用到未提交的分类或标签ID。
+    """
+    signatures = [minhash_signature(front, back).tobytes() for front, back, *_ in records]
+
+    def write():
+        categories, tags = dict(category_ids), dict(tag_ids)
+        return insert_card_records(records, categories, tags, signatures), categories, tags
+
+    count, categories, tags = run_write(write)
+    category_ids.update(categories)
+    tag_ids.update(tags)
+    return count
+
+
+def _export_csv_row(card, tags):
+    return [
+        card.id,
+        card.front,
+        card.back,
+        card.category,
+        card.category_id,
+        card.repetition,
+        card.interval,
+        card.ease_factor,
+        card.next_review.isoformat() if card.next_review else '',
+        ','.join(tags)
+    ]
+
+
+def _export_txt_lines(card, tags):
+    lines = [
+        f"问题: {card.front}",
+        f"答案: {card.back}",
+        f"分类: {card.category}",
+        f"重复次数: {card.repetition}",
+        f"间隔天数: {card.interval}",
+    ]
+    if card.next_review:
+        lines.append(f"下次复习: {card.next_review.strftime('%Y-%m-%d %H:%M:%S')}")
+    if tags:
+        lines.append(f"标签: {','.join(tags)}")
+    lines.append("-" * 60)
+    return lines
+
+
+def write_export(fmt, stream, progress=None):
+    """按格式将全部卡片分批写入文本流，返回导出的卡片数
+
+    progress(已导出数, 总数) 每批调用一次，可抛出 JobCancelled 中止导出。
+    """
+    total = Flashcard.query.count() if progress else None
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_CSV_HEADER)
+
+    # 按ID分批查询，批次之间不持有读游标，进度更新可以安全提交
+    count = 0
+    last_id = 0
+    while True:
+        cards = list(iter_card_rows(Flashcard.id > last_id, limit=EXPORT_CHUNK_SIZE))
+        if not cards:
+            break
+        tags = card_tags_map([card.id for card in cards])
+        for card in cards:
+            if writer:
+                writer.writerow(_export_csv_row(card, tags.get(card.id, ())))
+            else:
+                if count:
+                    stream.write('\n')
+                stream.write('\n'.join(_export_txt_lines(card, tags.get(card.id, ()))))
+            count += 1
+        last_id = cards[-1].id
+        if progress:
+            progress(count, total)
+
+    if progress:
+        progress(count, total)
+    return count
 
 
 @app.route('/export/csv')
 def export_csv():
-    cards = Flashcard.query.all()
-
-    # 创建CSV数据
     output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(
-        ['id', 'front', 'back', 'category', 'category_id', 'repetition', 'interval', 'ease_factor', 'next_review'])
-
-    for card in cards:
-        writer.writerow([
-            card.id,
-            card.front,
-            card.back,
-            card.category_name,
-            card.category_id,
-            card.repetition,
-            card.interval,
-            card.ease_factor,
-            card.next_review.isoformat() if card.next_review else ''
-        ])
-
-    output.seek(0)
+    write_export('csv', output)
+
     return send_file(
         io.BytesIO(output.getvalue().encode('utf-8-sig')),
         mimetype='text/csv',
@@ -449,22 +3065,11 @@ def export_csv():
 
 @app.route('/export/txt')
 def export_txt():
-    cards = Flashcard.query.all()
-
-    txt_content = []
-    for card in cards:
-        txt_content.append(f"问题: {card.front}")
-        txt_content.append(f"答案: {card.back}")
-        txt_content.append(f"分类: {card.category_name}")
-        txt_content.append(f"重复次数: {card.repetition}")
-        txt_content.append(f"间隔天数: {card.interval}")
-        if card.next_review:
-            txt_content.append(f"下次复习: {card.next_review.strftime('%Y-%m-%d %H:%M:%S')}")
-        txt_content.append("-" * 60)
-
-    output = io.BytesIO("\n".join(txt_content).encode('utf-8'))
+    output = io.StringIO()
+    write_export('txt', output)
+
     return send_file(
-        output,
+        io.BytesIO(output.getvalue().encode('utf-8')),
         mimetype='text/plain',
         as_attachment=True,
         download_name='flashcards.txt'
@@ -477,162 +3082,48 @@ def import_cards():
     if not file:
         return jsonify({'success': False, 'error': 'No file provided'})
 
-    filename = secure_filename(file.filename)
-    file_ext = os.path.splitext(filename)[1].lower()
+    file_ext = import_file_ext(file.filename)
+    if file_ext == APKG_EXTENSION:
+        return import_apkg_file(file)
 
     try:
-        count = 0
-
-        if file_ext == '.csv':
-            # 导入CSV
-            content = file.read().decode('utf-8').splitlines()
-            reader = csv.reader(content)
+        records = iter_import_records(file.stream, file_ext)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
 
-            headers = next(reader, None)
+    try:
+        # 在请求线程中解析完毕（格式错误时不写入任何卡片），再逐块交给写线程；大文件应使用 /jobs/import
+        chunks = list(_chunked(records, IMPORT_CHUNK_SIZE))
+    except Exception as e:
+        app.logger.error(f'导入失败: {str(e)}')
+        return jsonify({'success': False, 'error': f'导入失败: {str(e)}'})
 
-            # 确定列索引
-            if headers:
-                try:
-                    front_idx = headers.index('front') if 'front' in headers else 0
-                    back_idx = headers.index('back') if 'back' in headers else 1
-                    category_idx = headers.index('category') if 'category' in headers else 2
-                except ValueError:
-                    front_idx, back_idx, category_idx = 0, 1, 2
-            else:
-                front_idx, back_idx, category_idx = 0, 1, 2
-
-            for row in reader:
-                if len(row) > max(front_idx, back_idx):
-                    front = row[front_idx].strip()
-                    back = row[back_idx].strip()
-                    category_name = row[category_idx].strip() if len(row) > category_idx else 'imported'
-
-                    if front and back:
-                        # 查找或创建分类
-                        category = Category.query.filter_by(name=category_name).first()
-                        if not category:
-                            category = Category(name=category_name)
-                            db.session.add(category)
-                            db.session.flush()
-
-                        card = Flashcard(
-                            front=front,
-                            back=back,
-                            category_id=category.id
-                        )
-                        db.session.add(card)
-                        count += 1
-
-        elif file_ext == '.txt':
-            # 简单的TXT导入
-            content = file.read().decode('utf-8')
-            lines = content.split('\n')
+    count, error = write_import_chunks(chunks)
+    if error:
+        return jsonify({'success': False, 'error': error})
+    return jsonify({'success': True, 'message': f'成功导入 {count} 张卡片'})
 
-            current_front = None
-            current_back = None
-            current_category = 'imported'
-
-            for line in lines:
-                line = line.strip()
-                if line.startswith('Q:') or line.startswith('问题:'):
-                    current_front = line[2:].strip()
-                elif line.startswith('A:') or line.startswith('答案:'):
-                    current_back = line[2:].strip()
-                elif line.startswith('C:') or line.startswith('分类:'):
-                    current_category = line[2:].strip()
-                elif not line and current_front and current_back:
-                    # 查找或创建分类
-                    category = Category.query.filter_by(name=current_category).first()
-                    if not category:
-                        category = Category(name=current_category)
-                        db.session.add(category)
-                        db.session.flush()
-
-                    card = Flashcard(
-                        front=current_front,
-                        back=current_back,
-                        category_id=category.id
-                    )
-                    db.session.add(card)
-                    count += 1
-                    current_front = None
-                    current_back = None
-                    current_category = 'imported'
-
-            # 添加最后一张卡片
-            if current_front and current_back:
-                category = Category.query.filter_by(name=current_category).first()
-                if not category:
-                    category = Category(name=current_category)
-                    db.session.add(category)
-                    db.session.flush()
-
-                card = Flashcard(
-                    front=current_front,
-                    back=current_back,
-                    category_id=category.id
-                )
-                db.session.add(card)
-                count += 1
-
-        elif file_ext in ['.xlsx', '.xls']:
-            # Excel文件导入
-            import pandas as pd
-            df = pd.read_excel(file)
-
-            # 查找合适的列
-            front_col = None
-            back_col = None
-            category_col = None
-
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if 'front' in col_lower or '正面' in col_lower or '问题' in col_lower:
-                    front_col = col
-                elif 'back' in col_lower or '背面' in col_lower or '答案' in col_lower:
-                    back_col = col
-                elif 'category' in col_lower or '分类' in col_lower:
-                    category_col = col
-
-            # 如果没有找到特定列，使用前几列
-            if front_col is None and len(df.columns) > 0:
-                front_col = df.columns[0]
-            if back_col is None and len(df.columns) > 1:
-                back_col = df.columns[1]
-            if category_col is None and len(df.columns) > 2:
-                category_col = df.columns[2]
-
-            for _, row in df.iterrows():
-                front = str(row[front_col]).strip() if front_col and pd.notna(row[front_col]) else ''
-                back = str(row[back_col]).strip() if back_col and pd.notna(row[back_col]) else ''
-                category_name = str(row[category_col]).strip() if category_col and pd.notna(
-                    row[category_col]) else 'imported'
-
-                if front and back:
-                    # 查找或创建分类
-                    category = Category.query.filter_by(name=category_name).first()
-                    if not category:
-                        category = Category(name=category_name)
-                        db.session.add(category)
-                        db.session.flush()
-
-                    card = Flashcard(
-                        front=front,
-                        back=back,
-                        category_id=category.id
-                    )
-                    db.session.add(card)
-                    count += 1
-        else:
-            return jsonify({'success': False, 'error': '不支持的文件格式'})
 
-        db.session.commit()
-        return jsonify({'success': True, 'message': f'成功导入 {count} 张卡片'})
+def write_import_chunks(chunks):
+    """逐块写入已解析的记录，每块一个写操作，块之间其他请求的写操作可以插队执行
 
+    返回 (卡片数, 错误信息)；中途出错时已提交的块保留，错误信息中给出已导入的数量。
+    """
+    count = 0
+    category_ids = {}
+    tag_ids = {}
+    error = None
+    try:
+        for chunk in chunks:
+            count += write_card_chunk(chunk, category_ids, tag_ids)
     except Exception as e:
-        db.session.rollback()
         app.logger.error(f'导入失败: {str(e)}')
-        return jsonify({'success': False, 'error': f'导入失败: {str(e)}'})
+        error = f'导入失败: {str(e)}' + (f'（已导入 {count} 张卡片）' if count else '')
+
+    if count:
+        due_queue.invalidate(category_ids.values())
+        notify_change('import', count=count)
+    return count, error
 
 
 @app.route('/import/batch', methods=['POST'])
@@ -641,35 +3132,870 @@ def import_batch():
     try:
         data = request.json
         cards = data.get('cards', [])
-        count = 0
 
+        records = []
         for card_data in cards:
             front = card_data.get('front', '').strip()
             back = card_data.get('back', '').strip()
-            category_name = card_data.get('category', 'imported').strip()
+            category_name = card_data.get('category', DEFAULT_IMPORT_CATEGORY).strip()
+            tags = ','.join(parse_tags(card_data.get('tags')))
 
             if front and back:
-                # 查找或创建分类
-                category = Category.query.filter_by(name=category_name).first()
-                if not category:
-                    category = Category(name=category_name)
-                    db.session.add(category)
-                    db.session.flush()
-
-                card = Flashcard(
-                    front=front,
-                    back=back,
-                    category_id=category.id
-                )
-                db.session.add(card)
-                count += 1
+                records.append((front, back, category_name or DEFAULT_IMPORT_CATEGORY, tags))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
 
-        db.session.commit()
-        return jsonify({'success': True, 'count': count})
+    count, error = write_import_chunks(_chunked(records, IMPORT_CHUNK_SIZE))
+    if error:
+        return jsonify({'success': False, 'error': error, 'count': count})
+    return jsonify({'success': True, 'count': count})
+
+
+# Anki导入 - 从.apkg压缩包中流式取出集合数据库，卡片、调度状态和复习记录分块批量写入
+APKG_EXTENSION = '.apkg'
+APKG_COLLECTION_MEMBERS = ('collection.anki21', 'collection.anki2')  # 新版导出中的 anki2 只是提示升级的占位集合
+ANKI_FIELD_SEPARATOR = '\x1f'
+ANKI_EASE_QUALITY = {1: 0, 2: 2, 3: 4, 4: 5}  # 重来/困难/良好/简单 -> SM-2评分
+ANKI_DEFAULT_DECK_ID = 1  # Anki内置的默认牌组（名称随语言不同），导入到默认分类
+
+# 每张卡片最后一次"重来"之后的连续答对次数，对应SM-2的重复次数
+ANKI_STREAK_SQL = """
+    SELECT r.cid, COUNT(*)
+    FROM revlog r
+    WHERE r.ease > 1
+      AND r.id > COALESCE((SELECT MAX(f.id) FROM revlog f WHERE f.cid = r.cid AND f.ease = 1), 0)
+    GROUP BY r.cid
+"""
+
+
+def _extract_apkg_collection(stream, tmp_dir):
+    """将.apkg中的集合数据库分块复制到临时文件，不整体读入内存"""
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ValueError('无效的Anki文件')
+
+    with archive:
+        names = set(archive.namelist())
+        member = next((name for name in APKG_COLLECTION_MEMBERS if name in names), None)
+        if 'collection.anki21b' in names and member != 'collection.anki21':
+            raise ValueError('不支持新版Anki压缩格式，请在Anki导出时勾选"支持旧版Anki"')
+        if member is None:
+            raise ValueError('Anki文件中没有卡片集合')
+
+        path = os.path.join(tmp_dir, 'collection.sqlite')
+        with archive.open(member) as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    return path
+
+
+def _anki_deck_names(conn):
+    """返回 {牌组ID: 分类名}，子牌组 A::B 转为 A/B，Anki的默认牌组及其子牌组放到默认分类下"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'decks' in tables:  # 2.1.28 之后的集合格式，牌组单独成表
+        names = {deck_id: name.replace(ANKI_FIELD_SEPARATOR, '/')
+                 for deck_id, name in conn.execute('SELECT id, name FROM decks')}
+    else:
+        decks = json.loads(conn.execute('SELECT decks FROM col').fetchone()[0] or '{}')
+        names = {int(deck_id): deck['name'].replace('::', '/') for deck_id, deck in decks.items()}
+
+    default_name = names.get(ANKI_DEFAULT_DECK_ID)
+    if default_name:
+        for deck_id, name in names.items():
+            if name == default_name or name.startswith(default_name + '/'):
+                names[deck_id] = '默认分类' + name[len(default_name):]
+    return names
+
+
+def _anki_card_sides(fields, ordinal):
+    """由笔记字段得到卡片正反面：第二个模板视为反向卡片，填空题始终以第一个字段为正面（不渲染模板）"""
+    fields = [field.strip() for field in fields.split(ANKI_FIELD_SEPARATOR)]
+    if ordinal == 1 and len(fields) > 1 and '{{c' not in fields[0]:
+        fields[0], fields[1] = fields[1], fields[0]
+    return fields[0], '\n'.join(field for field in fields[1:] if field)
+
+
+def _anki_interval(ivl):
+    """Anki间隔为正数时单位是天，负数时是秒（学习中的卡片）"""
+    return float(ivl) if ivl >= 0 else -ivl / 86400
+
+
+def _anki_next_review(card_type, due, collection_start, now):
+    if card_type == 0:  # 新卡片的 due 是排队序号
+        return now
+    if due > 1_000_000_000:  # 学习队列中的 due 是时间戳
+        return datetime.utcfromtimestamp(due)
+    return collection_start + timedelta(days=due)  # 复习卡片的 due 是集合创建后的天数
+
+
+def import_apkg(stream, progress=None):
+    """导入Anki .apkg文件，返回 (卡片数, 复习记录数, {分类名: 分类ID})
+
+    在调用线程中解压和读取集合，卡片和复习记录每块作为一个写操作交给写线程。
+    progress(已导入卡片数, 进度) 每块调用一次，可抛出 JobCancelled 中止导入（已写入的块保留）。
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(_extract_apkg_collection(stream, tmp_dir))
+        try:
+            return _import_anki_collection(conn, progress)
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f'无法读取Anki集合: {e}')
+        finally:
+            conn.close()
+
+
+def _import_anki_collection(conn, progress):
+    collection_start = datetime.utcfromtimestamp(conn.execute('SELECT crt FROM col').fetchone()[0])
+    deck_names = _anki_deck_names(conn)
+    streaks = dict(conn.execute(ANKI_STREAK_SQL))
+    total = (conn.execute('SELECT COUNT(*) FROM cards').fetchone()[0] +
+             conn.execute('SELECT COUNT(*) FROM revlog WHERE ease BETWEEN 1 AND 4').fetchone()[0])
+    now = datetime.utcnow()
+
+    category_ids = {}
+    tag_ids = {}
+    card_ids = {}  # Anki卡片ID -> 本地卡片ID
+    processed = 0
+
+    # 插入时按参数顺序返回ID，用于把复习记录关联到新卡片
+    # 直接对表执行Core插入，绕过ORM批量持久化的逐行开销
+    insert_cards = insert(Flashcard.__table__).returning(Flashcard.id, sort_by_parameter_order=True)
+    insert_reviews = insert(ReviewHistory.__table__)
+    cursor = conn.execute("""
+        SELECT c.id, c.did, c.odid, c.ord, c.type, c.due, c.odue, c.ivl, c.factor, n.flds, n.tags
+        FROM cards c JOIN notes n ON n.id = c.nid
+        ORDER BY c.id
+    """)
+    while True:
+        rows = cursor.fetchmany(IMPORT_CHUNK_SIZE)
+        if not rows:
+            break
+
+        anki_ids = []
+        values = []
+        category_names = []
+        note_tags = []
+        for (anki_id, deck_id, original_deck_id, ordinal, card_type, due, original_due, ivl, factor, fields,
+             tags) in rows:
+            front, back = _anki_card_sides(fields, ordinal)
+            if not front or not back:
+                continue
+            if original_deck_id:  # 筛选牌组中的卡片按原牌组和原到期时间导入
+                deck_id, due = original_deck_id, original_due
+
+            anki_ids.append(anki_id)
+            category_names.append(deck_names.get(deck_id) or DEFAULT_IMPORT_CATEGORY)
+            note_tags.append(tags.split())  # Anki标签以空格分隔
+            values.append({
+                'front': front,
+                'back': back,
+                'repetition': streaks.get(anki_id, 0) if card_type else 0,
+                'interval': _anki_interval(ivl),
+                'ease_factor': max(MIN_EASE_FACTOR, factor / 1000) if factor else 2.5,
+                'next_review': _anki_next_review(card_type, due, collection_start, now),
+                'created_date': now,
+            })
+
+        if values:
+            signatures = [minhash_signature(value['front'], value['back']).tobytes() for value in values]
+
+            def write():
+                # 使用缓存副本，整组回滚重试时不会用到未提交的分类或标签ID
+                categories, tag_cache = dict(category_ids), dict(tag_ids)
+                for value, category_name in zip(values, category_names):
+                    value['category_id'] = _category_id_for(category_name, categories)
+                new_ids = db.session.execute(insert_cards, values).scalars().all()
+                add_card_tags([(card_id, tags) for card_id, tags in zip(new_ids, note_tags) if tags], tag_cache)
+                db.session.execute(insert(CardSignature.__table__), card_signature_rows(new_ids, signatures))
+                return new_ids, categories, tag_cache
+
+            new_ids, categories, tag_cache = run_write(write)
+            category_ids.update(categories)
+            tag_ids.update(tag_cache)
+            card_ids.update(zip(anki_ids, new_ids))
+        processed += len(rows)
+        if progress:
+            progress(len(card_ids), processed / total)
+
+    review_count = 0
+    cursor = conn.execute('SELECT cid, id, ease, ivl FROM revlog WHERE ease BETWEEN 1 AND 4 ORDER BY cid, id')
+    while True:
+        rows = cursor.fetchmany(IMPORT_CHUNK_SIZE)
+        if not rows:
+            break
+
+        values = [{
+            'card_id': card_ids[anki_id],
+            'review_date': datetime.utcfromtimestamp(review_id / 1000),
+            'quality': ANKI_EASE_QUALITY[ease],
+            'next_interval': _anki_interval(ivl),
+        } for anki_id, review_id, ease, ivl in rows if anki_id in card_ids]
+        if values:
+            def write():
+                db.session.execute(insert_reviews, values)
+
+            run_write(write)
+            review_count += len(values)
+        processed += len(rows)
+        if progress:
+            progress(len(card_ids), processed / total)
+
+    if review_count:
+        # 新卡片ID都大于已有卡片，只需重建这部分统计
+        min_card_id = min(card_ids.values())
+
+        def write():
+            rebuild_card_stats(min_card_id=min_card_id)
+
+        run_write(write)
+    return len(card_ids), review_count, category_ids
+
+
+def import_apkg_file(file):
+    """同步导入上传的.apkg文件（/import 接口使用）"""
+    try:
+        count, review_count, category_ids = import_apkg(file.stream)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
+    except Exception as e:
+        # 出错前已写入的块会保留
+        app.logger.error(f'Anki导入失败: {str(e)}')
+        due_queue.invalidate()
+        notify_change('import')
+        return jsonify({'success': False, 'error': f'导入失败: {str(e)}'})
+
+    due_queue.invalidate(category_ids.values())
+    notify_change('import', count=count)
+    return jsonify({'success': True, 'message': f'成功导入 {count} 张卡片和 {review_count} 条复习记录'})
+
+
+# 后台任务 - 导入导出在线程池中分块执行，请求立即返回任务ID
+JOB_FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'utf-8-sig'),
+    'txt': ('text/plain', 'utf-8'),
+}
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+_cancelled_jobs = set()
+
+
+class JobCancelled(Exception):
+    """任务被用户取消"""
+
+
+def get_jobs_dir():
+    """任务文件（上传的导入文件、导出结果）存放目录"""
+    jobs_dir = os.path.join(app.instance_path, 'jobs')
+    os.makedirs(jobs_dir, exist_ok=True)
+    return jobs_dir
+
+
+def submit_job(job_id, func, *args):
+    """将任务提交到后台线程池"""
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'],
+                                               thread_name_prefix='flashcard-job')
+    _job_executor.submit(_run_job, current_database.get(), job_id, func, *args)
+
+
+def _run_job(user_id, job_id, func, *args):
+    """在提交任务的用户数据库和独立的应用上下文中执行任务，并记录最终状态"""
+    current_database.set(user_id)
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return
+        # 任务记录只通过写线程更新，本线程中的对象仅用于读取
+        db.session.expunge(job)
+
+        if job_id in _cancelled_jobs or job.cancel_requested:
+            save_job(job, status='cancelled', finished_date=datetime.utcnow())
+            _cancelled_jobs.discard(job_id)
+            return
+
+        save_job(job, status='running', started_date=datetime.utcnow())
+
+        try:
+            result = {'message': func(job, *args), 'status': 'completed', 'progress': 1.0}
+        except JobCancelled:
+            result = {'status': 'cancelled', 'message': f'任务已取消，已处理 {job.rows} 张卡片'}
+        except Exception as e:
+            app.logger.error(f'后台任务 {job_id} 失败: {str(e)}')
+            result = {'status': 'failed', 'error': str(e)}
+        finally:
+            db.session.rollback()
+
+        save_job(job, finished_date=datetime.utcnow(), **result)
+        _cancelled_jobs.discard(job_id)
+        if job.kind == 'import' and job.rows:
+            notify_change('import', count=job.rows, job_id=job_id)
+
+
+def save_job(job, **values):
+    """通过写线程更新任务记录，并同步到本线程中的任务对象"""
+    for key, value in values.items():
+        setattr(job, key, value)
+    job_id = job.id
+
+    def write():
+        db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+
+    run_write(write)
+
+
+def _update_job_progress(job, rows, progress):
+    """更新任务进度和处理速度，若任务已被取消则抛出 JobCancelled"""
+    elapsed = (datetime.utcnow() - job.started_date).total_seconds()
+    save_job(job, rows=rows, progress=min(max(progress, 0.0), 1.0),
+             rows_per_second=round(rows / elapsed, 1) if elapsed > 0 else None)
+    if job.id in _cancelled_jobs:
+        raise JobCancelled()
+
+
+def _import_job(job, file_ext):
+    """后台导入任务：分块解析并插入，每块单独提交以免长时间占用写锁"""
+    if file_ext == APKG_EXTENSION:
+        try:
+            return _apkg_import_job(job)
+        finally:
+            os.remove(job.file_path)
+
+    workers = app.config['IMPORT_WORKERS']
+    size = os.path.getsize(job.file_path)
+    if file_ext in ('.csv', '.txt') and workers > 1 and size >= app.config['IMPORT_PARALLEL_MIN_BYTES']:
+        try:
+            return _parallel_import_job(job, file_ext, workers, size)
+        finally:
+            os.remove(job.file_path)
+
+    try:
+        with open(job.file_path, 'rb') as f:
+            if file_ext in EXCEL_EXTENSIONS:
+                frame = _read_excel_frame(f)
+                total_rows = len(frame[0])
+                records = _parse_excel_records(*frame)
+            else:
+                total_bytes = os.fstat(f.fileno()).st_size
+                records = iter_import_records(f, file_ext)
+
+            count = 0
+            category_ids = {}
+            tag_ids = {}
+            for chunk in _chunked(records, IMPORT_CHUNK_SIZE):
+                count += write_card_chunk(chunk, category_ids, tag_ids)
+                due_queue.invalidate(category_ids.values())
+                if file_ext in EXCEL_EXTENSIONS:
+                    progress = count / total_rows if total_rows else 1.0
+                else:
+                    progress = f.tell() / total_bytes if total_bytes else 1.0
+                _update_job_progress(job, count, progress)
+
+            _update_job_progress(job, count, 1.0)
+            return f'成功导入 {count} 张卡片'
+    finally:
+        os.remove(job.file_path)
+
+
+def _parallel_import_job(job, file_ext, workers, size):
+    """大文件导入：进程池并行解析，由当前线程单独负责批量写入"""
+    count = 0
+    category_ids = {}
+    tag_ids = {}
+    for records, end in parse_import_file_parallel(job.file_path, file_ext, workers):
+        for chunk in _chunked(records, IMPORT_CHUNK_SIZE):
+            count += write_card_chunk(chunk, category_ids, tag_ids)
+            due_queue.invalidate(category_ids.values())
+            _update_job_progress(job, count, end / size if size else 1.0)
+
+    _update_job_progress(job, count, 1.0)
+    return f'成功导入 {count} 张卡片'
+
+
+def _apkg_import_job(job):
+    """Anki导入任务：卡片和复习记录分块写入并提交"""
+    def progress(count, fraction):
+        _update_job_progress(job, count, fraction)
+
+    try:
+        with open(job.file_path, 'rb') as f:
+            count, review_count, category_ids = import_apkg(f, progress)
+    except BaseException:
+        # 取消或出错前已写入的块会保留
+        due_queue.invalidate()
+        raise
+    due_queue.invalidate(category_ids.values())
+    _update_job_progress(job, count, 1.0)
+    return f'成功导入 {count} 张卡片和 {review_count} 条复习记录'
+
+
+def _export_job(job, fmt):
+    """后台导出任务：分批写入任务目录中的文件"""
+    _, encoding = EXPORT_FORMATS[fmt]
+
+    def progress(count, total):
+        _update_job_progress(job, count, count / total if total else 1.0)
+
+    with open(job.file_path, 'w', encoding=encoding, newline='') as f:
+        count = write_export(fmt, f, progress)
+    return f'成功导出 {count} 张卡片'
+
+
+@app.route('/jobs/import', methods=['POST'])
+def create_import_job():
+    """上传文件并创建后台导入任务"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'success': False, 'error': 'No file provided'})
+
+    file_ext = import_file_ext(file.filename)
+    if file_ext not in ('.csv', '.txt', APKG_EXTENSION) + EXCEL_EXTENSIONS:
+        return jsonify({'success': False, 'error': '不支持的文件格式'})
+
+    job_id = uuid.uuid4().hex
+    file_path = os.path.join(get_jobs_dir(), f'{job_id}{file_ext}')
+    file.save(file_path)
+
+    filename = file.filename
+
+    def write():
+        db.session.add(Job(id=job_id, kind='import', filename=filename, file_path=file_path))
+
+    run_write(write)
+
+    submit_job(job_id, _import_job, file_ext)
+    return jsonify({'success': True, 'job_id': job_id})
+
+
+@app.route('/jobs/export/<fmt>', methods=['POST'])
+def create_export_job(fmt):
+    """创建后台导出任务"""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': '不支持的文件格式'})
+
+    job_id = uuid.uuid4().hex
+    file_path = os.path.join(get_jobs_dir(), f'{job_id}.{fmt}')
+
+    def write():
+        db.session.add(Job(id=job_id, kind='export', filename=f'flashcards.{fmt}', file_path=file_path))
+
+    run_write(write)
+
+    submit_job(job_id, _export_job, fmt)
+    return jsonify({'success': True, 'job_id': job_id})
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """获取最近的任务"""
+    jobs = Job.query.order_by(Job.created_date.desc()).limit(20).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询任务状态和进度"""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'})
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消任务（已完成的块不会回滚）"""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'})
+    if job.status in JOB_FINISHED_STATUSES:
+        return jsonify({'success': False, 'error': '任务已结束'})
 
+    _cancelled_jobs.add(job_id)
+
+    def write():
+        db.session.execute(update(Job).where(Job.id == job_id).values(cancel_requested=True))
+
+    run_write(write)
+    return jsonify({'success': True})
+
+
+@app.route('/jobs/<job_id>/download', methods=['GET'])
+def download_job_result(job_id):
+    """下载导出任务的结果文件"""
+    job = db.session.get(Job, job_id)
+    if not job or job.kind != 'export':
+        return jsonify({'success': False, 'error': '任务不存在'})
+    if job.status != 'completed' or not os.path.exists(job.file_path):
+        return jsonify({'success': False, 'error': '导出尚未完成'})
+
+    fmt = os.path.splitext(job.file_path)[1][1:]
+    mimetype, _ = EXPORT_FORMATS[fmt]
+    return send_file(job.file_path, mimetype=mimetype, as_attachment=True, download_name=job.filename)
+
+
+# SM-2参数优化 - 用NumPy向量化重放复习历史，批量评估候选参数
+SM2_PARAM_BOUNDS = {
+    'ease_fail_delta': (-0.4, 0.0),
+    'ease_hard_delta': (-0.3, 0.1),
+    'ease_good_delta': (0.0, 0.3),
+    'hard_interval_factor': (0.2, 1.0),
+    'first_interval': (0.5, 3.0),
+    'second_interval': (2.0, 12.0),
+}
+SM2_PARAM_NAMES = list(DEFAULT_SM2_PARAMS)
+SM2_TARGET_RETENTION = 0.9  # 假设复习间隔到期时的记忆保持率
+SM2_INITIAL_EASE = 2.5
+SM2_SIMULATION_CELLS = 4_000_000  # 每批 候选数×卡片数 的上限，控制内存
+
+
+class ReviewReplay:
+    """按卡片分组、按时间排序的复习历史，预先拆分为"第k次复习"的批次"""
+
+    def __init__(self, card_ids, review_days, qualities):
+        self.review_count = len(card_ids)
+        self.steps = []
+        if not self.review_count:
+            self.card_count = 0
+            self.scored_count = 0
+            return
+
+        first = np.ones(self.review_count, dtype=bool)
+        first[1:] = card_ids[1:] != card_ids[:-1]
+        card_index = np.cumsum(first) - 1
+        starts = np.flatnonzero(first)
+        step = np.arange(self.review_count) - starts[card_index]
+
+        elapsed = np.zeros(self.review_count)
+        elapsed[1:] = review_days[1:] - review_days[:-1]
+
+        self.card_count = len(starts)
+        self.scored_count = self.review_count - self.card_count
+
+        order = np.argsort(step, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(step))))
+        for k in range(len(offsets) - 1):
+            index = order[offsets[k]:offsets[k + 1]]
+            self.steps.append((
+                card_index[index],
+                qualities[index],
+                elapsed[index] if k else None,  # 第一次复习没有上次间隔可评估
+            ))
+
+
+def load_review_replays(min_reviews):
+    """读取全部复习历史，返回 {作用域: ReviewReplay}（全局 + 复习数足够的分类）"""
+    rows = db.session.execute(db.text("""
+        SELECT h.card_id, c.category_id, julianday(h.review_date), h.quality
+        FROM review_history h
+        JOIN flashcard c ON c.id = h.card_id
+        ORDER BY h.card_id, h.review_date, h.id
+    """)).fetchall()
+    if not rows:
+        return {}
+
+    data = np.array(rows, dtype=np.float64)
+    card_ids = data[:, 0].astype(np.int64)
+    category_ids = data[:, 1].astype(np.int64)
+    review_days = data[:, 2]
+    qualities = data[:, 3].astype(np.int64)
+
+    replays = {'global': ReviewReplay(card_ids, review_days, qualities)}
+    categories, counts = np.unique(category_ids, return_counts=True)
+    for category_id, count in zip(categories, counts):
+        if count >= min_reviews:
+            mask = category_ids == category_id
+            replays[f'category:{category_id}'] = ReviewReplay(card_ids[mask], review_days[mask], qualities[mask])
+    return replays
+
+
+def _simulate_sm2_loss(replay, candidates):
+    """用候选参数重放复习历史，返回每组参数的平均对数损失
+
+    每次复习前，卡片按候选参数得到的间隔视为记忆稳定度，
+    预测记忆概率 = 目标保持率 ^ (实际间隔 / 计划间隔)，与实际是否记住比较。
+    状态更新规则与 Flashcard.update_after_review 保持一致。
+    """
+    count = len(candidates)
+    p = {name: candidates[:, i][:, None] for i, name in enumerate(SM2_PARAM_NAMES)}
+    repetition = np.zeros((count, replay.card_count), dtype=np.int32)
+    interval = np.zeros((count, replay.card_count))
+    ease = np.full((count, replay.card_count), SM2_INITIAL_EASE)
+    loss = np.zeros(count)
+
+    for cards, quality, elapsed in replay.steps:
+        r = repetition[:, cards]
+        i = interval[:, cards]
+        e = ease[:, cards]
+
+        if elapsed is not None:
+            prob = SM2_TARGET_RETENTION ** (elapsed / np.maximum(i, 1.0))
+            prob = np.clip(prob, 1e-4, 1 - 1e-4)
+            loss -= np.where(quality >= 2, np.log(prob), np.log1p(-prob)).sum(axis=1)
+
+        fail = quality < 2
+        hard = quality == 2
+        interval[:, cards] = np.where(fail, 0.0, np.where(
+            r == 0, p['first_interval'], np.where(
+                hard, np.maximum(1.0, i * p['hard_interval_factor']), np.where(
+                    r == 1, p['second_interval'], i * e))))
+        repetition[:, cards] = np.where(fail, 0, np.where(hard, np.maximum(0, r - 1), r + 1))
+        delta = np.where(quality == 0, p['ease_fail_delta'],
+                         np.where(hard, p['ease_hard_delta'], p['ease_good_delta']))
+        ease[:, cards] = np.maximum(MIN_EASE_FACTOR, e + delta)
+
+    return loss / max(replay.scored_count, 1)
+
+
+def _evaluate_sm2_candidates(replay, candidates):
+    """分批评估候选参数，控制状态矩阵的内存占用"""
+    batch = max(1, SM2_SIMULATION_CELLS // max(replay.card_count, 1))
+    return np.concatenate([_simulate_sm2_loss(replay, candidates[i:i + batch])
+                           for i in range(0, len(candidates), batch)])
+
+
+def optimize_sm2_params(replay, rounds=4, samples=48, seed=0):
+    """随机搜索 + 逐轮缩小范围，返回 (最优参数, 最优损失, 默认参数损失)"""
+    rng = np.random.default_rng(seed)
+    lows = np.array([SM2_PARAM_BOUNDS[name][0] for name in SM2_PARAM_NAMES])
+    highs = np.array([SM2_PARAM_BOUNDS[name][1] for name in SM2_PARAM_NAMES])
+
+    best = np.array([DEFAULT_SM2_PARAMS[name] for name in SM2_PARAM_NAMES])
+    baseline_loss = best_loss = float(_evaluate_sm2_candidates(replay, best[None, :])[0])
+
+    for round_index in range(rounds):
+        if round_index == 0:
+            candidates = rng.uniform(lows, highs, (samples, len(SM2_PARAM_NAMES)))
+        else:
+            width = (highs - lows) * 0.5 ** round_index
+            candidates = np.clip(best + rng.uniform(-0.5, 0.5, (samples, len(SM2_PARAM_NAMES))) * width,
+                                 lows, highs)
+        losses = _evaluate_sm2_candidates(replay, candidates)
+        index = int(np.argmin(losses))
+        if losses[index] < best_loss:
+            best, best_loss = candidates[index], float(losses[index])
+
+    params = {name: round(float(value), 4) for name, value in zip(SM2_PARAM_NAMES, best)}
+    return params, best_loss, baseline_loss
+
+
+@app.cli.command('optimize-sm2')
+@click.option('--min-reviews', default=1000, show_default=True, help='分类单独调优所需的最少复习次数')
+@click.option('--rounds', default=4, show_default=True, help='搜索轮数')
+@click.option('--samples', default=48, show_default=True, help='每轮评估的候选参数组数')
+@click.option('--dry-run', is_flag=True, help='只输出结果，不写入参数表')
+@click.option('--user', 'user_id', default=None, help='多用户模式下操作该用户的数据库')
+def optimize_sm2_command(min_reviews, rounds, samples, dry_run, user_id):
+    """根据复习历史调优SM-2参数：flask --app app optimize-sm2"""
+    use_cli_user(user_id)
+    started = time.perf_counter()
+    replays = load_review_replays(min_reviews)
+    click.echo(f'读取复习历史: {time.perf_counter() - started:.1f} 秒')
+    if not replays:
+        click.echo('没有复习历史，跳过')
+        return
+
+    for scope, replay in replays.items():
+        scope_started = time.perf_counter()
+        params, loss, baseline_loss = optimize_sm2_params(replay, rounds=rounds, samples=samples)
+        click.echo(f'{scope}: {replay.review_count} 次复习, 损失 {baseline_loss:.4f} -> {loss:.4f}, '
+                   f'{time.perf_counter() - scope_started:.1f} 秒, 参数 {params}')
+
+        if not dry_run:
+            row = db.session.get(SchedulerParams, scope) or SchedulerParams(scope=scope)
+            row.params = json.dumps(params)
+            row.review_count = replay.review_count
+            row.loss = loss
+            row.baseline_loss = baseline_loss
+            row.updated_date = datetime.utcnow()
+            db.session.add(row)
+
+    db.session.commit()
+    invalidate_scheduler_params()
+    click.echo(f'完成，总耗时 {time.perf_counter() - started:.1f} 秒')
+
+
+@app.route('/scheduler/params', methods=['GET'])
+def get_scheduler_params_route():
+    """查看某个分类当前生效的SM-2参数"""
+    category_id = request.args.get('category_id', type=int)
+    return jsonify({'success': True, 'params': get_scheduler_params(category_id)})
+
+
+# 备份与恢复 - 使用SQLite在线备份API分步复制，复制期间其他请求仍可正常读写
+BACKUP_PAGES_PER_STEP = 1024  # 每步复制的页数
+BACKUP_STEP_SLEEP = 0.005  # 每步之间让出数据库锁的时间(秒)
+BACKUP_KEEP = 5  # 备份目录中保留的备份文件数
+BACKUP_REQUIRED_TABLES = ('category', 'flashcard', 'review_history')
+
+
+def get_database_path():
+    """当前数据库文件的绝对路径"""
+    return current_engine().url.database
+
+
+def get_backups_dir():
+    """备份文件存放目录（多用户模式下每个用户单独一个目录）"""
+    user_id = current_database.get()
+    if user_id is None:
+        backups_dir = os.path.join(app.instance_path, 'backups')
+    else:
+        backups_dir = os.path.join(os.path.dirname(get_user_database_path(user_id)), 'backups')
+    os.makedirs(backups_dir, exist_ok=True)
+    return backups_dir
+
+
+def backup_database(dest_path, compress=False):
+    """将当前数据库在线备份到 dest_path，compress 为 True 时输出gzip压缩文件"""
+    raw_path = dest_path + '.tmp' if compress else dest_path
+
+    source = sqlite3.connect(get_database_path())
+    target = sqlite3.connect(raw_path)
+    try:
+        with target:
+            source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        target.close()
+        source.close()
+
+    if compress:
+        with open(raw_path, 'rb') as src, gzip.open(dest_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(raw_path)
+    return dest_path
+
+
+def _prune_backups(backups_dir):
+    """只保留最近的若干个备份文件"""
+    backups = sorted(
+        (os.path.join(backups_dir, name) for name in os.listdir(backups_dir) if name.startswith('flashcards-')),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    for path in backups[BACKUP_KEEP:]:
+        os.remove(path)
+
+
+def restore_database(source_path):
+    """用备份文件（.db 或 .db.gz）覆盖当前数据库内容"""
+    temp_path = None
+    if source_path.endswith('.gz'):
+        fd, temp_path = tempfile.mkstemp(suffix='.db', dir=get_backups_dir())
+        with os.fdopen(fd, 'wb') as dst, gzip.open(source_path, 'rb') as src:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        source_path = temp_path
+
+    try:
+        source = sqlite3.connect(source_path)
+        try:
+            try:
+                tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+                check = source.execute('PRAGMA quick_check').fetchone()[0]
+            except sqlite3.DatabaseError:
+                raise ValueError('不是有效的SQLite数据库文件')
+            missing = [table for table in BACKUP_REQUIRED_TABLES if table not in tables]
+            if missing:
+                raise ValueError(f'备份文件缺少数据表: {", ".join(missing)}')
+            if check != 'ok':
+                raise ValueError(f'备份文件已损坏: {check}')
+
+            # 关闭连接池中的连接，恢复后重新建立
+            db.session.remove()
+            current_engine().dispose()
+
+            target = sqlite3.connect(get_database_path())
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    # 备份可能来自旧版本，补齐新增的表
+    init_database()
+    due_queue.invalidate()
+    due_load.invalidate()
+    notify_change('restore')
+
+
+@app.route('/backup', methods=['GET'])
+def backup():
+    """下载数据库完整快照（卡片、分类、复习历史）"""
+    compress = request.args.get('compress', '0').lower() in ('1', 'true', 'yes')
+    backups_dir = get_backups_dir()
+    filename = f"flashcards-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db" + ('.gz' if compress else '')
+
+    try:
+        path = backup_database(os.path.join(backups_dir, filename), compress=compress)
+        _prune_backups(backups_dir)
     except Exception as e:
-        db.session.rollback()
+        app.logger.error(f'备份失败: {str(e)}')
+        return jsonify({'success': False, 'error': f'备份失败: {str(e)}'})
+
+    return send_file(
+        path,
+        mimetype='application/gzip' if compress else 'application/x-sqlite3',
+        as_attachment=True,
+        download_name=filename
+    )
+
+
+@app.route('/restore', methods=['POST'])
+def restore():
+    """从上传的备份文件恢复数据库"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'success': False, 'error': 'No file provided'})
+
+    suffix = '.db.gz' if file.filename.lower().endswith('.gz') else '.db'
+    fd, upload_path = tempfile.mkstemp(suffix=suffix, dir=get_backups_dir())
+    os.close(fd)
+    try:
+        file.save(upload_path)
+        restore_database(upload_path)
+    except ValueError as e:
         return jsonify({'success': False, 'error': str(e)})
+    except Exception as e:
+        app.logger.error(f'恢复失败: {str(e)}')
+        return jsonify({'success': False, 'error': f'恢复失败: {str(e)}'})
+    finally:
+        os.remove(upload_path)
+
+    return jsonify({'success': True})
+
+
+@app.cli.command('backup')
+@click.argument('output', required=False)
+@click.option('--gzip', 'compress', is_flag=True, help='输出gzip压缩的备份文件')
+@click.option('--user', 'user_id', default=None, help='多用户模式下操作该用户的数据库')
+def backup_command(output, compress, user_id):
+    """在线备份数据库：flask --app app backup [输出文件] [--gzip]"""
+    use_cli_user(user_id)
+    if not output:
+        output = os.path.join(get_backups_dir(),
+                              f"flashcards-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db" + ('.gz' if compress else ''))
+    started = datetime.now()
+    backup_database(output, compress=compress)
+    elapsed = (datetime.now() - started).total_seconds()
+    click.echo(f'备份完成: {output} ({os.path.getsize(output) / 1024 / 1024:.1f} MB, {elapsed:.1f} 秒)')
+
+
+@app.cli.command('restore')
+@click.argument('backup_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'user_id', default=None, help='多用户模式下操作该用户的数据库')
+def restore_command(backup_file, user_id):
+    """从备份文件恢复数据库：flask --app app restore <备份文件>"""
+    use_cli_user(user_id)
+    try:
+        restore_database(backup_file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'已从 {backup_file} 恢复数据库')
 
 
 # 添加静态文件路由
@@ -705,7 +4031,9 @@ def run_server():
     webbrowser.open('http://localhost:5000')
 
     # 使用 waitress 作为生产服务器
-    serve(app, host='0.0.0.0', port=5000)
+    # SSE长连接各占用一个线程，线程数需覆盖事件连接数并留出普通请求的余量
+    serve(app, host='0.0.0.0', port=5000, threads=app.config['SSE_MAX_CLIENTS'] + 8)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # 打包后并行导入的子进程需要
     run_server()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+导入解析性能测试 - 比较单进程与进程池并行解析大文件的速度
+
+用法: python benchmark_import.py [行数] [csv|txt]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app import iter_import_records, parse_import_file_parallel
+
+
+def generate_file(path, rows, file_ext):
+    """生成测试文件，约一成的卡片背面包含换行"""
+    rng = random.Random(42)
+    categories = ['英语学习', '数学公式', '编程知识', '']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if file_ext == '.csv':
+            writer = csv.writer(f)
+            writer.writerow(['front', 'back', 'category'])
+            for i in range(rows):
+                back = f'答案 {i}' + ('\n第二行, 带"引号"' if rng.random() < 0.1 else '')
+                writer.writerow([f'  问题 {i} ', back, rng.choice(categories)])
+        else:
+            for i in range(rows):
+                category = rng.choice(categories)
+                f.write(f'Q: 问题 {i}\nA: 答案 {i}\n')
+                if category:
+                    f.write(f'C: {category}\n')
+                f.write('\n')
+
+
+def bench_sequential(path, file_ext):
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        count = sum(1 for _ in iter_import_records(f, file_ext))
+    return count, time.perf_counter() - start
+
+
+def bench_parallel(path, file_ext, workers):
+    # 预热进程池，不计入子进程的启动时间
+    list(parse_import_file_parallel(path, file_ext, workers, chunk_bytes=1024))
+    start = time.perf_counter()
+    count = sum(len(records) for records, _ in parse_import_file_parallel(path, file_ext, workers))
+    return count, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    file_ext = '.' + (sys.argv[2] if len(sys.argv) > 2 else 'csv')
+    cpu_count = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f'benchmark{file_ext}')
+        print(f'生成测试文件: {rows} 行 {file_ext} ...')
+        generate_file(path, rows, file_ext)
+        print(f'文件大小: {os.path.getsize(path) / 1024 / 1024:.1f} MB, CPU核心数: {cpu_count}')
+        print('-' * 60)
+
+        count, baseline = bench_sequential(path, file_ext)
+        print(f'{"单进程":<10}{count:>12} 张 {baseline:>8.2f} 秒 {count / baseline:>12.0f} 张/秒  1.00x')
+
+        workers = 1
+        while True:
+            count, elapsed = bench_parallel(path, file_ext, workers)
+            print(f'{workers:>3} 进程   {count:>12} 张 {elapsed:>8.2f} 秒 {count / elapsed:>12.0f} 张/秒  '
+                  f'{baseline / elapsed:.2f}x')
+            if workers >= cpu_count:
+                break
+            workers = min(workers * 2, cpu_count)
+
+
+if __name__ == '__main__':
+    main()
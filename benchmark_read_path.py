@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+读取路径性能测试 - 比较ORM实例与Core select轻量元组在内存和序列化耗时上的差异
+
+在临时目录中新建的数据库上运行（借用多用户模式的数据库路由），不会读写 flashcards.db。
+用法: python benchmark_read_path.py [卡片数]
+"""
+
+import gc
+import json
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+from app import app, db, current_database, init_database, Category, Flashcard, iter_card_rows, card_row_dict
+
+
+def orm_card_dict(card):
+    """与改造前 /cards 相同的ORM序列化方式"""
+    return {
+        'id': card.id,
+        'front': card.front,
+        'back': card.back,
+        'category': card.category_name,
+        'category_id': card.category_id,
+        'repetition': card.repetition,
+        'interval': card.interval,
+        'ease_factor': card.ease_factor,
+        'next_review': card.next_review.isoformat() if card.next_review else None
+    }
+
+
+def load_orm():
+    return Flashcard.query.all()
+
+
+def load_rows():
+    return list(iter_card_rows())
+
+
+def measure(load, serialize):
+    """返回 (卡片数, 每张卡片常驻内存字节数, 加载秒数, 序列化秒数)"""
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    cards = load()
+    load_seconds = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    json.dumps([serialize(card) for card in cards], ensure_ascii=False)
+    serialize_seconds = time.perf_counter() - start
+
+    count = len(cards)
+    del cards
+    db.session.expunge_all()
+    return count, memory / max(count, 1), load_seconds, serialize_seconds
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    # 用户数据库位于 instance_path/users/<用户>/ 下，指向临时目录即可与正式数据库隔离
+    temp_dir = tempfile.mkdtemp(prefix='flashcard-bench-')
+    app.instance_path = temp_dir
+    current_database.set('benchmark')
+    try:
+        run(count)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run(count):
+    with app.app_context():
+        init_database()
+        category_ids = [category.id for category in Category.query.all()]
+        print(f'插入测试卡片: {count} 张...')
+        db.session.execute(insert(Flashcard), [{
+            'front': f'问题 {i} ' + 'x' * 40,
+            'back': f'答案 {i} ' + 'y' * 80,
+            'category_id': category_ids[i % len(category_ids)]
+        } for i in range(count)])
+
+        try:
+            # 预热，避免首次查询的编译开销计入结果
+            measure(load_orm, orm_card_dict)
+            measure(load_rows, card_row_dict)
+
+            print('-' * 72)
+            print(f'{"方式":<10}{"卡片数":>10}{"字节/张":>12}{"加载(秒)":>12}{"序列化(秒)":>14}')
+            results = {}
+            for name, load, serialize in [('ORM', load_orm, orm_card_dict),
+                                          ('Core元组', load_rows, card_row_dict)]:
+                rows, per_card, load_seconds, serialize_seconds = measure(load, serialize)
+                results[name] = (per_card, load_seconds + serialize_seconds)
+                print(f'{name:<10}{rows:>10}{per_card:>12.0f}{load_seconds:>12.3f}{serialize_seconds:>14.3f}')
+
+            print('-' * 72)
+            orm_memory, orm_time = results['ORM']
+            row_memory, row_time = results['Core元组']
+            print(f'内存减少 {orm_memory / row_memory:.1f}x，总耗时加快 {orm_time / row_time:.1f}x')
+        finally:
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,12 +17,15 @@ datas = []
 # 1. 静态文件
 static_files = [
     ('static/css/style.css', 'static/css'),
+    ('static/js/render.js', 'static/js'),
     ('static/js/script.js', 'static/js'),
+    ('static/js/benchmark.js', 'static/js'),
 ]
 
 # 2. 模板文件
 template_files = [
     ('templates/index.html', 'templates'),
+    ('templates/benchmark.html', 'templates'),
 ]
 
 # 3. 其他资源文件（如果有）
@@ -48,6 +51,7 @@ hiddenimports = [
     'sqlalchemy.sql.default_comparator',
     'jinja2.ext',
     'pandas',
+    'numpy',
     'openpyxl',
     'openpyxl.worksheet._writer',
     'waitress',
@@ -57,7 +61,6 @@ hiddenimports = [
 excludes = [
     'matplotlib',
     'scipy',
-    'numpy',
     'pytest',
     'tkinter',
     'PyQt5',
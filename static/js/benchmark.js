@@ -0,0 +1,196 @@
+// 渲染性能测试 - 比较侧边栏全量渲染与虚拟列表的滚动帧时间，以及复习时有无预渲染的卡片切换耗时
+
+const FRAME_BUDGET = 1000 / 60;
+const BENCH_ROW_HEIGHT = 104;
+const SCROLL_FRAMES = 300;     // 每项滚动测试的帧数
+const SWITCH_COUNT = 60;       // 卡片切换次数
+const SWITCH_THINK_MS = 200;   // 两次切换之间模拟的翻面/评分间隔
+
+const SAMPLE_CARDS = [
+    ['二次方程 $ax^2 + bx + c = 0$ 的求根公式？', '$$x = \\frac{-b \\pm \\sqrt{b^2 - 4ac}}{2a}$$'],
+    ['**欧拉公式**是什么？', '$$e^{i\\pi} + 1 = 0$$\n\n一般形式 $e^{ix} = \\cos x + i\\sin x$'],
+    ['高斯积分', '$$\\int_{-\\infty}^{\\infty} e^{-x^2}\\,dx = \\sqrt{\\pi}$$'],
+    ['矩阵乘法 $AB$ 的元素', '$$(AB)_{ij} = \\sum_{k=1}^{n} a_{ik} b_{kj}$$\n\n- 要求 $A$ 的列数等于 $B$ 的行数\n- 一般 $AB \\ne BA$'],
+    ['泰勒展开', '$$f(x) = \\sum_{n=0}^{\\infty} \\frac{f^{(n)}(a)}{n!}(x-a)^n$$'],
+    ['`ephemeral` 的意思', '*adj.* 短暂的，转瞬即逝的\n\n> Fame in the age of social media is often ephemeral.'],
+];
+
+// 生成测试卡片，字段与 /category/<id>/cards 返回的一致
+function generateCards(count) {
+    const now = Date.now();
+    const cards = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const [front, back] = SAMPLE_CARDS[i % SAMPLE_CARDS.length];
+        cards[i] = {
+            id: i + 1,
+            front: `#${i + 1} ${front}`,
+            back,
+            repetition: i % 7,
+            next_review: new Date(now + (i % 30 - 10) * 86400000).toISOString()
+        };
+    }
+    return cards;
+}
+
+// 与主界面侧边栏相同结构的卡片行
+function renderBenchRow(card) {
+    const row = document.createElement('div');
+    row.className = 'card-list-item';
+    const isToday = new Date(card.next_review) <= new Date();
+    row.innerHTML = `
+        <div class="card-list-content">
+            <div class="card-list-front">${escapeHtml(card.front)}</div>
+            <div class="card-list-back">${escapeHtml(card.back)}</div>
+            <div class="card-list-footer">
+                <span>复习次数: ${card.repetition}</span>
+                <span style="color: ${isToday ? 'var(--danger-color)' : 'var(--gray-500)'}">
+                    ${new Date(card.next_review).toLocaleDateString('zh-CN')}
+                </span>
+            </div>
+        </div>
+        <div class="card-list-actions">
+            <button class="btn-icon btn-secondary" title="编辑"><i class="fas fa-edit"></i></button>
+            <button class="btn-icon btn-danger" title="删除"><i class="fas fa-trash"></i></button>
+        </div>
+    `;
+    return row;
+}
+
+function nextFrame() {
+    return new Promise(resolve => requestAnimationFrame(resolve));
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+// 匀速滚动到底部，返回每帧间隔
+async function measureScroll(container) {
+    container.scrollTop = 0;
+    await nextFrame();
+    const step = Math.max(1, (container.scrollHeight - container.clientHeight) / SCROLL_FRAMES);
+    const frames = [];
+    let last = await nextFrame();
+    for (let i = 0; i < SCROLL_FRAMES; i++) {
+        container.scrollTop += step;
+        const now = await nextFrame();
+        frames.push(now - last);
+        last = now;
+    }
+    return frames;
+}
+
+function summarize(samples) {
+    const sorted = [...samples].sort((a, b) => a - b);
+    const pick = q => sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+    return {
+        count: sorted.length,
+        p50: pick(0.5),
+        p95: pick(0.95),
+        max: sorted[sorted.length - 1],
+        slow: sorted.filter(value => value > FRAME_BUDGET).length / sorted.length
+    };
+}
+
+function addResult(name, setupMs, samples) {
+    const stats = summarize(samples);
+    const row = document.createElement('tr');
+    row.innerHTML = `
+        <td>${name}</td>
+        <td>${setupMs === null ? '-' : setupMs.toFixed(0)}</td>
+        <td>${stats.count}</td>
+        <td>${stats.p50.toFixed(1)}</td>
+        <td>${stats.p95.toFixed(1)}</td>
+        <td>${stats.max.toFixed(1)}</td>
+        <td>${(stats.slow * 100).toFixed(1)}%</td>
+    `;
+    document.getElementById('bench-results').appendChild(row);
+}
+
+function setStatus(text) {
+    document.getElementById('bench-status').textContent = text;
+}
+
+// 全量渲染：一次性为所有卡片创建DOM节点（改造前的侧边栏做法）
+async function benchFullList(container, cards) {
+    container.innerHTML = '';
+    const start = performance.now();
+    const fragment = document.createDocumentFragment();
+    cards.forEach(card => fragment.appendChild(renderBenchRow(card)));
+    container.appendChild(fragment);
+    container.getBoundingClientRect();  // 强制布局，计入准备时间
+    const setupMs = performance.now() - start;
+    await nextFrame();
+    const frames = await measureScroll(container);
+    container.innerHTML = '';
+    return { setupMs, frames };
+}
+
+// 虚拟列表：只创建可见区域的行
+async function benchVirtualList(container, cards) {
+    container.innerHTML = '';
+    const start = performance.now();
+    const list = new VirtualList(container, { rowHeight: BENCH_ROW_HEIGHT, renderRow: renderBenchRow });
+    list.setItems(cards);
+    container.getBoundingClientRect();
+    const setupMs = performance.now() - start;
+    await nextFrame();
+    const frames = await measureScroll(container);
+    list.destroy();
+    return { setupMs, frames };
+}
+
+// 卡片切换：与复习界面一样写入正反面HTML并渲染公式，记录切换当帧的耗时
+async function benchCardSwitch(element, cards, cache) {
+    const durations = [];
+    for (let i = 0; i < cards.length; i++) {
+        const start = performance.now();
+        const card = cards[i];
+        const rendered = cache ? cache.get(card) : { frontHtml: renderMarkdownSafely(card.front), backHtml: renderMarkdownSafely(card.back) };
+        element.innerHTML = `<div>${rendered.frontHtml}</div><hr><div>${rendered.backHtml}</div>`;
+        element.getBoundingClientRect();
+        durations.push(performance.now() - start);
+        if (cache) cache.renderAhead(cards, i + 1);
+        await sleep(SWITCH_THINK_MS);
+    }
+    return durations;
+}
+
+async function runBenchmarks() {
+    const button = document.getElementById('bench-run');
+    const container = document.getElementById('bench-list');
+    const cardElement = document.getElementById('bench-card');
+    const count = parseInt(document.getElementById('bench-count').value, 10) || 100000;
+
+    button.disabled = true;
+    document.getElementById('bench-results').innerHTML = '';
+    try {
+        setStatus('生成测试卡片...');
+        const cards = generateCards(count);
+
+        setStatus('虚拟列表滚动...');
+        const virtual = await benchVirtualList(container, cards);
+        addResult(`虚拟列表滚动（${count} 张）`, virtual.setupMs, virtual.frames);
+
+        setStatus('全量渲染滚动（卡片较多时需要较长时间）...');
+        await nextFrame();
+        const full = await benchFullList(container, cards);
+        addResult(`全量渲染滚动（${count} 张）`, full.setupMs, full.frames);
+
+        // 每次切换使用不同的卡片对象，避免marked/KaTeX内部缓存影响结果
+        const reviewCards = generateCards(SWITCH_COUNT);
+        setStatus('卡片切换（无预渲染）...');
+        addResult('卡片切换（无预渲染）', null, await benchCardSwitch(cardElement, reviewCards, null));
+
+        setStatus('卡片切换（预渲染）...');
+        const cache = new CardRenderCache();
+        addResult('卡片切换（空闲时预渲染后3张）', null, await benchCardSwitch(cardElement, reviewCards, cache));
+
+        setStatus(`完成，预渲染缓存命中 ${cache.hits} 次，未命中 ${cache.misses} 次`);
+    } catch (error) {
+        console.error('性能测试失败:', error);
+        setStatus('测试失败：' + error.message);
+    } finally {
+        button.disabled = false;
+    }
+}
@@ -0,0 +1,251 @@
+// 渲染工具 - Markdown/KaTeX渲染、卡片预渲染缓存和虚拟列表，主界面和性能测试页共用
+
+// 配置marked以支持数学公式 - 安全版本
+marked.setOptions({
+    breaks: true,
+    gfm: true,
+    sanitize: false,
+    highlight: function(code, lang) {
+        return code;
+    }
+});
+
+// 增强的Markdown渲染函数，支持数学公式
+function renderMarkdownWithMath(text) {
+    if (!text) return '';
+
+    // 定义数学公式的正则表达式
+    const inlineMathRegex = /(?<!\\)\$(?!\$)(.*?)(?<!\\)\$(?!\$)/g;
+    const blockMathRegex = /(?<!\\)\$\$(.*?)(?<!\\)\$\$/gs;
+
+    // 先处理块级公式
+    let processed = text;
+    const blockMatches = [];
+
+    // 查找并临时替换块级公式
+    processed = processed.replace(blockMathRegex, (match, formula) => {
+        const id = `math-block-${Date.now()}-${Math.random().toString(36).substr(2)}`;
+        blockMatches.push({ id, formula: formula.trim() });
+        return `{{${id}}}`;
+    });
+
+    // 查找并临时替换行内公式
+    const inlineMatches = [];
+    processed = processed.replace(inlineMathRegex, (match, formula) => {
+        const id = `math-inline-${Date.now()}-${Math.random().toString(36).substr(2)}`;
+        inlineMatches.push({ id, formula: formula.trim() });
+        return `{{${id}}}`;
+    });
+
+    // 使用marked渲染Markdown
+    let html = marked.parse(processed);
+
+    // 替换回数学公式
+    blockMatches.forEach(({ id, formula }) => {
+        try {
+            const rendered = katex.renderToString(formula, {
+                throwOnError: false,
+                displayMode: true
+            });
+            html = html.replace(`{{${id}}}`, `<div class="math-container math-block">${rendered}</div>`);
+        } catch (err) {
+            console.warn('块级数学公式渲染错误:', err);
+            html = html.replace(`{{${id}}}`, `<div class="math-error">$$${formula}$$</div>`);
+        }
+    });
+
+    inlineMatches.forEach(({ id, formula }) => {
+        try {
+            const rendered = katex.renderToString(formula, {
+                throwOnError: false,
+                displayMode: false
+            });
+            html = html.replace(`{{${id}}}`, `<span class="math-inline">${rendered}</span>`);
+        } catch (err) {
+            console.warn('行内数学公式渲染错误:', err);
+            html = html.replace(`{{${id}}}`, `<span class="math-error">$${formula}$</span>`);
+        }
+    });
+
+    return html;
+}
+
+// 安全渲染Markdown
+function renderMarkdownSafely(text) {
+    if (!text) return '';
+
+    try {
+        // 使用自定义的数学公式渲染器
+        return renderMarkdownWithMath(text);
+    } catch (error) {
+        console.error('Markdown渲染错误:', error);
+        // 如果渲染失败，返回纯文本
+        return `<div class="plain-text-content">${escapeHtml(text)}</div>`;
+    }
+}
+
+// HTML转义函数
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// 卡片预渲染缓存：复习时在浏览器空闲时提前渲染后面几张卡片，切换卡片时直接使用渲染结果
+class CardRenderCache {
+    constructor(maxEntries = 50) {
+        this.maxEntries = maxEntries;
+        this.entries = new Map();  // 卡片ID -> { front, back, frontHtml, backHtml }，按使用顺序淘汰
+        this.idleHandle = null;
+        this.hits = 0;
+        this.misses = 0;
+    }
+
+    // 取得卡片的渲染结果，未缓存或内容已修改时立即渲染
+    get(card) {
+        if (!this.has(card)) {
+            this.misses++;
+            return this.store(card);
+        }
+        this.hits++;
+        const entry = this.entries.get(card.id);
+        this.entries.delete(card.id);
+        this.entries.set(card.id, entry);
+        return entry;
+    }
+
+    has(card) {
+        const entry = this.entries.get(card.id);
+        return Boolean(entry && entry.front === card.front && entry.back === card.back);
+    }
+
+    store(card) {
+        const entry = {
+            front: card.front,
+            back: card.back,
+            frontHtml: renderMarkdownSafely(card.front),
+            backHtml: renderMarkdownSafely(card.back)
+        };
+        this.entries.delete(card.id);
+        this.entries.set(card.id, entry);
+        while (this.entries.size > this.maxEntries) {
+            this.entries.delete(this.entries.keys().next().value);
+        }
+        return entry;
+    }
+
+    // 在空闲时间渲染 cards[start, start + count)，每张卡片渲染前检查剩余空闲时间
+    renderAhead(cards, start, count = 3) {
+        if (this.idleHandle !== null) cancelIdle(this.idleHandle);
+        const pending = cards.slice(Math.max(start, 0), start + count).filter(card => !this.has(card));
+        const work = deadline => {
+            this.idleHandle = null;
+            while (pending.length && (deadline.didTimeout || deadline.timeRemaining() > 4)) {
+                this.store(pending.shift());
+            }
+            if (pending.length) this.idleHandle = requestIdle(work);
+        };
+        if (pending.length) this.idleHandle = requestIdle(work);
+    }
+
+    clear() {
+        this.entries.clear();
+    }
+}
+
+// requestIdleCallback 在部分浏览器（Safari）中不可用，退化为短延时
+function requestIdle(callback) {
+    if (window.requestIdleCallback) return window.requestIdleCallback(callback, { timeout: 1000 });
+    return window.setTimeout(() => callback({ didTimeout: true, timeRemaining: () => 0 }), 50);
+}
+
+function cancelIdle(handle) {
+    if (window.cancelIdleCallback) window.cancelIdleCallback(handle);
+    else window.clearTimeout(handle);
+}
+
+// 虚拟列表：行高固定，只为可见区域及上下 overscan 行创建DOM节点，滚动时按帧更新
+class VirtualList {
+    constructor(container, { rowHeight, renderRow, overscan = 6, onNearEnd = null }) {
+        this.container = container;
+        this.rowHeight = rowHeight;
+        this.renderRow = renderRow;
+        this.overscan = overscan;
+        this.onNearEnd = onNearEnd;
+        this.items = [];
+        this.rows = new Map();  // 行号 -> 已创建的DOM节点
+        this.frame = null;
+
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'virtual-list-spacer';
+        container.appendChild(this.spacer);
+        this.onScroll = () => this.scheduleUpdate();
+        container.addEventListener('scroll', this.onScroll, { passive: true });
+    }
+
+    setItems(items) {
+        this.items = items;
+        this.spacer.style.height = `${items.length * this.rowHeight}px`;
+        this.refresh();
+    }
+
+    // 数据在末尾追加后调用，保留已创建的行
+    appended() {
+        this.spacer.style.height = `${this.items.length * this.rowHeight}px`;
+        this.update();
+    }
+
+    // 丢弃已创建的行并按当前数据重新生成（选择状态等变化时使用）
+    refresh() {
+        this.rows.forEach(row => row.remove());
+        this.rows.clear();
+        this.update();
+    }
+
+    scheduleUpdate() {
+        if (this.frame !== null) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.update();
+        });
+    }
+
+    update() {
+        // 容器折叠时高度为0，仍按一屏行数预先创建，展开后无需等待滚动事件
+        const viewport = this.container.clientHeight || this.rowHeight * 10;
+        // 数据变少后浏览器要到下一次布局才会收回 scrollTop，这里先按内容高度截断
+        const scrollTop = Math.min(this.container.scrollTop, Math.max(0, this.items.length * this.rowHeight - viewport));
+        const first = Math.max(0, Math.floor(scrollTop / this.rowHeight) - this.overscan);
+        const last = Math.min(this.items.length, Math.ceil((scrollTop + viewport) / this.rowHeight) + this.overscan);
+
+        this.rows.forEach((row, index) => {
+            if (index < first || index >= last) {
+                row.remove();
+                this.rows.delete(index);
+            }
+        });
+
+        const fragment = document.createDocumentFragment();
+        for (let index = first; index < last; index++) {
+            if (this.rows.has(index)) continue;
+            const row = this.renderRow(this.items[index]);
+            row.classList.add('virtual-row');
+            row.style.top = `${index * this.rowHeight}px`;
+            row.style.height = `${this.rowHeight}px`;
+            this.rows.set(index, row);
+            fragment.appendChild(row);
+        }
+        this.spacer.appendChild(fragment);
+
+        if (this.onNearEnd && last >= this.items.length - this.overscan) {
+            this.onNearEnd();
+        }
+    }
+
+    destroy() {
+        if (this.frame !== null) cancelAnimationFrame(this.frame);
+        this.container.removeEventListener('scroll', this.onScroll);
+        this.spacer.remove();
+        this.rows.clear();
+    }
+}
@@ -1,10 +1,13 @@
 // 全局变量
-let currentCards = [];
-let todayCards = [];
+let todayCards = [];  // 已加载的今日卡片，复习接近末尾时继续加载下一页
+let todayDueCount = 0;  // 服务器统计的今日到期数
+let todayHasMore = false;  // 服务器上是否还有没加载的今日卡片
+let todayLoading = null;
+let cardStats = { total: 0, average_repetition: 0, new: 0, learning: 0, mastered: 0 };
 let currentCardIndex = -1;
 let isFlipped = false;
-let categories = {};
-let selectedCards = new Set();
+let categories = {};  // 分类名 -> 卡片数
+let selectedCards = new Map();  // 卡片ID -> 卡片，复习选中卡片时使用
 let isSelectMode = false;
 let customReviewCards = [];
 let customReviewIndex = -1;
@@ -14,97 +17,29 @@ let sidebarCollapsed = false;
 let customReviewMode = 'list-infinite';
 let isInfiniteMode = true;
 let selectedReviewMode = null;
-
-// 配置marked以支持数学公式 - 安全版本
-marked.setOptions({
-    breaks: true,
-    gfm: true,
-    sanitize: false,
-    highlight: function(code, lang) {
-        return code;
-    }
-});
-
-// 增强的Markdown渲染函数，支持数学公式
-function renderMarkdownWithMath(text) {
-    if (!text) return '';
-
-    // 定义数学公式的正则表达式
-    const inlineMathRegex = /(?<!\\)\$(?!\$)(.*?)(?<!\\)\$(?!\$)/g;
-    const blockMathRegex = /(?<!\\)\$\$(.*?)(?<!\\)\$\$/gs;
-
-    // 先处理块级公式
-    let processed = text;
-    const blockMatches = [];
-
-    // 查找并临时替换块级公式
-    processed = processed.replace(blockMathRegex, (match, formula) => {
-        const id = `math-block-${Date.now()}-${Math.random().toString(36).substr(2)}`;
-        blockMatches.push({ id, formula: formula.trim() });
-        return `{{${id}}}`;
-    });
-
-    // 查找并临时替换行内公式
-    const inlineMatches = [];
-    processed = processed.replace(inlineMathRegex, (match, formula) => {
-        const id = `math-inline-${Date.now()}-${Math.random().toString(36).substr(2)}`;
-        inlineMatches.push({ id, formula: formula.trim() });
-        return `{{${id}}}`;
-    });
-
-    // 使用marked渲染Markdown
-    let html = marked.parse(processed);
-
-    // 替换回数学公式
-    blockMatches.forEach(({ id, formula }) => {
-        try {
-            const rendered = katex.renderToString(formula, {
-                throwOnError: false,
-                displayMode: true
-            });
-            html = html.replace(`{{${id}}}`, `<div class="math-container math-block">${rendered}</div>`);
-        } catch (err) {
-            console.warn('块级数学公式渲染错误:', err);
-            html = html.replace(`{{${id}}}`, `<div class="math-error">$$${formula}$$</div>`);
-        }
-    });
-
-    inlineMatches.forEach(({ id, formula }) => {
-        try {
-            const rendered = katex.renderToString(formula, {
-                throwOnError: false,
-                displayMode: false
-            });
-            html = html.replace(`{{${id}}}`, `<span class="math-inline">${rendered}</span>`);
-        } catch (err) {
-            console.warn('行内数学公式渲染错误:', err);
-            html = html.replace(`{{${id}}}`, `<span class="math-error">$${formula}$</span>`);
-        }
-    });
-
-    return html;
-}
-
-// 安全渲染Markdown
-function renderMarkdownSafely(text) {
-    if (!text) return '';
-
-    try {
-        // 使用自定义的数学公式渲染器
-        return renderMarkdownWithMath(text);
-    } catch (error) {
-        console.error('Markdown渲染错误:', error);
-        // 如果渲染失败，返回纯文本
-        return `<div class="plain-text-content">${escapeHtml(text)}</div>`;
-    }
-}
-
-// HTML转义函数
-function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
-}
+let eventSource = null;
+let pendingReload = false;
+let reloadTimer = null;
+let pendingCardIds = new Set();  // 等待局部更新的卡片ID
+let pendingTodayRefresh = false;
+let cardsLoaded = false;  // 首次 loadCards 完成前忽略推送，避免页面加载两次
+let categoryIdsByName = {};  // 分类名 -> 分类ID
+let categoryPages = {};  // 分类名 -> 侧边栏已加载的分页状态
+let cardSort = 'created:asc';
+const cardRenderCache = new CardRenderCache();
+const CARD_ROW_HEIGHT = 104;  // 侧边栏卡片行高，与 .card-list-item 的内容高度一致
+const RENDER_AHEAD_COUNT = 3;  // 复习时提前渲染的卡片数
+const TODAY_PAGE_SIZE = 100;  // 今日卡片每页加载的数量，与 /cards 的默认页大小一致
+const TODAY_PREFETCH_REMAINING = 5;  // 已加载的今日卡片只剩这么多张未复习时加载下一页
+
+// 当前标签页的标识，服务器推送变更时据此忽略本页自己的操作
+const clientId = Math.random().toString(36).substr(2) + Date.now().toString(36);
+const nativeFetch = window.fetch.bind(window);
+window.fetch = function(url, options = {}) {
+    const headers = new Headers(options.headers || {});
+    headers.set('X-Client-Id', clientId);
+    return nativeFetch(url, { ...options, headers });
+};
 
 // 预览区域的数学公式渲染
 function renderMathInPreview(element) {
@@ -311,6 +246,7 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     loadCards();
+    connectEvents();
 
     // 添加卡片表单提交
     document.getElementById('add-card-form').addEventListener('submit', async function(e) {
@@ -319,6 +255,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const front = document.getElementById('front').value.trim();
         const back = document.getElementById('back').value.trim();
         let category = document.getElementById('category').value.trim();
+        const tags = document.getElementById('tags').value.trim();
 
         if (!category) {
             category = '默认分类';
@@ -332,7 +269,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const response = await fetch('/add', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ front, back, category })
+            body: JSON.stringify({ front, back, category, tags })
         });
 
         const result = await response.json();
@@ -364,6 +301,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const front = document.getElementById('edit-front').value.trim();
         const back = document.getElementById('edit-back').value.trim();
         let category = document.getElementById('edit-category').value.trim();
+        const tags = document.getElementById('edit-tags').value.trim();
 
         if (!category) {
             category = '默认分类';
@@ -378,7 +316,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const response = await fetch(`/edit/${cardId}`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ front, back, category })
+                body: JSON.stringify({ front, back, category, tags })
             });
 
             const result = await response.json();
@@ -456,68 +394,289 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // 加载卡片
 async function loadCards() {
+    // 整体加载包含了所有等待中的局部更新
+    pendingCardIds.clear();
+    pendingTodayRefresh = false;
     try {
         const response = await fetch('/cards');
         const data = await response.json();
 
-        todayCards = data.today_cards;
-        currentCards = data.all_cards;
+        setTodayCards(data.today_cards, data.due_count);
+        applySummary(data);
+        updateCategoryList();
+        showTodayReview();
+
+        cardsLoaded = true;
+        // 加载期间收到的单卡变更
+        if (pendingCardIds.size > 0) scheduleSync();
+    } catch (error) {
+        console.error('加载卡片失败:', error);
+        showToast('加载失败，请检查网络连接', 'error');
+    }
+}
 
-        // 按分类组织卡片
-        organizeCardsByCategory();
+// 更新分类卡片数和统计摘要
+function applySummary(data) {
+    cardStats = data.stats;
+    categoryIdsByName = {};
+    categories = { '默认分类': 0 };
+    (data.categories || []).forEach(category => {
+        categoryIdsByName[category.name] = category.id;
+        if (category.card_count > 0) categories[category.name] = category.card_count;
+    });
 
-        updateStats();
-        updateCategoryList();
-        updateCategoryOptions();
+    updateStats();
+    updateCategoryOptions();
 
-        // 显示记忆质量分布
-        showMemoryQualityDistribution();
+    // 显示记忆质量分布
+    showMemoryQualityDistribution();
+}
+
+// 显示今日复习：有今日卡片时从第一张开始
+function showTodayReview() {
+    // 如果有今日卡片，开始复习
+    if (todayCards.length > 0 && !isCustomReview) {
+        document.getElementById('empty-state').classList.add('hidden');
+        document.getElementById('flashcard').classList.remove('hidden');
+        document.getElementById('rating-buttons').classList.remove('hidden');
+        document.getElementById('progress-container').classList.remove('hidden');
+        document.getElementById('custom-review-buttons').classList.add('hidden');
+        document.getElementById('review-mode-indicator').classList.add('hidden');
+
+        currentCardIndex = 0;
+        showCurrentCard();
+    } else if (isCustomReview && customReviewCards.length > 0) {
+        // 自定义复习模式
+        showCurrentCustomCard();
+    } else {
+        // 没有需要复习的卡片
+        document.getElementById('empty-state').classList.remove('hidden');
+        document.getElementById('flashcard').classList.add('hidden');
+        document.getElementById('rating-buttons').classList.add('hidden');
+        document.getElementById('progress-container').classList.add('hidden');
+        document.getElementById('custom-review-buttons').classList.add('hidden');
+        document.getElementById('review-mode-indicator').classList.add('hidden');
+    }
+}
 
-        // 如果有今日卡片，开始复习
-        if (todayCards.length > 0 && !isCustomReview) {
-            document.getElementById('empty-state').classList.add('hidden');
-            document.getElementById('flashcard').classList.remove('hidden');
-            document.getElementById('rating-buttons').classList.remove('hidden');
-            document.getElementById('progress-container').classList.remove('hidden');
-            document.getElementById('custom-review-buttons').classList.add('hidden');
-            document.getElementById('review-mode-indicator').classList.add('hidden');
+// 订阅服务器事件：到期计数和其他标签页/设备的变更
+function connectEvents() {
+    if (!window.EventSource || eventSource) return;
 
-            currentCardIndex = 0;
-            showCurrentCard();
-        } else if (isCustomReview && customReviewCards.length > 0) {
-            // 自定义复习模式
-            showCurrentCustomCard();
+    eventSource = new EventSource('/events');
+
+    eventSource.addEventListener('due', function(e) {
+        // 连接后的第一条到期计数常在首次加载完成前到达，此时 todayCards 还是空的，加载结果已包含这些卡片
+        if (!cardsLoaded) return;
+        const data = JSON.parse(e.data);
+        const todayCount = document.getElementById('today-count');
+        if (todayCount && !isReviewing()) {
+            todayCount.textContent = data.due_count;
+        }
+        if (data.due_count !== todayDueCount) {
+            pendingTodayRefresh = true;
+            scheduleSync();
+        }
+    });
+
+    eventSource.addEventListener('change', function(e) {
+        const data = JSON.parse(e.data);
+        if (data.source === clientId) return;
+        // 单张卡片的变更带有卡片ID，只更新这些卡片；批量操作和导入只有数量，重新加载今日卡片和分类计数
+        if (data.ids) {
+            data.ids.forEach(id => pendingCardIds.add(id));
+            scheduleSync();
         } else {
-            // 没有需要复习的卡片
-            document.getElementById('empty-state').classList.remove('hidden');
-            document.getElementById('flashcard').classList.add('hidden');
-            document.getElementById('rating-buttons').classList.add('hidden');
-            document.getElementById('progress-container').classList.add('hidden');
-            document.getElementById('custom-review-buttons').classList.add('hidden');
-            document.getElementById('review-mode-indicator').classList.add('hidden');
+            scheduleReload();
+        }
+    });
+
+    eventSource.addEventListener('reset', scheduleReload);
+}
+
+// 是否正在复习中（复习中途刷新会打乱当前进度）
+function isReviewing() {
+    return isCustomReview || (currentCardIndex > 0 && currentCardIndex < todayCards.length);
+}
+
+// 合并短时间内的多次变更，空闲时才重新加载
+function scheduleReload() {
+    if (isReviewing()) {
+        pendingReload = true;
+        return;
+    }
+    clearTimeout(reloadTimer);
+    reloadTimer = setTimeout(() => {
+        pendingReload = false;
+        loadCards();
+    }, 500);
+}
+
+// 合并短时间内的局部更新，复习中途推迟到复习结束后整体重新加载
+function scheduleSync() {
+    if (!cardsLoaded) return;  // 首次加载完成后再处理
+    if (isReviewing()) {
+        pendingReload = true;
+        return;
+    }
+    clearTimeout(reloadTimer);
+    reloadTimer = setTimeout(syncCards, 500);
+}
+
+async function syncCards() {
+    const ids = Array.from(pendingCardIds);
+    const refreshToday = pendingTodayRefresh;
+    pendingCardIds.clear();
+    pendingTodayRefresh = false;
+
+    try {
+        if (ids.length > 0) {
+            await patchCards(ids);
+        } else if (refreshToday) {
+            await refreshTodayCards();
         }
     } catch (error) {
-        console.error('加载卡片失败:', error);
-        showToast('加载失败，请检查网络连接', 'error');
+        console.error('更新卡片失败:', error);
+        loadCards();
+    }
+}
+
+// 按ID查询卡片，返回 {cards, missing}（missing 为已删除的卡片ID）
+async function lookupCards(ids) {
+    const cards = [];
+    const missing = [];
+    for (let i = 0; i < ids.length; i += 1000) {
+        const response = await fetch(`/cards/lookup?ids=${ids.slice(i, i + 1000).join(',')}`);
+        const result = await response.json();
+        if (!result.success) throw new Error(result.error);
+        cards.push(...result.cards);
+        missing.push(...result.missing);
     }
+    return { cards, missing };
 }
 
-// 按分类组织卡片
-function organizeCardsByCategory() {
-    categories = {};
+// 用服务器上的最新数据替换已加载的卡片：删除的移除，换了分类的移到对应分类，新增的卡片重新加载所在分类
+async function patchCards(ids) {
+    const changed = new Map((await lookupCards(ids)).cards.map(card => [card.id, card]));
+    const idSet = new Set(ids);
+
+    ids.forEach(id => {
+        if (!selectedCards.has(id)) return;
+        if (changed.has(id)) {
+            selectedCards.set(id, changed.get(id));
+        } else {
+            selectedCards.delete(id);
+        }
+    });
+
+    const reloadCategories = new Set();
+    Object.entries(categoryPages).forEach(([category, page]) => {
+        const present = new Set();
+        let modified = false;
+        const cards = page.cards.flatMap(card => {
+            if (!idSet.has(card.id)) return [card];
+            modified = true;
+            const updated = changed.get(card.id);
+            if (!updated || updated.category !== category) return [];
+            present.add(card.id);
+            return [updated];
+        });
 
-    currentCards.forEach(card => {
-        const category = card.category || '默认分类';
-        if (!categories[category]) {
-            categories[category] = [];
+        if ([...changed.values()].some(card => card.category === category && !present.has(card.id))) {
+            reloadCategories.add(category);
+        } else if (modified) {
+            page.cards = cards;
+            page.list.setItems(page.cards);
         }
-        categories[category].push(card);
     });
 
-    // 确保默认分类存在
-    if (!categories['默认分类']) {
-        categories['默认分类'] = [];
+    await refreshTodayCards(changed);
+
+    const response = await fetch('/cards/summary');
+    applySummary(await response.json());
+    updateCategoryList(false);
+    reloadCategories.forEach(category => {
+        updateCategoryCards(category, category.replace(/\s+/g, '-').toLowerCase());
+    });
+}
+
+// 设置今日卡片的第一页
+function setTodayCards(cards, dueCount) {
+    todayCards = cards;
+    todayDueCount = dueCount;
+    todayHasMore = dueCount > cards.length;
+    todayLoading = null;
+}
+
+// 查询到期队列的前 limit 张卡片：已加载的卡片直接复用，只查询其余卡片的内容
+async function fetchDueCards(limit, changed = new Map()) {
+    const response = await fetch(`/due?limit=${limit}`);
+    const due = await response.json();
+    if (!due.success) throw new Error(due.error);
+
+    const known = new Map(todayCards.map(card => [card.id, card]));
+    changed.forEach((card, id) => known.set(id, card));
+    const missing = due.card_ids.filter(id => !known.has(id));
+    if (missing.length > 0) {
+        (await lookupCards(missing)).cards.forEach(card => known.set(card.id, card));
+    }
+    return { cards: due.card_ids.map(id => known.get(id)).filter(Boolean), dueCount: due.due_count };
+}
+
+// 按到期队列刷新今日卡片的第一页
+async function refreshTodayCards(changed = new Map()) {
+    const { cards, dueCount } = await fetchDueCards(TODAY_PAGE_SIZE, changed);
+    setTodayCards(cards, dueCount);
+    updateStats();
+    showTodayReview();
+}
+
+// 加载今日卡片的下一页：已复习的卡片离开了到期队列，队列前面是还没复习的卡片，其后即为下一页
+function loadMoreTodayCards() {
+    if (!todayHasMore) return Promise.resolve();
+    if (todayLoading) return todayLoading;
+
+    const pending = todayCards.length - Math.max(currentCardIndex, 0);
+    todayLoading = fetchDueCards(Math.min(pending + TODAY_PAGE_SIZE, 1000)).then(({ cards, dueCount }) => {
+        const loaded = new Set(todayCards.map(card => card.id));
+        const next = cards.filter(card => !loaded.has(card.id));
+        todayCards.push(...next);
+        todayHasMore = next.length > 0 && dueCount > pending + next.length;
+    }).catch(error => {
+        console.error('加载今日卡片失败:', error);
+    }).finally(() => {
+        todayLoading = null;
+    });
+    return todayLoading;
+}
+
+// 在已加载的卡片（今日卡片、复习中的卡片、侧边栏分页）中查找
+function findLoadedCard(cardId) {
+    const lists = [todayCards, customReviewCards, ...Object.values(categoryPages).map(page => page.cards)];
+    for (const cards of lists) {
+        const card = cards.find(c => c.id === cardId);
+        if (card) return card;
     }
+    return selectedCards.get(cardId) || null;
+}
+
+// 逐页获取分类中的全部卡片（选择或复习整个分类时使用）
+async function fetchCategoryCards(category) {
+    const id = categoryIdsByName[category];
+    if (id === undefined) return [];
+
+    const cards = [];
+    let cursor = null;
+    do {
+        const params = new URLSearchParams({ limit: 1000 });
+        if (cursor) params.set('after', cursor);
+        const response = await fetch(`/category/${id}/cards?${params}`);
+        const result = await response.json();
+        if (!result.success) throw new Error(result.error);
+        cards.push(...result.cards);
+        cursor = result.next_cursor;
+    } while (cursor);
+    return cards;
 }
 
 // 显示当前卡片
@@ -543,15 +702,15 @@ function showCurrentCard() {
         if (frontInner) frontInner.innerHTML = '';
         if (backInner) backInner.innerHTML = '';
 
-        // 渲染正面内容 - 使用安全渲染
+        // 渲染正反面内容 - 优先使用空闲时预渲染的结果
+        const rendered = cardRenderCache.get(card);
         if (frontInner) {
-            frontInner.innerHTML = renderMarkdownSafely(card.front);
+            frontInner.innerHTML = rendered.frontHtml;
             updateCardFontSize(frontElement, card.front);
         }
 
-        // 渲染背面内容 - 使用安全渲染
         if (backInner) {
-            backInner.innerHTML = renderMarkdownSafely(card.back);
+            backInner.innerHTML = rendered.backHtml;
             updateCardFontSize(backElement, card.back);
         }
 
@@ -560,12 +719,12 @@ function showCurrentCard() {
         if (backCategory) backCategory.textContent = card.category || '默认分类';
 
         // 更新进度
-        const progress = ((currentCardIndex) / todayCards.length * 100).toFixed(1);
+        const progress = ((currentCardIndex) / Math.max(todayDueCount, todayCards.length) * 100).toFixed(1);
         const progressFill = document.getElementById('progress-fill');
         const progressText = document.getElementById('progress-text');
 
         if (progressFill) progressFill.style.width = `${progress}%`;
-        if (progressText) progressText.textContent = `${currentCardIndex + 1}/${todayCards.length}`;
+        if (progressText) progressText.textContent = `${currentCardIndex + 1}/${Math.max(todayDueCount, todayCards.length)}`;
 
         // 重置卡片状态
         isFlipped = false;
@@ -600,6 +759,9 @@ function showCurrentCard() {
             renderMathInElement(frontElement);
             renderMathInElement(backElement);
         }, 50);
+
+        // 空闲时预渲染后面几张卡片
+        cardRenderCache.renderAhead(todayCards, currentCardIndex + 1, RENDER_AHEAD_COUNT);
     }
 }
 
@@ -639,14 +801,19 @@ async function rateCard(quality) {
 
         showToast(message, quality === 4 ? 'success' : quality === 2 ? 'warning' : 'error');
 
-        // 移到下一张卡片
+        // 移到下一张卡片，已加载的卡片快复习完时提前加载下一页
         currentCardIndex++;
+        if (todayCards.length - currentCardIndex <= TODAY_PREFETCH_REMAINING) {
+            const loading = loadMoreTodayCards();
+            if (currentCardIndex >= todayCards.length) await loading;
+        }
 
         if (currentCardIndex < todayCards.length) {
             showCurrentCard();
         } else {
             showToast('恭喜！今日复习已完成', 'success');
             setTimeout(() => {
+                pendingReload = false;
                 loadCards();
             }, 1000);
         }
@@ -663,16 +830,15 @@ function updateStats() {
     const avgRepetition = document.getElementById('avg-repetition');
     const masteredCount = document.getElementById('mastered-count');
 
-    if (todayCount) todayCount.textContent = todayCards.length;
-    if (totalCount) totalCount.textContent = currentCards.length;
+    if (todayCount) todayCount.textContent = todayDueCount;
+    if (totalCount) totalCount.textContent = cardStats.total;
 
-    if (currentCards.length > 0) {
-        const avgRep = currentCards.reduce((sum, card) => sum + card.repetition, 0) / currentCards.length;
-        if (avgRepetition) avgRepetition.textContent = avgRep.toFixed(1);
+    if (cardStats.total > 0) {
+        if (avgRepetition) avgRepetition.textContent = cardStats.average_repetition.toFixed(1);
 
-        // 计算掌握比例（重复次数>=3）
-        const mastered = currentCards.filter(card => card.repetition >= 3).length;
-        if (masteredCount) masteredCount.textContent = mastered + ' (' + Math.round(mastered / currentCards.length * 100) + '%)';
+        // 掌握比例（重复次数>=3），由服务器统计
+        const mastered = cardStats.mastered;
+        if (masteredCount) masteredCount.textContent = mastered + ' (' + Math.round(mastered / cardStats.total * 100) + '%)';
     } else {
         if (avgRepetition) avgRepetition.textContent = '0';
         if (masteredCount) masteredCount.textContent = '0';
@@ -681,27 +847,27 @@ function updateStats() {
 
 // 显示记忆质量分布
 function showMemoryQualityDistribution() {
-    if (currentCards.length === 0) return;
+    if (cardStats.total === 0) return;
 
-    const cardStats = {
-        new: currentCards.filter(card => card.repetition === 0).length,
-        learning: currentCards.filter(card => card.repetition > 0 && card.repetition < 3).length,
-        mastered: currentCards.filter(card => card.repetition >= 3).length,
-        due: todayCards.length
+    const distribution = {
+        new: cardStats.new,
+        learning: cardStats.learning,
+        mastered: cardStats.mastered,
+        due: todayDueCount
     };
 
     // 可以在界面上显示这些统计数据
-    console.log('卡片统计:', cardStats);
+    console.log('卡片统计:', distribution);
 }
 
-// 更新分类列表
-function updateCategoryList() {
+// 更新分类列表：按分类名复用已有节点，只增删有变化的分类；reloadExpanded 为 false 时只更新计数，不重新加载已展开分类的卡片
+function updateCategoryList(reloadExpanded = true) {
     const container = document.getElementById('categories-container');
     if (!container) return;
 
-    container.innerHTML = '';
-
-    if (currentCards.length === 0) {
+    if (cardStats.total === 0) {
+        Object.values(categoryPages).forEach(page => page.list.destroy());
+        categoryPages = {};
         container.innerHTML = `
             <div class="empty-state">
                 <div class="empty-state-icon">
@@ -714,38 +880,35 @@ function updateCategoryList() {
         return;
     }
 
-    Object.keys(categories).sort().forEach(category => {
-        const cards = categories[category];
-        const categoryId = category.replace(/\s+/g, '-').toLowerCase();
-        const isExpanded = expandedCategories.has(category);
-
-        const categoryElement = document.createElement('div');
-        categoryElement.className = 'category-item fade-in';
-        categoryElement.id = `category-${categoryId}`;
-
-        categoryElement.innerHTML = `
-            <div class="category-header ${isExpanded ? 'active' : ''}" onclick="toggleCategory('${category}')">
-                <div class="category-title">
-                    <i class="fas fa-folder category-icon"></i>
-                    <span>${category}</span>
-                    <span class="category-count">${cards.length} 张</span>
-                </div>
-                <div class="category-actions">
-                    <button class="btn-icon btn-secondary btn-sm" onclick="event.stopPropagation(); selectAllInCategory('${category}')" title="选择本分类所有卡片">
-                        <i class="fas fa-check-double"></i>
-                    </button>
-                    <button class="btn-icon btn-secondary btn-sm" onclick="event.stopPropagation(); startCategoryReview('${category}')" title="复习本分类">
-                        <i class="fas fa-play"></i>
-                    </button>
-                </div>
-            </div>
-            <div class="category-cards ${isExpanded ? 'expanded' : ''}" id="cards-${categoryId}">
-            </div>
-        `;
+    const emptyState = container.querySelector(':scope > .empty-state');
+    if (emptyState) emptyState.remove();
+
+    const names = Object.keys(categories).sort();
+    const current = new Set(names);
+    Object.keys(categoryPages).forEach(category => {
+        if (!current.has(category)) {
+            categoryPages[category].list.destroy();
+            delete categoryPages[category];
+        }
+    });
+    const elementIds = new Set(names.map(category => `category-${category.replace(/\s+/g, '-').toLowerCase()}`));
+    container.querySelectorAll(':scope > .category-item').forEach(element => {
+        if (!elementIds.has(element.id)) element.remove();
+    });
 
-        container.appendChild(categoryElement);
+    names.forEach((category, index) => {
+        const categoryId = category.replace(/\s+/g, '-').toLowerCase();
+        let categoryElement = document.getElementById(`category-${categoryId}`);
+        if (categoryElement) {
+            categoryElement.querySelector('.category-count').textContent = `${categories[category]} 张`;
+        } else {
+            categoryElement = createCategoryElement(category, categoryId);
+        }
+        if (container.children[index] !== categoryElement) {
+            container.insertBefore(categoryElement, container.children[index] || null);
+        }
 
-        if (isExpanded) {
+        if (expandedCategories.has(category) && (reloadExpanded || !categoryPages[category])) {
             updateCategoryCards(category, categoryId);
         }
     });
@@ -753,52 +916,154 @@ function updateCategoryList() {
     updateSelectionUI();
 }
 
-// 更新分类中的卡片列表
+// 创建分类节点（卡片列表在展开时加载）
+function createCategoryElement(category, categoryId) {
+    const isExpanded = expandedCategories.has(category);
+
+    const categoryElement = document.createElement('div');
+    categoryElement.className = 'category-item fade-in';
+    categoryElement.id = `category-${categoryId}`;
+
+    categoryElement.innerHTML = `
+        <div class="category-header ${isExpanded ? 'active' : ''}" onclick="toggleCategory('${category}')">
+            <div class="category-title">
+                <i class="fas fa-folder category-icon"></i>
+                <span>${category}</span>
+                <span class="category-count">${categories[category]} 张</span>
+            </div>
+            <div class="category-actions">
+                <button class="btn-icon btn-secondary btn-sm" onclick="event.stopPropagation(); selectAllInCategory('${category}')" title="选择本分类所有卡片">
+                    <i class="fas fa-check-double"></i>
+                </button>
+                <button class="btn-icon btn-secondary btn-sm" onclick="event.stopPropagation(); startCategoryReview('${category}')" title="复习本分类">
+                    <i class="fas fa-play"></i>
+                </button>
+            </div>
+        </div>
+        <div class="category-cards ${isExpanded ? 'expanded' : ''}" id="cards-${categoryId}">
+        </div>
+    `;
+    return categoryElement;
+}
+
+// 更新分类中的卡片列表：从服务器按当前排序分页加载到虚拟列表，滚动接近末尾时加载下一页
 function updateCategoryCards(category, categoryId) {
     const cardsContainer = document.getElementById(`cards-${categoryId}`);
     if (!cardsContainer) return;
 
-    cardsContainer.innerHTML = '';
-    const cards = categories[category];
+    let page = categoryPages[category];
+    if (!page || page.list.container !== cardsContainer) {
+        if (page) page.list.destroy();
+        const list = new VirtualList(cardsContainer, {
+            rowHeight: CARD_ROW_HEIGHT,
+            renderRow: renderCardListItem,
+            onNearEnd: () => loadMoreCategoryCards(category)
+        });
+        page = categoryPages[category] = { list, cards: [], generation: 0 };
+    }
 
-    cards.forEach(card => {
-        const cardElement = document.createElement('div');
-        cardElement.className = `card-list-item ${selectedCards.has(card.id) ? 'selected' : ''}`;
-        cardElement.id = `card-${card.id}`;
+    // 重新从第一页加载，进行中的旧请求结果按 generation 丢弃
+    page.generation++;
+    page.cursor = null;
+    page.done = false;
+    page.loading = false;
+    loadMoreCategoryCards(category);
+}
 
-        const isToday = card.next_review ? new Date(card.next_review) <= new Date() : false;
+// 加载分类的下一页卡片
+async function loadMoreCategoryCards(category) {
+    const page = categoryPages[category];
+    const id = categoryIdsByName[category];
+    if (!page || page.done || page.loading || id === undefined) return;
 
-        cardElement.innerHTML = `
-            ${isSelectMode ? `
-            <div class="card-list-checkbox">
-                <input type="checkbox" id="checkbox-${card.id}" ${selectedCards.has(card.id) ? 'checked' : ''} 
-                       onchange="toggleCardSelection(${card.id}, this.checked)">
-            </div>
-            ` : ''}
-            <div class="card-list-content">
-                <div class="card-list-front">${escapeHtml(card.front.length > 100 ? card.front.substring(0, 100) + '...' : card.front)}</div>
-                <div class="card-list-back">${escapeHtml(card.back.length > 100 ? card.back.substring(0, 100) + '...' : card.back)}</div>
-                <div class="card-list-footer">
-                    <span>复习次数: ${card.repetition}</span>
-                    <span style="color: ${isToday ? 'var(--danger-color)' : 'var(--gray-500)'}">
-                        ${card.next_review ? new Date(card.next_review).toLocaleDateString('zh-CN') : '今天'}
-                    </span>
-                </div>
-            </div>
-            <div class="card-list-actions">
-                <button class="btn-icon btn-secondary" onclick="editCard(${card.id})" title="编辑">
-                    <i class="fas fa-edit"></i>
-                </button>
-                <button class="btn-icon btn-danger" onclick="deleteCard(${card.id})" title="删除">
-                    <i class="fas fa-trash"></i>
-                </button>
-            </div>
-        `;
+    page.loading = true;
+    const generation = page.generation;
+    const [sort, order] = cardSort.split(':');
+    const params = new URLSearchParams({ sort, order, limit: 100 });
+    if (page.cursor) params.set('after', page.cursor);
+
+    try {
+        const response = await fetch(`/category/${id}/cards?${params}`);
+        const result = await response.json();
+        if (page.generation !== generation) return;
+        if (!result.success) {
+            showToast('加载卡片失败：' + result.error, 'error');
+            return;
+        }
+
+        const firstPage = !page.cursor;
+        page.cursor = result.next_cursor;
+        page.done = !result.next_cursor;
+        page.loading = false;
+        if (firstPage) {
+            page.cards = result.cards;
+            page.list.setItems(page.cards);
+        } else {
+            page.cards.push(...result.cards);
+            page.list.appended();
+        }
+    } catch (error) {
+        console.error('加载分类卡片失败:', error);
+    } finally {
+        if (page.generation === generation) page.loading = false;
+    }
+}
+
+// 切换分类内卡片的排序方式
+function changeCardSort(value) {
+    cardSort = value;
+    expandedCategories.forEach(category => {
+        const categoryId = category.replace(/\s+/g, '-').toLowerCase();
+        const cardsContainer = document.getElementById(`cards-${categoryId}`);
+        if (cardsContainer) cardsContainer.scrollTop = 0;
+        updateCategoryCards(category, categoryId);
+    });
+}
 
-        cardsContainer.appendChild(cardElement);
+// 按当前选择状态重新生成已展开分类中的可见行，不重新请求数据
+function refreshCategoryRows(category = null) {
+    Object.entries(categoryPages).forEach(([name, page]) => {
+        if (category === null || name === category) page.list.refresh();
     });
 }
 
+// 生成卡片列表项
+function renderCardListItem(card) {
+    const cardElement = document.createElement('div');
+    cardElement.className = `card-list-item ${selectedCards.has(card.id) ? 'selected' : ''}`;
+    cardElement.id = `card-${card.id}`;
+
+    const isToday = card.next_review ? new Date(card.next_review) <= new Date() : false;
+
+    cardElement.innerHTML = `
+        ${isSelectMode ? `
+        <div class="card-list-checkbox">
+            <input type="checkbox" id="checkbox-${card.id}" ${selectedCards.has(card.id) ? 'checked' : ''} 
+                   onchange="toggleCardSelection(${card.id}, this.checked)">
+        </div>
+        ` : ''}
+        <div class="card-list-content">
+            <div class="card-list-front">${escapeHtml(card.front.length > 100 ? card.front.substring(0, 100) + '...' : card.front)}</div>
+            <div class="card-list-back">${escapeHtml(card.back.length > 100 ? card.back.substring(0, 100) + '...' : card.back)}</div>
+            <div class="card-list-footer">
+                <span>复习次数: ${card.repetition}</span>
+                <span style="color: ${isToday ? 'var(--danger-color)' : 'var(--gray-500)'}">
+                    ${card.next_review ? new Date(card.next_review).toLocaleDateString('zh-CN') : '今天'}
+                </span>
+            </div>
+        </div>
+        <div class="card-list-actions">
+            <button class="btn-icon btn-secondary" onclick="editCard(${card.id})" title="编辑">
+                <i class="fas fa-edit"></i>
+            </button>
+            <button class="btn-icon btn-danger" onclick="deleteCard(${card.id})" title="删除">
+                <i class="fas fa-trash"></i>
+            </button>
+        </div>
+    `;
+    return cardElement;
+}
+
 // 切换分类展开/折叠
 function toggleCategory(category) {
     const categoryId = category.replace(/\s+/g, '-').toLowerCase();
@@ -841,15 +1106,28 @@ function updateCategoryOptions() {
     });
 }
 
-// 编辑卡片
-function editCard(cardId) {
-    const card = currentCards.find(c => c.id === cardId);
-    if (!card) return;
+// 编辑卡片（不在已加载的卡片中时向服务器查询）
+async function editCard(cardId) {
+    let card = findLoadedCard(cardId);
+    if (!card) {
+        try {
+            const response = await fetch(`/cards/lookup?ids=${cardId}`);
+            const result = await response.json();
+            card = result.success ? result.cards[0] : null;
+        } catch (error) {
+            console.error('查询卡片失败:', error);
+        }
+    }
+    if (!card) {
+        showToast('卡片不存在或已被删除', 'warning');
+        return;
+    }
 
     document.getElementById('edit-card-id').value = card.id;
     document.getElementById('edit-front').value = card.front;
     document.getElementById('edit-back').value = card.back;
     document.getElementById('edit-category').value = card.category || '默认分类';
+    document.getElementById('edit-tags').value = (card.tags || []).join(', ');
 
     const frontPreview = document.getElementById('edit-front-preview');
     const backPreview = document.getElementById('edit-back-preview');
@@ -904,7 +1182,7 @@ function toggleSelectMode() {
         reviewSelectedBtn.style.display = 'inline-flex';
         reviewSelectedContainer.classList.remove('hidden');
 
-        updateCategoryList();
+        refreshCategoryRows();
     } else {
         selectBtn.classList.remove('btn-primary');
         selectBtn.classList.add('btn-secondary');
@@ -918,7 +1196,7 @@ function toggleSelectMode() {
 // 切换卡片选择状态
 function toggleCardSelection(cardId, isSelected) {
     if (isSelected) {
-        selectedCards.add(cardId);
+        selectedCards.set(cardId, findLoadedCard(cardId));
     } else {
         selectedCards.delete(cardId);
     }
@@ -932,14 +1210,20 @@ function toggleCardSelection(cardId, isSelected) {
 }
 
 // 选择分类中的所有卡片
-function selectAllInCategory(category) {
-    const cards = categories[category] || [];
+async function selectAllInCategory(category) {
+    let cards;
+    try {
+        cards = await fetchCategoryCards(category);
+    } catch (error) {
+        console.error('加载分类卡片失败:', error);
+        showToast('加载分类卡片失败，请重试', 'error');
+        return;
+    }
     cards.forEach(card => {
-        selectedCards.add(card.id);
+        selectedCards.set(card.id, card);
     });
 
-    const categoryId = category.replace(/\s+/g, '-').toLowerCase();
-    updateCategoryCards(category, categoryId);
+    refreshCategoryRows(category);
 
     updateSelectionUI();
 }
@@ -962,15 +1246,60 @@ function updateSelectionUI() {
 // 清除选择
 function clearSelection() {
     selectedCards.clear();
+    refreshCategoryRows();
 
-    Object.keys(categories).forEach(category => {
-        const categoryId = category.replace(/\s+/g, '-').toLowerCase();
-        if (expandedCategories.has(category)) {
-            updateCategoryCards(category, categoryId);
+    updateSelectionUI();
+}
+
+// 批量操作选中的卡片，一次请求完成
+async function runBulkAction(action, payload, successMessage) {
+    if (selectedCards.size === 0) {
+        showToast('请先选择卡片', 'warning');
+        return;
+    }
+
+    try {
+        const response = await fetch(`/cards/bulk/${action}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids: Array.from(selectedCards.keys()), ...payload })
+        });
+
+        const result = await response.json();
+        if (result.success) {
+            showToast(`${successMessage} ${result.count} 张卡片`, 'success');
+            selectedCards.clear();
+            loadCards();
+        } else {
+            showToast('操作失败：' + result.error, 'error');
         }
-    });
+    } catch (error) {
+        console.error('批量操作失败:', error);
+        showToast('操作失败，请重试', 'error');
+    }
+}
 
-    updateSelectionUI();
+// 批量删除选中卡片
+function bulkDeleteSelected() {
+    if (!confirm(`确定要删除选中的 ${selectedCards.size} 张卡片吗？此操作不可撤销。`)) {
+        return;
+    }
+    runBulkAction('delete', {}, '已删除');
+}
+
+// 批量移动选中卡片
+function bulkMoveSelected() {
+    const category = prompt('移动到分类：', '默认分类');
+    if (!category || !category.trim()) return;
+    runBulkAction('move', { category: category.trim() }, '已移动');
+}
+
+// 批量重置选中卡片的复习进度
+function bulkResetSelected() {
+    if (!confirm(`确定要重置选中的 ${selectedCards.size} 张卡片的复习进度吗？`)) {
+        return;
+    }
+    runBulkAction('reset', {}, '已重置');
 }
 
 // 显示复习模式选择模态框
@@ -981,7 +1310,7 @@ function showReviewModeModal() {
         customReviewCards = [...todayCards];
     } else if (selectedCards.size > 0) {
         // 如果有选中的卡片，使用选中的卡片
-        customReviewCards = currentCards.filter(card => selectedCards.has(card.id));
+        customReviewCards = Array.from(selectedCards.values());
     } else {
         // 如果已经在复习中，直接继续
         startCustomReviewWithMode();
@@ -1043,7 +1372,7 @@ function prepareCardsForMode() {
     let cards = [];
 
     if (selectedCards.size > 0) {
-        cards = currentCards.filter(card => selectedCards.has(card.id));
+        cards = Array.from(selectedCards.values());
     } else {
         cards = [...todayCards];
     }
@@ -1170,13 +1499,14 @@ function showCurrentCustomCard() {
         const frontInner = frontElement.querySelector('.content-inner');
         const backInner = backElement.querySelector('.content-inner');
 
+        const rendered = cardRenderCache.get(card);
         if (frontInner) {
-            frontInner.innerHTML = renderMarkdownSafely(card.front);
+            frontInner.innerHTML = rendered.frontHtml;
             updateCardFontSize(frontElement, card.front);
         }
 
         if (backInner) {
-            backInner.innerHTML = renderMarkdownSafely(card.back);
+            backInner.innerHTML = rendered.backHtml;
             updateCardFontSize(backElement, card.back);
         }
 
@@ -1200,6 +1530,8 @@ function showCurrentCustomCard() {
             renderMathInElement(frontElement);
             renderMathInElement(backElement);
         }, 50);
+
+        cardRenderCache.renderAhead(customReviewCards, customReviewIndex + 1, RENDER_AHEAD_COUNT);
     }
 }
 
@@ -1254,11 +1586,22 @@ function endCustomReview() {
     document.getElementById('progress-container').classList.add('hidden');
 
     showToast('复习已结束', 'info');
+
+    if (pendingReload) {
+        scheduleReload();
+    }
 }
 
 // 复习分类中的所有卡片
-function startCategoryReview(category) {
-    const cards = categories[category] || [];
+async function startCategoryReview(category) {
+    let cards;
+    try {
+        cards = await fetchCategoryCards(category);
+    } catch (error) {
+        console.error('加载分类卡片失败:', error);
+        showToast('加载分类卡片失败，请重试', 'error');
+        return;
+    }
     if (cards.length === 0) {
         showToast('该分类中没有卡片', 'warning');
         return;
@@ -1266,7 +1609,7 @@ function startCategoryReview(category) {
 
     selectedCards.clear();
     cards.forEach(card => {
-        selectedCards.add(card.id);
+        selectedCards.set(card.id, card);
     });
 
     showReviewModeModal();
@@ -1282,20 +1625,48 @@ function hideExportModal() {
     document.getElementById('export-modal').classList.add('hidden');
 }
 
-// 导出功能
-function exportCSV() {
-    window.location.href = '/export/csv';
+// 导出功能 - 在后台任务中生成文件，完成后下载
+async function exportWithJob(format) {
     hideExportModal();
+
+    try {
+        const response = await fetch(`/jobs/export/${format}`, { method: 'POST' });
+        const result = await response.json();
+        if (!result.success) {
+            showToast('导出失败：' + result.error, 'error');
+            return;
+        }
+
+        const job = await pollJob(result.job_id, '导出');
+        if (job.status === 'completed') {
+            window.location.href = `/jobs/${job.id}/download`;
+            showToast(job.message || '导出成功！', 'success');
+        } else {
+            showToast('导出失败：' + (job.error || job.message), 'error');
+        }
+    } catch (error) {
+        console.error('导出失败:', error);
+        showToast('导出失败，请重试', 'error');
+    }
+}
+
+function exportCSV() {
+    exportWithJob('csv');
 }
 
 function exportTXT() {
-    window.location.href = '/export/txt';
+    exportWithJob('txt');
+}
+
+// 下载压缩的数据库完整备份
+function exportBackup() {
+    window.location.href = '/backup?compress=1';
     hideExportModal();
 }
 
 async function exportXLSX() {
     try {
-        const response = await fetch('/cards');
+        const response = await fetch('/cards?all=1');
         const data = await response.json();
         const cards = data.all_cards;
 
@@ -1348,6 +1719,28 @@ function hideImportModal() {
     document.getElementById('import-modal').classList.add('hidden');
 }
 
+// 轮询后台任务直到结束
+async function pollJob(jobId, label) {
+    while (true) {
+        const response = await fetch(`/jobs/${jobId}`);
+        const result = await response.json();
+        if (!result.success) {
+            throw new Error(result.error || '任务不存在');
+        }
+
+        const job = result.job;
+        if (job.status === 'completed' || job.status === 'failed' || job.status === 'cancelled') {
+            return job;
+        }
+
+        const percent = Math.round(job.progress * 100);
+        const speed = job.rows_per_second ? `，${Math.round(job.rows_per_second)} 张/秒` : '';
+        showToast(`${label}中 ${percent}%（${job.rows} 张${speed}）`, 'info');
+
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function importFile(type) {
     const fileInput = document.getElementById(`${type}-file`);
     if (!fileInput.files.length) return;
@@ -1356,69 +1749,29 @@ async function importFile(type) {
     formData.append('file', fileInput.files[0]);
 
     try {
-        let response;
-        if (type === 'xlsx') {
-            const file = fileInput.files[0];
-            const reader = new FileReader();
-
-            reader.onload = async function(e) {
-                try {
-                    const data = new Uint8Array(e.target.result);
-                    const workbook = XLSX.read(data, { type: 'array' });
-                    const worksheet = workbook.Sheets[workbook.SheetNames[0]];
-                    const jsonData = XLSX.utils.sheet_to_json(worksheet, { header: 1 });
-
-                    const cards = [];
-                    for (let i = 1; i < jsonData.length; i++) {
-                        const row = jsonData[i];
-                        if (row && row.length >= 2) {
-                            cards.push({
-                                front: row[0]?.toString() || '',
-                                back: row[1]?.toString() || '',
-                                category: row[2]?.toString() || 'imported'
-                            });
-                        }
-                    }
-
-                    const importResponse = await fetch('/import/batch', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ cards })
-                    });
-
-                    const result = await importResponse.json();
-                    if (result.success) {
-                        showToast(`成功导入 ${result.count} 张卡片！`, 'success');
-                        fileInput.value = '';
-                        hideImportModal();
-                        loadCards();
-                    } else {
-                        showToast('导入失败：' + result.error, 'error');
-                    }
-                } catch (error) {
-                    console.error('解析Excel失败:', error);
-                    showToast('文件解析失败，请检查格式', 'error');
-                }
-            };
+        // 上传后立即返回任务ID，导入在后台进行
+        const response = await fetch('/jobs/import', {
+            method: 'POST',
+            body: formData
+        });
 
-            reader.readAsArrayBuffer(file);
+        const result = await response.json();
+        fileInput.value = '';
+        if (!result.success) {
+            showToast('导入失败：' + result.error, 'error');
             return;
-        } else {
-            response = await fetch('/import', {
-                method: 'POST',
-                body: formData
-            });
+        }
 
-            const result = await response.json();
-            if (result.success) {
-                showToast('导入成功！', 'success');
-                fileInput.value = '';
-                hideImportModal();
-                loadCards();
-            } else {
-                showToast('导入失败：' + result.error, 'error');
-            }
+        hideImportModal();
+        const job = await pollJob(result.job_id, '导入');
+        if (job.status === 'completed') {
+            showToast(job.message || '导入成功！', 'success');
+        } else if (job.status === 'cancelled') {
+            showToast(job.message || '导入已取消', 'warning');
+        } else {
+            showToast('导入失败：' + job.error, 'error');
         }
+        loadCards();
     } catch (error) {
         console.error('导入失败:', error);
         showToast('导入失败，请重试', 'error');
@@ -0,0 +1,34 @@
+"""测试夹具 - 每个测试使用临时目录下的独立用户数据库（借用多用户模式的数据库路由），不会读写 flashcards.db"""
+
+import itertools
+
+import pytest
+
+from app import app, current_database
+
+_user_ids = itertools.count()
+
+
+@pytest.fixture
+def user_id(tmp_path, monkeypatch):
+    """当前测试的用户标识，数据库位于 tmp_path/users/<用户>/flashcards.db"""
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path))
+    monkeypatch.setitem(app.config, 'MULTI_USER', True)
+    user_id = f'test-{next(_user_ids)}'
+    token = current_database.set(user_id)
+    yield user_id
+    current_database.reset(token)
+
+
+@pytest.fixture
+def database(user_id):
+    """在当前测试用户的数据库上直接调用 app 中的函数"""
+    with app.app_context():
+        yield user_id
+
+
+@pytest.fixture
+def client(user_id):
+    client = app.test_client()
+    client.environ_base['HTTP_' + app.config['USER_HEADER'].upper().replace('-', '_')] = user_id
+    return client
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def card_ids(client):
+    return [client.post('/add', json={'front': f'问题 {i}', 'back': '答案'}).get_json()['id'] for i in range(3)]
+
+
+@pytest.mark.parametrize('payload', [
+    {'ids': '12'},
+    {'ids': ['1', '2']},
+    {'ids': [1, 2.5]},
+    {'ids': [True]},
+    {'ids': {'1': 1}},
+    {'filter': {'category_id': 'abc'}},
+])
+def test_invalid_selection_is_rejected(client, card_ids, payload):
+    response = client.post('/cards/bulk/delete', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert client.get('/cards/summary').get_json()['stats']['total'] == len(card_ids)
+
+
+def test_invalid_target_category_is_rejected(client, card_ids):
+    response = client.post('/cards/bulk/move', json={'ids': card_ids[:1], 'category_id': 'abc'})
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': '请提供有效的分类ID'}
+
+
+def test_bulk_delete_by_ids(client, card_ids):
+    result = client.post('/cards/bulk/delete', json={'ids': card_ids[:2]}).get_json()
+    assert result == {'success': True, 'count': 2}
+    assert client.get('/cards/summary').get_json()['stats']['total'] == 1
@@ -0,0 +1,12 @@
+def test_cards_returns_first_page_of_due_cards(client):
+    for i in range(7):
+        client.post('/add', json={'front': f'问题 {i}', 'back': '答案'})
+
+    data = client.get('/cards', query_string={'limit': 3}).get_json()
+    assert len(data['today_cards']) == 3
+    assert data['due_count'] == 7
+    assert 'all_cards' not in data
+
+    # 后面的卡片按到期顺序从 /due 取得
+    due = client.get('/due', query_string={'limit': 7}).get_json()
+    assert due['card_ids'][:3] == [card['id'] for card in data['today_cards']]
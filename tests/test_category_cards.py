@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+SORT_FIELDS = {
+    'created': lambda card: card['id'],
+    'next_review': lambda card: datetime.fromisoformat(card['next_review']),
+    'ease': lambda card: card['ease_factor'],
+    'repetition': lambda card: card['repetition'],
+}
+
+
+@pytest.fixture
+def category_id(client):
+    """23张卡片的分类，部分卡片复习过，各排序列都有相同值和不同值"""
+    card_ids = [client.post('/add', json={'front': f'问题 {i}', 'back': '答案', 'category': '分页测试'}).get_json()['id']
+                for i in range(23)]
+    for i, card_id in enumerate(card_ids[::3]):
+        for _ in range(i % 3 + 1):
+            client.post(f'/review/{card_id}', json={'quality': 4 if i % 2 else 2})
+    categories = client.get('/cards/summary').get_json()['categories']
+    return next(category['id'] for category in categories if category['name'] == '分页测试')
+
+
+def fetch_pages(client, category_id, sort, order, limit):
+    cards, after = [], None
+    while True:
+        params = {'sort': sort, 'order': order, 'limit': limit}
+        if after:
+            params['after'] = after
+        page = client.get(f'/category/{category_id}/cards', query_string=params).get_json()
+        assert page['success']
+        assert ('card_count' in page) == (after is None)
+        cards += page['cards']
+        after = page['next_cursor']
+        if not after:
+            return cards
+
+
+@pytest.mark.parametrize('sort', SORT_FIELDS)
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_keyset_pages_cover_every_card_once_in_order(client, category_id, sort, order):
+    cards = fetch_pages(client, category_id, sort, order, limit=5)
+    keys = [(SORT_FIELDS[sort](card), card['id']) for card in cards]
+    assert len(cards) == 23
+    assert len({card['id'] for card in cards}) == 23
+    assert keys == sorted(keys, reverse=order == 'desc')
+
+
+def test_invalid_cursor_is_rejected(client, category_id):
+    result = client.get(f'/category/{category_id}/cards', query_string={'after': 'not-a-cursor'}).get_json()
+    assert result == {'success': False, 'error': '无效的分页游标'}
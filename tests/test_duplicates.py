@@ -0,0 +1,62 @@
+import app as flashcards
+from app import db, CardSignature
+
+TEXT = '线粒体是细胞进行有氧呼吸的主要场所，被称为细胞的动力车间，能为生命活动提供大部分能量'
+
+
+def add_card(client, front, back):
+    response = client.post('/add', json={'front': front, 'back': back})
+    return response.get_json()['id']
+
+
+def similar(client, **params):
+    result = client.get('/duplicates/similar', query_string=params).get_json()
+    assert result['success']
+    return result
+
+
+def pair_ids(result):
+    return {tuple(sorted(card['id'] for card in pair['cards'])) for pair in result['pairs']}
+
+
+def test_near_duplicates_are_paired(client):
+    first = add_card(client, 'What is the capital of France?', 'Paris')
+    second = add_card(client, 'what is the  capital of france', 'Paris.')
+    third = add_card(client, TEXT, 'ATP')
+    fourth = add_card(client, TEXT.replace('大部分', '绝大部分'), 'ATP')
+    add_card(client, '勾股定理', '直角三角形两直角边的平方和等于斜边的平方')
+
+    result = similar(client, threshold=0.6)
+    assert pair_ids(result) == {(first, second), (third, fourth)}
+    assert result['pairs'][0]['similarity'] == 1.0  # 只有大小写、标点和空白不同
+    assert result['truncated_buckets'] == 0
+
+    assert pair_ids(similar(client, threshold=0.6, card_id=third)) == {(third, fourth)}
+
+
+def test_oversized_bucket_reports_identical_cards(client, monkeypatch):
+    monkeypatch.setattr(flashcards, 'LSH_MAX_BUCKET_SIZE', 2)
+    copies = [add_card(client, TEXT, 'ATP') for _ in range(3)]
+    add_card(client, TEXT.replace('大部分', '绝大部分'), 'ATP')
+
+    # 超过上限的桶只配对完全相同的卡片，并报告未完整比较
+    result = similar(client, threshold=0.6)
+    assert pair_ids(result) == {(copies[0], copies[1]), (copies[0], copies[2])}
+    assert result['truncated_buckets'] > 0
+
+
+def test_missing_signatures_are_reported_and_refreshed(client, database):
+    first = add_card(client, 'What is the capital of France?', 'Paris')
+    second = add_card(client, 'what is the capital of france', 'Paris')
+    db.session.query(CardSignature).delete()
+    db.session.commit()
+
+    # 报告只读，不会自行补算签名
+    result = similar(client)
+    assert result['pairs'] == []
+    assert result['missing_signatures'] == 2
+
+    assert client.post('/duplicates/signatures').get_json() == {'success': True, 'count': 2}
+    result = similar(client)
+    assert pair_ids(result) == {(first, second)}
+    assert result['missing_signatures'] == 0
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+
+@pytest.fixture
+def deck(client):
+    """60张卡片随机分布在三个分类、打上随机标签，返回 {卡片ID: (分类名, 标签集合)}"""
+    rng = random.Random(7)
+    cards = {}
+    for i in range(60):
+        category = rng.choice(['甲', '乙', '丙'])
+        tags = set(rng.sample(['a', 'b', 'c', 'd'], rng.randint(0, 3)))
+        card_id = client.post('/add', json={
+            'front': f'问题 {i}', 'back': '答案', 'category': category, 'tags': ','.join(sorted(tags))
+        }).get_json()['id']
+        cards[card_id] = (category, tags)
+    return cards
+
+
+def category_ids(client):
+    return {category['name']: category['id'] for category in client.get('/cards/summary').get_json()['categories']}
+
+
+def fetch_all(client, params, limit):
+    card_ids, after = [], None
+    while True:
+        page = client.get('/cards/filter', query_string={**params, 'limit': limit, **({'after': after} if after else {})}).get_json()
+        assert page['success']
+        card_ids += [card['id'] for card in page['cards']]
+        after = page['next_cursor']
+        if not after:
+            return card_ids
+
+
+@pytest.mark.parametrize('tags,tag_mode,categories,mode', [
+    (['a'], 'and', [], 'and'),
+    (['a', 'b'], 'and', [], 'and'),
+    (['a', 'b'], 'or', [], 'and'),
+    (['a', 'x'], 'and', [], 'and'),
+    (['a', 'x'], 'or', [], 'and'),
+    ([], 'and', ['甲', '乙'], 'and'),
+    (['a', 'b'], 'and', ['甲'], 'and'),
+    (['c', 'd'], 'or', ['甲', '丙'], 'and'),
+    (['a', 'b'], 'and', ['乙'], 'or'),
+    (['c', 'd'], 'or', ['甲'], 'or'),
+    (['x'], 'and', ['丙'], 'or'),
+])
+def test_filter_pages_match_brute_force(client, deck, tags, tag_mode, categories, mode):
+    def matches(card):
+        category, card_tags = card
+        tag_match = (set(tags) <= card_tags if tag_mode == 'and' else bool(set(tags) & card_tags)) if tags else None
+        category_match = category in categories if categories else None
+        conditions = [match for match in (tag_match, category_match) if match is not None]
+        return all(conditions) if mode == 'and' else any(conditions)
+
+    ids = category_ids(client)
+    params = {'tags': ','.join(tags), 'tag_mode': tag_mode, 'mode': mode,
+              'category_id': [ids[name] for name in categories]}
+    expected = sorted(card_id for card_id, card in deck.items() if matches(card))
+    for limit in (4, 1000):
+        assert fetch_all(client, params, limit) == expected
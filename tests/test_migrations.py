@@ -0,0 +1,78 @@
+import os
+import sqlite3
+
+import pytest
+
+import app as flashcards
+from app import db, Category, Flashcard, get_user_database_path, run_migrations, setup_database
+
+
+def schema_version():
+    raw = flashcards.current_engine().raw_connection()
+    try:
+        return raw.driver_connection.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
+    finally:
+        raw.close()
+
+
+def index_names():
+    raw = flashcards.current_engine().raw_connection()
+    try:
+        return {name for (name,) in raw.driver_connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        raw.close()
+
+
+def test_new_database_gets_all_migrations(database):
+    assert schema_version() == flashcards.MIGRATIONS[-1][0]
+    assert {'ix_flashcard_next_review', 'ix_category_path', 'ix_flashcard_category_repetition'} <= index_names()
+    assert run_migrations() == 0
+
+
+def test_old_database_is_upgraded_in_place(user_id):
+    # 改造前的表结构：分类没有层级字段，也没有迁移版本表
+    path = get_user_database_path(user_id)
+    os.makedirs(os.path.dirname(path))
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE category (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE,
+                               created_date DATETIME, description TEXT);
+        CREATE TABLE flashcard (id INTEGER PRIMARY KEY, front TEXT NOT NULL, back TEXT NOT NULL,
+                                created_date DATETIME, category_id INTEGER NOT NULL REFERENCES category (id),
+                                repetition INTEGER, interval FLOAT, ease_factor FLOAT, next_review DATETIME);
+        CREATE TABLE review_history (id INTEGER PRIMARY KEY, card_id INTEGER NOT NULL REFERENCES flashcard (id),
+                                     review_date DATETIME, quality INTEGER NOT NULL, next_interval FLOAT NOT NULL);
+        INSERT INTO category (id, name, created_date) VALUES (1, '默认分类', '2024-01-01 00:00:00.000000');
+        INSERT INTO category (id, name, created_date) VALUES (2, '英语学习/词汇', '2024-01-01 00:00:00.000000');
+        INSERT INTO flashcard (front, back, created_date, category_id, repetition, interval, ease_factor, next_review)
+            VALUES ('apple', '苹果', '2024-01-01 00:00:00.000000', 2, 0, 0, 2.5, '2024-01-01 00:00:00.000000');
+    ''')
+    conn.commit()
+    conn.close()
+
+    with flashcards.app.app_context():
+        setup_database()
+        assert schema_version() == flashcards.MIGRATIONS[-1][0]
+
+        # 缺少的上级分类被补建，子分类挂到它下面
+        parent = Category.query.filter_by(name='英语学习').one()
+        child = db.session.get(Category, 2)
+        assert child.parent_id == parent.id
+        assert child.path == f'/{parent.id}/2/'
+        assert Flashcard.query.one().category_id == 2
+
+
+def test_failed_migration_rolls_back(database, monkeypatch):
+    version = schema_version()  # 先完成数据库初始化，再追加会失败的迁移
+    monkeypatch.setattr(flashcards, 'MIGRATIONS', flashcards.MIGRATIONS + [
+        (version + 1, '测试：失败的迁移', [
+            'CREATE INDEX ix_test_rollback ON flashcard (front)',
+            'SELECT * FROM missing_table',
+        ]),
+    ])
+
+    with pytest.raises(sqlite3.OperationalError):
+        run_migrations()
+    assert schema_version() == version
+    assert 'ix_test_rollback' not in index_names()
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from app import app, db, db_writer, run_write, Flashcard, WriteTimeout
+
+
+def block_writer():
+    """让写线程卡在一个操作上，返回 (该操作的 Future, 放行用的 Event)"""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    future = db_writer.submit(blocker)
+    assert started.wait(5)
+    return future, release
+
+
+def test_write_result_is_returned(database):
+    def write():
+        card = Flashcard(front='问题', back='答案', category_id=1)
+        db.session.add(card)
+        db.session.flush()
+        return card.id
+
+    card_id = run_write(write)
+    assert db.session.get(Flashcard, card_id).front == '问题'
+
+
+def test_queued_write_times_out_without_running(database, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_TIMEOUT', 0.2)
+    executed = threading.Event()
+    cancelled = db_writer.metrics()['cancelled_operations']
+    future, release = block_writer()
+    try:
+        with pytest.raises(WriteTimeout):
+            run_write(executed.set)
+    finally:
+        release.set()
+    future.result(5)
+
+    # 写线程处理完积压后，被取消的操作没有执行
+    run_write(lambda: None)
+    assert not executed.is_set()
+    assert db_writer.metrics()['cancelled_operations'] == cancelled + 1
+
+
+def test_running_write_is_waited_for(database, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_TIMEOUT', 0.1)
+
+    def slow_write():
+        time.sleep(0.4)
+        card = Flashcard(front='慢', back='写入', category_id=1)
+        db.session.add(card)
+        db.session.flush()
+        return card.id
+
+    # 已开始执行的操作超过等待时间也不会报告失败，返回时已经提交
+    card_id = run_write(slow_write)
+    assert db.session.get(Flashcard, card_id) is not None